@@ -2,7 +2,8 @@
 import csv
 from datetime import datetime
 
-from scripts.retrieval.retriever import retrieve
+from scripts.retrieval import retriever
+from scripts.retrieval.retriever import retrieve_batch
 from scripts.generator import generate_answer
 
 # === CONFIG ===
@@ -54,13 +55,15 @@ def run_full_experiment_suite(queries, output_csv=OUTPUT_CSV):
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
 
-        for query in queries:
-            for chunking in CHUNKING_TYPES:
-                for method in METHODS:
-                    for k in K_VALUES:
+        for chunking in CHUNKING_TYPES:
+            for method in METHODS:
+                # 1) Retrieval for all queries at once; top-k for a smaller k
+                #    is a prefix of the top-k for the largest one
+                batch = retrieve_batch(queries, method=method, chunking_type=chunking, k=max(K_VALUES))
 
-                        # 1) Retrieval
-                        retrieved = retrieve(query=query, method=method, chunking_type=chunking, k=k)
+                for query, retrieved_max in zip(queries, batch):
+                    for k in K_VALUES:
+                        retrieved = retrieved_max[:k]
 
                         # 2) Adapt to generator format
                         chunks_for_gen = _adapt_chunks_for_generator(retrieved)
@@ -92,6 +95,8 @@ def run_full_experiment_suite(queries, output_csv=OUTPUT_CSV):
 
                         print(f"✅ {chunking} | {method} | k={k} | {query[:60]}")
 
+    if retriever.RESULT_CACHE is not None:
+        print(f"[CACHE] retrieval results: {retriever.RESULT_CACHE.stats()}")
     print(f"\n🎉 Done! Results saved to: {output_csv}")
 
 
@@ -1,11 +1,15 @@
-import json
-from datetime import datetime
 import re
 import csv
 
+import numpy as np
+
 
 # We reuse your evaluation retriever (keyword overlap)
 from scripts.retrieval.retriever import retrieve_eval  # used in run_temporal_queries.py :contentReference[oaicite:2]{index=2}
+from scripts.common.dates import iso_to_epoch_days
+from scripts.retrieval.time_decay import apply_time_decay
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.retrieval.temporal_store import open_temporal_store
 
 
 CSV_OUT = "stage3_comparison_results.csv"
@@ -47,6 +51,8 @@ def append_rows_to_csv(corpus, chunking_method, embedding_method, query, rows, a
             ])
 
 INDEX_PATH = "stage2_outputs/temporal_index_stage2.json"  # created by temporalIndexing.py :contentReference[oaicite:3]{index=3}
+# Partitioned by country / chunking / embedding; converted from INDEX_PATH on first run
+DATASET_PATH = "stage2_outputs/temporal_index_dataset"
 
 CORPORA = ["UK", "US"]
 SYSTEMS = [
@@ -61,11 +67,8 @@ K = 5
 # -------- Stage 3 parameters --------
 ALPHA = 0.3
 LAMBDA = 0.5
-
-
-def is_corpus(chunk, corpus):
-    # same idea as your run_temporal_queries.py :contentReference[oaicite:4]{index=4}
-    return chunk["source"].lower().startswith(corpus.lower() + "_")
+KERNEL = "rational"   # rational | exponential | gaussian
+AS_OF = None          # query time for the decay (date); None = today
 
 
 def extract_year_from_query(query: str):
@@ -73,38 +76,22 @@ def extract_year_from_query(query: str):
     return int(m.group()) if m else None
 
 
-def parse_chunk_dt(chunk):
-    # stage2 stores ISO string like "2023-07-03" :contentReference[oaicite:5]{index=5}
-    ts = chunk.get("timestamp_iso")
-    if not ts:
-        return None
-    try:
-        return datetime.fromisoformat(ts)
-    except Exception:
-        return None
-
+def time_decay_scores(sim_scores, chunks, as_of=AS_OF,
+                      alpha: float = ALPHA, lambd: float = LAMBDA, kernel: str = KERNEL):
+    # Decay over the whole candidate set at once; stage2 stores ISO dates
+    # like "2023-07-03", chunks without one keep their score
+    days = iso_to_epoch_days([c.get("timestamp_iso") for c in chunks])
+    return apply_time_decay(np.asarray(sim_scores, dtype=np.float64), days, as_of,
+                            alpha=alpha, lambd=lambd, kernel=kernel)
 
-def time_decay_score(sim_score: float, chunk_dt: datetime, query_dt: datetime,
-                     alpha: float = ALPHA, lambd: float = LAMBDA) -> float:
-    # Rational decay: 1 / (1 + lambda * Δt), with Δt in years
-    delta_years = abs((query_dt - chunk_dt).days) / 365.25
-    time_score = 1 / (1 + lambd * delta_years)
-    return (1 - alpha) * sim_score + alpha * time_score
 
-
-def score_baseline(query: str, chunks: list):
+def score_baseline(query: str, chunks: list, index=None):
     # retrieve_eval returns top-k already, but Stage 3 needs scoring over a candidate set.
     # We'll score all chunks using the same signal as retrieve_eval:
-    # count of query terms appearing in text_preview.
-    query_terms = set(re.findall(r"\w+", query.lower()))
-    scored = []
-    for c in chunks:
-        text = (c.get("text_preview") or "").lower()
-        s = sum(1 for t in query_terms if t in text)
-        if s > 0:
-            scored.append((c, float(s)))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored
+    # count of query terms appearing in text_preview (as whole tokens),
+    # merged from the posting lists of `index` (built here if not given).
+    idx, scores = KeywordIndex.lookup(chunks, index).match(query, chunks)
+    return [(chunks[i], float(s)) for i, s in zip(idx, scores)]
 
 
 def apply_hard_year_filter(scored, year):
@@ -118,24 +105,17 @@ def apply_hard_year_filter(scored, year):
     return out
 
 
-def topk_comparison_table(query: str, chunks: list, k: int = K):
-    query_dt = datetime.now()
+def topk_comparison_table(query: str, chunks: list, k: int = K, index=None):
     year = extract_year_from_query(query)
 
     # 1) baseline scoring (semantic only proxy)
-    baseline_scored = score_baseline(query, chunks)
+    baseline_scored = score_baseline(query, chunks, index)
     baseline_scored = apply_hard_year_filter(baseline_scored, year)
 
     # 2) temporal scoring (semantic + time decay)
-    temporal_scored = []
-    for c, s in baseline_scored:
-        dt = parse_chunk_dt(c)
-        if dt is None:
-            final = s  # no timestamp -> no decay
-        else:
-            final = time_decay_score(s, dt, query_dt)
-        temporal_scored.append((c, s, final))
-    temporal_scored.sort(key=lambda x: x[2], reverse=True)
+    finals = time_decay_scores([s for _, s in baseline_scored], [c for c, _ in baseline_scored])
+    order = np.argsort(-finals, kind="stable")
+    temporal_scored = [(baseline_scored[i][0], baseline_scored[i][1], float(finals[i])) for i in order]
 
     # 3) take top-k
     baseline_top = baseline_scored[:k]
@@ -187,8 +167,8 @@ def print_table(title, rows):
 
 
 def main():
-    with open(INDEX_PATH, "r", encoding="utf-8") as f:
-        all_chunks = json.load(f)
+    # Each corpus / system selection is read from its own partition
+    store = open_temporal_store(DATASET_PATH, INDEX_PATH)
 
     # Pick 1–2 queries to show in the report (you can add more)
     queries = [
@@ -199,21 +179,17 @@ def main():
     write_csv_header()
 
     for corpus in CORPORA:
-        corpus_chunks = [c for c in all_chunks if is_corpus(c, corpus)]
-
         for chunking_method, embedding_method in SYSTEMS:
-            system_chunks = [
-                c for c in corpus_chunks
-                if c["chunking_method"] == chunking_method
-                and c["embedding_method"] == embedding_method
-            ]
+            system_chunks = store.chunks(corpus, chunking_method, embedding_method)
+            # Inverted keyword index for score_baseline (reads text_preview)
+            keyword_index = KeywordIndex.build(system_chunks)
 
             print("\n" + "=" * 80)
             print(f"CORPUS={corpus} | SYSTEM={chunking_method}+{embedding_method} | alpha={ALPHA} lambda={LAMBDA}")
             print("=" * 80)
 
             for q in queries:
-                rows = topk_comparison_table(q, system_chunks, k=K)
+                rows = topk_comparison_table(q, system_chunks, k=K, index=keyword_index)
 
                 append_rows_to_csv(
                     corpus=corpus,
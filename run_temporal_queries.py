@@ -1,9 +1,12 @@
-import json
 import csv
 
 from datetime import datetime
+from functools import partial
 from scripts.retrieval.temporal_retrieval import temporal_retrieve
 from scripts.retrieval.retriever import retrieve_eval
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.retrieval.temporal_store import open_temporal_store
+from scripts.retrieval.term_series import TERM_REGISTRY
 from scripts.evolution_prompt import run_evolution_llm, Chunk
 
 # -------------------------
@@ -41,10 +44,10 @@ def log_chunks(title, chunks):
 # -------------------------
 # Configuration
 # -------------------------
-def is_corpus(chunk, corpus):
-   return chunk["source"].lower().startswith(corpus.lower() + "_")
-
 INDEX_PATH = "stage2_outputs/temporal_index_stage2.json"
+# Partitioned by country / chunking / embedding (country = source prefix);
+# converted from INDEX_PATH on first run
+DATASET_PATH = "stage2_outputs/temporal_index_dataset"
 
 CORPORA = ["UK", "US"]
 
@@ -58,6 +61,10 @@ SYSTEMS = [
 K = 5
 MONTHS = 8
 
+# Take windows from the months a query's terms occur in when it names no
+# dates (needs scripts/stage2_Temporal_Indexing/build_term_series.py outputs)
+TERM_WINDOWS = False
+
 # -------------------------
 # Queries (Stage 4)
 # -------------------------
@@ -101,13 +108,12 @@ def append_chunks_to_csv(
 # -------------------------
 # Load index
 # -------------------------
-with open(INDEX_PATH, "r", encoding="utf-8") as f:
-    ALL_CHUNKS = json.load(f)
+STORE = open_temporal_store(DATASET_PATH, INDEX_PATH)
 write_csv_header()
 
 
-print(f"Loaded {len(ALL_CHUNKS)} chunks")
-log(f"Loaded {len(ALL_CHUNKS)} chunks")
+print(f"Loaded {len(STORE)} chunks")
+log(f"Loaded {len(STORE)} chunks")
 
 # -------------------------
 # Run Stage 4
@@ -121,8 +127,7 @@ for corpus in CORPORA:
     log(f"CORPUS: {corpus}")
     log("=" * 80)
 
-    corpus_chunks = [c for c in ALL_CHUNKS if is_corpus(c, corpus)]
-    log(f"[DEBUG] corpus_chunks size: {len(corpus_chunks)}")
+    log(f"[DEBUG] corpus_chunks size: {STORE.count(corpus=corpus)}")
 
     for chunking_method, embedding_method in SYSTEMS:
         print("\n" + "-" * 80)
@@ -133,11 +138,12 @@ for corpus in CORPORA:
         log(f"SYSTEM: {chunking_method} + {embedding_method}")
         log("-" * 80)
 
-        system_chunks = [
-            c for c in corpus_chunks
-            if c["chunking_method"] == chunking_method
-            and c["embedding_method"] == embedding_method
-        ]
+        # Only this corpus + system's partition is read; timestamps come from
+        # its timestamp_unix column, time-sorted once, not per query
+        system_chunks = STORE.corpus(corpus, chunking_method, embedding_method)
+        # Inverted keyword index behind retrieve_eval (reads text_preview)
+        keyword_index = KeywordIndex.build(system_chunks.chunks)
+        term_index = TERM_REGISTRY.get(chunking_method) if TERM_WINDOWS else None
 
         log(f"[DEBUG] system_chunks size: {len(system_chunks)}")
 
@@ -148,11 +154,13 @@ for corpus in CORPORA:
             early, late = temporal_retrieve(
                 query,
                 system_chunks,
-                retrieve_eval,
+                partial(retrieve_eval, index=keyword_index),
                 k=K,
                 months=MONTHS,
                 chunking_method=chunking_method,
                 embedding_method=embedding_method,
+                term_index=term_index,
+                country=corpus,
             )
             append_chunks_to_csv(
                 corpus,
@@ -0,0 +1,88 @@
+"""
+bench_ann.py
+============
+
+Recall@k and latency of the IVF index against an exact scan of
+dense_matrix, on the indexes the retriever serves (INDEX_PATHS):
+
+    python scripts/benchmarks/bench_ann.py [chunking_method | index_dir ...]
+
+Queries are the Stage 4 questions (encoded with the index's model) and a
+sample of chunk vectors used as pseudo-queries; recall is reported for
+each set separately, since a chunk vector always finds itself. If the
+index was saved without an ANN structure (the build scripts' default,
+BUILD_ANN = False), one is built in memory first.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+
+from scripts.retrieval.retriever import INDEX_PATHS
+from scripts.vectorization.vector_index import VectorIndex
+
+
+QUERIES = [
+    "What was the specific budget allocated to security in 2024?",
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "What was the official position regarding Iran in 2023?",
+    "Was immigration policy stricter in 2025 than in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+]
+K = 10
+N_PSEUDO_QUERIES = 200
+NPROBES = [1, 2, 4, 8, 16, 32]
+
+
+def recall(found, exact):
+    return float(np.mean([len(f & e) / len(e) for f, e in zip(found, exact)]))
+
+
+def bench(index_dir):
+    index = VectorIndex.load(index_dir)
+    n, dim = index.dense_matrix.shape
+    print(f"\n[LOAD] {index_dir}: {n} x {dim}")
+
+    if index.ann is None:
+        t0 = time.perf_counter()
+        index.build_ann()
+        print(f"[BUILD] IVF nlist={index.ann.nlist}: {time.perf_counter() - t0:.2f}s")
+
+    rng = np.random.default_rng(0)
+    pseudo = np.asarray(index.dense_matrix[np.sort(rng.choice(n, size=min(n, N_PSEUDO_QUERIES), replace=False))])
+    real = np.vstack([index.encode_query_dense(q) for q in QUERIES])
+    queries = np.vstack([real, pseudo]).astype(np.float32)
+    n_real = len(real)
+    print(f"[QUERIES] {n_real} questions + {len(pseudo)} pseudo-queries")
+
+    t0 = time.perf_counter()
+    exact = [set(index.dense_search(q, K, exact=True)[0].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    print(f"\n{'nprobe':>8} {'recall q':>9} {'recall ps':>10} {'ms/query':>10} {'speedup':>8} {'rows scanned':>14}")
+    print(f"{'exact':>8} {1.0:>9.3f} {1.0:>10.3f} {exact_ms:>10.3f} {1.0:>8.2f} {n:>14}")
+    sizes = np.diff(index.ann.list_indptr)
+    for nprobe in NPROBES:
+        if nprobe > index.ann.nlist:
+            break
+        t0 = time.perf_counter()
+        found = [set(index.ann.search(q, K, nprobe=nprobe)[0].tolist()) for q in queries]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        scanned = np.mean([
+            sizes[np.argpartition(-(index.ann.centroids @ q), nprobe - 1)[:nprobe]].sum() for q in queries
+        ])
+        print(f"{nprobe:>8} {recall(found[:n_real], exact[:n_real]):>9.3f} "
+              f"{recall(found[n_real:], exact[n_real:]):>10.3f} {ms:>10.3f} {exact_ms / ms:>8.2f} {scanned:>14.0f}")
+
+
+if __name__ == "__main__":
+    targets = sys.argv[1:] or list(INDEX_PATHS)
+    for target in targets:
+        bench(INDEX_PATHS.get(target, target))
@@ -0,0 +1,87 @@
+"""
+bench_bm25.py
+=============
+
+Parity + latency check: BM25Index (inverted index) vs rank_bm25.BM25Okapi.
+
+    python scripts/benchmarks/bench_bm25.py [chunks_dir]
+
+Fails loudly if any score differs from BM25Okapi.get_scores.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from scripts.vectorization.bm25_index import BM25Index
+from scripts.vectorization.vector_index import bm25_tokenize, load_chunks_from_dir
+
+
+QUERIES = [
+    "What was the specific budget allocated to security in 2024?",
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "Was immigration policy stricter in 2025 than in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+    "What was the exact unemployment rate mentioned in the government report from 2018?",
+    "the of and to",
+]
+K = 10
+REPEATS = 5
+
+
+def _ms(fn, repeats=REPEATS):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    chunks_dir = sys.argv[1] if len(sys.argv) > 1 else "hierarchical_chunks"
+
+    print(f"[LOAD] {chunks_dir}")
+    chunks = load_chunks_from_dir(chunks_dir, Path(chunks_dir).name)
+    tokens = [bm25_tokenize(c.text) for c in chunks]
+    print(f"[LOAD] {len(chunks)} chunks")
+
+    t0 = time.perf_counter()
+    okapi = BM25Okapi(tokens)
+    print(f"[BUILD] BM25Okapi: {time.perf_counter() - t0:.2f}s")
+
+    t0 = time.perf_counter()
+    index = BM25Index.from_tokens(tokens)
+    print(f"[BUILD] BM25Index: {time.perf_counter() - t0:.2f}s "
+          f"({len(index.vocab)} terms, {len(index.post_docs)} postings)")
+
+    # ---------- parity ----------
+    for q in QUERIES:
+        toks = bm25_tokenize(q)
+        expected = okapi.get_scores(toks)
+        got = index.get_scores(toks)
+        if not np.array_equal(expected, got):
+            raise AssertionError(f"score mismatch for {q!r}: max diff {np.abs(expected - got).max()}")
+    print(f"[PARITY] {len(QUERIES)} queries: scores identical to BM25Okapi")
+
+    # ---------- latency ----------
+    print(f"\n{'query':<60} {'okapi ms':>10} {'scores ms':>10} {'+sort ms':>10}")
+    totals = np.zeros(3)
+    for q in QUERIES:
+        toks = bm25_tokenize(q)
+        row = np.array([
+            _ms(lambda: okapi.get_scores(toks), repeats=2),
+            _ms(lambda: index.get_scores(toks)),
+            _ms(lambda: np.argsort(-index.get_scores(toks))[:K]),
+        ])
+        totals += row
+        print(f"{q[:58]:<60} " + " ".join(f"{v:>10.2f}" for v in row))
+    print(f"{'TOTAL':<60} " + " ".join(f"{v:>10.2f}" for v in totals))
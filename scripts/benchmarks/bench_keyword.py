@@ -0,0 +1,122 @@
+"""
+bench_keyword.py
+================
+
+Keyword-overlap scoring (retrieve_eval / Stage 3 score_baseline) on the
+Stage 4 query set, for every corpus x system subset:
+  - substring scan  : the old `t in text` loop over every preview
+  - token scan      : the same loop with whole-token matching (reference)
+  - keyword index   : posting-list merge (KeywordIndex)
+
+    python scripts/benchmarks/bench_keyword.py [stage2_json]
+
+Fails loudly if the index's top-k differs from the whole-token scan.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.retrieval.keyword_index import KeywordIndex, keyword_terms
+from scripts.retrieval.retriever import normalize_query
+
+
+QUERIES = [
+    "What was the specific budget allocated to security in 2024?",
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Was the official position in the last quarter of 2023 supportive of the State of Israel?",
+    "Was the official position in the last quarter of 2023 supportive of Hamas/Gaza?",
+    "Has the official position in the last quarter of 2023 changed relative to the official position in the last quarter of 2025?",
+    "How did the Prime Minister/President's rhetoric regarding the war between Israel and Hamas/Gaza change between his first and last speech?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "What was the official position regarding Iran in 2023?",
+    "What is the current official position regarding Iran?",
+    "Was immigration policy stricter in 2025 than in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+]
+CORPORA = ["UK", "US"]
+SYSTEMS = [
+    ("fixed_660", "bm25"),
+    ("fixed_660", "dense_e5_base"),
+    ("hierarchical", "bm25"),
+    ("hierarchical", "dense_e5_base"),
+]
+K = 10
+
+
+def substring_scan(query, chunks, k):
+    """
+    The previous retrieve_eval.
+    """
+    query_terms = set(normalize_query(query))
+    scored = []
+    for c in chunks:
+        text = c.get("text_preview", "").lower()
+        score = sum(1 for t in query_terms if t in text)
+        if score > 0:
+            scored.append((score, c))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [c for _, c in scored[:k]]
+
+
+def token_scan(query, chunks, k):
+    """
+    Same loop, whole-token matching.
+    """
+    query_terms = set(normalize_query(query))
+    scored = []
+    for c in chunks:
+        score = len(query_terms & set(keyword_terms(c.get("text_preview", ""))))
+        if score > 0:
+            scored.append((score, c))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [c for _, c in scored[:k]]
+
+
+def _timed(fn, subsets):
+    t0 = time.perf_counter()
+    out = [fn(q, chunks, K) for chunks in subsets for q in QUERIES]
+    return out, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "stage2_outputs/temporal_index_stage2.json"
+    with open(path, "r", encoding="utf-8") as f:
+        all_chunks = json.load(f)
+    print(f"[LOAD] {len(all_chunks)} stage2 entries")
+
+    t0 = time.perf_counter()
+    index = KeywordIndex.build(all_chunks)
+    build_s = time.perf_counter() - t0
+    print(f"[BUILD] {len(index.vocab)} terms, {len(index.post_docs)} postings in {build_s:.2f}s")
+
+    subsets = []
+    for corpus in CORPORA:
+        corpus_chunks = [c for c in all_chunks if c["source"].lower().startswith(corpus.lower() + "_")]
+        for chunking_method, embedding_method in SYSTEMS:
+            subsets.append([
+                c for c in corpus_chunks
+                if c["chunking_method"] == chunking_method and c["embedding_method"] == embedding_method
+            ])
+    n_calls = len(subsets) * len(QUERIES)
+
+    old, old_s = _timed(substring_scan, subsets)
+    ref, ref_s = _timed(token_scan, subsets)
+    new, new_s = _timed(lambda q, chunks, k: KeywordIndex.lookup(chunks, index).top_k(q, chunks, k), subsets)
+
+    for a, b in zip(ref, new):
+        assert [c["id"] for c in a] == [c["id"] for c in b], "top-k differs from the whole-token scan"
+    changed = sum([c["id"] for c in a] != [c["id"] for c in b] for a, b in zip(old, new))
+
+    print(f"\n{n_calls} calls ({len(subsets)} subsets x {len(QUERIES)} queries), k={K}\n")
+    print(f"{'':>16} {'total s':>9} {'ms/call':>9}")
+    print(f"{'substring scan':>16} {old_s:>9.2f} {old_s * 1000 / n_calls:>9.2f}")
+    print(f"{'token scan':>16} {ref_s:>9.2f} {ref_s * 1000 / n_calls:>9.2f}")
+    print(f"{'keyword index':>16} {new_s:>9.2f} {new_s * 1000 / n_calls:>9.2f}   (+ {build_s:.2f}s build, once)")
+    print(f"\n[OK] identical top-{K} to whole-token matching; "
+          f"{changed}/{n_calls} lists differ from the substring scan")
@@ -0,0 +1,112 @@
+"""
+bench_partitions.py
+===================
+
+Window queries on the month-partitioned index vs the monolithic one.
+
+  full scan   : score every chunk, then keep the window (what filtering the
+                whole corpus per query costs)
+  partitioned : retrieve_window(); only the overlapping months are opened
+
+    python scripts/benchmarks/bench_partitions.py [chunking_type] [method]
+
+Overlap@k compares retrieve_window() with the same candidate / fusion /
+decay pipeline run on the monolithic index's row range; lists can differ
+because each partition has its own BM25 statistics and candidate budget.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from scripts.common.dates import EPOCH, to_unix_seconds
+from scripts.retrieval import retriever as R
+from scripts.retrieval.retriever import PARTITION_REGISTRY, get_index, retrieve_window
+from scripts.retrieval.time_decay import apply_time_decay
+
+
+QUERIES = [
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "What is the current official position regarding Iran?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+]
+K = 10
+WINDOW_MONTHS = [1, 3, 6, 12, None]   # None = whole corpus
+
+
+def full_scan_window(index, query, method, start_ts, end_ts, k):
+    """
+    Full-corpus scores, then the window as a mask.
+    """
+    scores = np.zeros(len(index.chunks))
+    if method in ("bm25", "hybrid"):
+        scores += index.bm25_scores_batch([query])[0]
+    if method in ("dense", "hybrid"):
+        scores += index.dense_scores(index.encode_queries_dense([query]), exact=True)[0]
+    ts = np.asarray(index.timestamps)
+    keep = np.flatnonzero((ts >= start_ts) & (ts < end_ts))
+    top = keep[np.argsort(-scores[keep], kind="stable")[:k]]
+    return [index.chunks.chunk_ids[i] for i in top]
+
+
+def sliced_window(index, query, method, start_ts, end_ts, k):
+    """
+    The retrieve_batch() pipeline on the monolithic index's row range.
+    """
+    rows = index.time_slice(start_ts, end_ts)
+    q_vecs = index.encode_queries_dense([query]) if method in ("dense", "hybrid") else None
+    lists = {
+        signal: R._signal_candidates(index, [query], q_vecs, signal, rows, max(k, R.FUSION_CANDIDATES))[0]
+        for signal in R.METHOD_SIGNALS[method]
+    }
+    docs, fused = R._fuse_candidates(index, query, q_vecs[0] if q_vecs is not None else None,
+                                     lists, R.HYBRID_FUSION)
+    final = apply_time_decay(fused, index.chunks.days[docs], None, alpha=R.TIME_DECAY_ALPHA,
+                             lambd=R.TIME_DECAY_LAMBDA, kernel=R.TIME_DECAY_KERNEL)
+    return [index.chunks.chunk_ids[docs[j]] for j in np.argsort(-final, kind="stable")[:k]]
+
+
+if __name__ == "__main__":
+    chunking_type = sys.argv[1] if len(sys.argv) > 1 else "hierarchical"
+    method = sys.argv[2] if len(sys.argv) > 2 else "bm25"
+
+    index = get_index(chunking_type)
+    pindex = PARTITION_REGISTRY.get(chunking_type)
+    print(f"[LOAD] {chunking_type}: {len(index.chunks)} chunks, {len(pindex.partitions)} partitions")
+
+    # Warm the query cache so encoding is not part of either timing
+    index.encode_queries_dense(QUERIES)
+    max_dt = EPOCH + relativedelta(seconds=pindex.max_ts)
+
+    print(f"\n{'window':>8} {'parts':>6} {'rows':>8} {'full ms':>9} {'part ms':>9} {'overlap@' + str(K):>10}")
+    for months in WINDOW_MONTHS:
+        if months is None:
+            start_ts, end_ts = pindex.min_ts, pindex.max_ts + 1
+        else:
+            start_ts, end_ts = to_unix_seconds(max_dt - relativedelta(months=months)), pindex.max_ts + 1
+        parts = pindex.route(start_ts, end_ts)
+        rows = sum(p["num_chunks"] for p in parts)
+
+        t0 = time.perf_counter()
+        for q in QUERIES:
+            full_scan_window(index, q, method, start_ts, end_ts, K)
+        full_ms = (time.perf_counter() - t0) * 1000 / len(QUERIES)
+        reference = [sliced_window(index, q, method, start_ts, end_ts, K) for q in QUERIES]
+
+        retrieve_window(QUERIES[0], method, chunking_type, K, start_ts, end_ts)  # open the partitions
+        t0 = time.perf_counter()
+        part = [[r["chunk_id"] for r in retrieve_window(q, method, chunking_type, K, start_ts, end_ts)]
+                for q in QUERIES]
+        part_ms = (time.perf_counter() - t0) * 1000 / len(QUERIES)
+
+        overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(reference, part)])
+        label = "all" if months is None else f"{months}m"
+        print(f"{label:>8} {len(parts):>6} {rows:>8} {full_ms:>9.2f} {part_ms:>9.2f} {overlap:>10.3f}")
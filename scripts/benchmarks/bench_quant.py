@@ -0,0 +1,83 @@
+"""
+bench_quant.py
+==============
+
+Recall@k, latency and memory of quantized first-stage dense scoring
+(int8 / float16 + float32 rescoring) against the exact float32 scan.
+
+    python scripts/benchmarks/bench_quant.py [index_dir]
+
+Queries are the Stage 4 questions (encoded with the index's model) plus a
+sample of chunk vectors used as pseudo-queries.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+
+from scripts.vectorization.quantized_dense import QUANT_MODES, QuantizedDense
+from scripts.vectorization.vector_index import VectorIndex
+
+
+QUERIES = [
+    "What was the specific budget allocated to security in 2024?",
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "What was the official position regarding Iran in 2023?",
+    "Was immigration policy stricter in 2025 than in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+]
+K = 10
+N_PSEUDO_QUERIES = 200
+RESCORE = [0, 20, 50, 100, 200]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+if __name__ == "__main__":
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else "vector_indexes/hierarchical/vector_index"
+
+    index = VectorIndex.load(index_dir)
+    n, dim = index.dense_matrix.shape
+    print(f"[LOAD] {index_dir}: {n} x {dim}")
+
+    # Resident float32 copy for the baseline, so it is not timed on page faults
+    dense = np.ascontiguousarray(index.dense_matrix, dtype=np.float32)
+
+    rng = np.random.default_rng(0)
+    pseudo = dense[np.sort(rng.choice(n, size=min(n, N_PSEUDO_QUERIES), replace=False))]
+    real = np.vstack([index.encode_query_dense(q) for q in QUERIES])
+    queries = np.vstack([real, pseudo]).astype(np.float32)
+    print(f"[QUERIES] {len(real)} questions + {len(pseudo)} pseudo-queries")
+
+    t0 = time.perf_counter()
+    exact = [set(top_k(dense @ q, K).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    print(f"\n{'mode':>8} {'rescore':>8} {'recall@' + str(K):>10} {'ms/query':>10} {'first-stage MB':>15}")
+    print(f"{'float32':>8} {'-':>8} {1.0:>10.3f} {exact_ms:>10.3f} {dense.nbytes / 1e6:>15.1f}")
+
+    for mode in QUANT_MODES:
+        t0 = time.perf_counter()
+        quant = QuantizedDense.build(index.dense_matrix, mode=mode)
+        build_s = time.perf_counter() - t0
+        for rescore in RESCORE:
+            t0 = time.perf_counter()
+            if rescore:
+                found = [set(quant.search(q, K, rescore=rescore)[0].tolist()) for q in queries]
+            else:
+                # No rescoring: rank on the compact matrix alone
+                found = [set(top_k(quant.approx_scores(q)[0], K).tolist()) for q in queries]
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            recall = np.mean([len(f & e) / len(e) for f, e in zip(found, exact)])
+            print(f"{mode:>8} {rescore:>8} {recall:>10.3f} {ms:>10.3f} {quant.nbytes / 1e6:>15.1f}")
+        print(f"{'':>8} (built in {build_s:.2f}s)")
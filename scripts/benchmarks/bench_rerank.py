@@ -0,0 +1,76 @@
+"""
+bench_rerank.py
+===============
+
+Latency the cascade cross-encoder rerank adds on top of retrieve(), per
+budget: p50 / p95, pairs scored per query, how often each cutoff fires,
+and agreement of the budgeted top-k with reranking every candidate.
+
+    python scripts/benchmarks/bench_rerank.py [chunking_type] [method]
+
+Each budget starts with an empty pair cache; a second pass over the same
+queries shows the cost once every pair is cached.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+
+from scripts.retrieval.rerank import RERANK_CANDIDATES, CascadeReranker
+from scripts.retrieval.retriever import retrieve
+
+
+QUERIES = [
+    "What was the specific budget allocated to security in 2024?",
+    "What is the current official position regarding the State of Israel?",
+    "What is the current official position regarding Hamas/Gaza?",
+    "Was the official position in the last quarter of 2023 supportive of the State of Israel?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+    "What was the official position regarding Iran in 2023?",
+    "What is the current official position regarding Iran?",
+    "Was immigration policy stricter in 2025 than in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+]
+K = 5
+BUDGETS_MS = [25.0, 50.0, 100.0, 150.0, 300.0]
+
+
+def _run(reranker: CascadeReranker, candidates, budget_ms: float):
+    return [[r["chunk_id"] for r in reranker.rerank(q, candidates[q], K, budget_ms=budget_ms)]
+            for q in QUERIES]
+
+
+if __name__ == "__main__":
+    chunking_type = sys.argv[1] if len(sys.argv) > 1 else "hierarchical"
+    method = sys.argv[2] if len(sys.argv) > 2 else "hybrid"
+
+    t0 = time.perf_counter()
+    candidates = {q: retrieve(q, method, chunking_type, RERANK_CANDIDATES) for q in QUERIES}
+    retrieve_ms = (time.perf_counter() - t0) * 1000 / len(QUERIES)
+    print(f"[RETRIEVE] {chunking_type}/{method}: top-{RERANK_CANDIDATES} in {retrieve_ms:.1f} ms/query")
+
+    # Reference: rerank every candidate (no budget, no margin cutoff)
+    full = CascadeReranker(budget_ms=float("inf"), margin=float("inf"))
+    full.model  # load outside the timings
+    reference = _run(full, candidates, float("inf"))
+
+    print(f"\n{'budget ms':>10} {'pass':>6} {'p50 ms':>8} {'p95 ms':>8} {'pairs/q':>8} "
+          f"{'margin':>7} {'budget':>7} {'overlap@' + str(K):>10}")
+    print(f"{'full':>10} {'cold':>6} {full.stats()['p50_ms']:>8.1f} {full.stats()['p95_ms']:>8.1f} "
+          f"{full.stats()['pairs_per_query']:>8.1f} {'-':>7} {'-':>7} {1.0:>10.3f}")
+
+    for budget in BUDGETS_MS:
+        reranker = CascadeReranker(budget_ms=budget)
+        reranker._ms_per_pair = full._ms_per_pair  # same warm-up for every budget
+        for label in ("cold", "cached"):
+            reranker.reset_stats()
+            found = _run(reranker, candidates, budget)
+            overlap = np.mean([len(set(f) & set(r)) / K for f, r in zip(found, reference)])
+            s = reranker.stats()
+            print(f"{budget:>10.0f} {label:>6} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+                  f"{s['pairs_per_query']:>8.1f} {s['margin_stops']:>7} {s['budget_stops']:>7} {overlap:>10.3f}")
@@ -0,0 +1,77 @@
+"""
+bench_temporal.py
+=================
+
+Per-query overhead of temporal_retrieve on the Stage 2 chunks:
+
+  list   : a plain list of chunk dicts (timestamps parsed on every call)
+  corpus : a TemporalCorpus built once (sorted int64 column, cached
+           min / max, searchsorted windows)
+
+    python scripts/benchmarks/bench_temporal.py [stage2_json]
+
+The "null" retriever returns the first k window chunks, so its columns
+are the temporal bookkeeping alone; "keyword" uses retrieve_eval.
+"""
+
+import json
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.retrieval.retriever import retrieve_eval
+from scripts.retrieval.temporal_retrieval import TemporalCorpus, temporal_retrieve
+
+
+QUERIES = [
+    "What is the current official position regarding Iran?",
+    "What was the official position regarding Iran in 2023?",
+    "How did climate policy rhetoric change between the earliest and latest documents?",
+    "Who is the Minister of Defense/Secretary of Defense?",
+]
+SYSTEM = ("hierarchical", "bm25")
+K = 5
+MONTHS = 8
+REPEATS = 5
+
+
+def null_retriever(query, chunks, k):
+    return chunks[:k]
+
+
+def per_query_ms(chunks, retriever):
+    temporal_retrieve(QUERIES[0], chunks, retriever, k=K, months=MONTHS)  # warm
+    t0 = time.perf_counter()
+    for _ in range(REPEATS):
+        for q in QUERIES:
+            temporal_retrieve(q, chunks, retriever, k=K, months=MONTHS)
+    return (time.perf_counter() - t0) * 1000 / (REPEATS * len(QUERIES))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "stage2_outputs/temporal_index_stage2.json"
+    with open(path, "r", encoding="utf-8") as f:
+        all_chunks = json.load(f)
+    keyword_retriever = partial(retrieve_eval, index=KeywordIndex.build(all_chunks))
+
+    chunks = [c for c in all_chunks if (c["chunking_method"], c["embedding_method"]) == SYSTEM]
+    t0 = time.perf_counter()
+    corpus = TemporalCorpus(chunks)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"[LOAD] {len(chunks)} chunks ({SYSTEM[0]} + {SYSTEM[1]}); TemporalCorpus built in {build_ms:.1f} ms")
+
+    print(f"\n{'input':>8} {'null ms':>9} {'keyword ms':>11}")
+    for name, data in (("list", chunks), ("corpus", corpus)):
+        print(f"{name:>8} {per_query_ms(data, null_retriever):>9.2f} {per_query_ms(data, keyword_retriever):>11.2f}")
+
+    same = all(
+        temporal_retrieve(q, chunks, keyword_retriever, k=K, months=MONTHS)
+        == temporal_retrieve(q, corpus, keyword_retriever, k=K, months=MONTHS)
+        for q in QUERIES
+    )
+    print(f"\n[CHECK] identical results: {same}")
@@ -0,0 +1,101 @@
+"""
+bench_temporal_store.py
+=======================
+
+Load time and peak RSS of the Stage 3 / 4 read path, all 8 corpus x
+system selections:
+
+  json     : json.load the whole Stage 2 file, filter lists per corpus /
+             system, TemporalCorpus per selection
+  store    : TemporalStore.corpus per selection (partition pushdown,
+             no text_preview)
+  +text    : the same, plus the keyword index over text_preview that
+             retrieve_eval / score_baseline need
+
+    python scripts/benchmarks/bench_temporal_store.py [stage2_json] [dataset_dir]
+
+Each mode runs in its own process, so peak RSS is per mode ("imports" is
+the interpreter plus imports alone). The dataset is converted from the
+JSON first if it does not exist.
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.retrieval.temporal_retrieval import TemporalCorpus
+from scripts.retrieval.temporal_store import DATASET_PATH, JSON_PATH, TemporalStore, open_temporal_store
+
+CORPORA = ["UK", "US"]
+SYSTEMS = [
+    ("fixed_660", "bm25"),
+    ("fixed_660", "dense_e5_base"),
+    ("hierarchical", "bm25"),
+    ("hierarchical", "dense_e5_base"),
+]
+MODES = ["imports", "json", "json+text", "store", "store+text"]
+
+
+def is_corpus(chunk, corpus):
+    return chunk["source"].lower().startswith(corpus.lower() + "_")
+
+
+def load_json(json_path, text):
+    with open(json_path, "r", encoding="utf-8") as f:
+        all_chunks = json.load(f)
+    if text:
+        KeywordIndex.build(all_chunks)
+    n = 0
+    for corpus in CORPORA:
+        corpus_chunks = TemporalCorpus(c for c in all_chunks if is_corpus(c, corpus))
+        for chunking_method, embedding_method in SYSTEMS:
+            n += len(corpus_chunks.select(chunking_method, embedding_method))
+    return n
+
+
+def load_store(dataset_dir, text):
+    store = TemporalStore(dataset_dir)
+    n = 0
+    for corpus in CORPORA:
+        for chunking_method, embedding_method in SYSTEMS:
+            selection = store.corpus(corpus, chunking_method, embedding_method)
+            if text:
+                KeywordIndex.build(selection.chunks)
+            n += len(selection)
+    return n
+
+
+def run_one(mode, json_path, dataset_dir):
+    t0 = time.perf_counter()
+    n = 0
+    if mode.startswith("json"):
+        n = load_json(json_path, text=mode.endswith("+text"))
+    elif mode.startswith("store"):
+        n = load_store(dataset_dir, text=mode.endswith("+text"))
+    seconds = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "chunks": n, "seconds": seconds, "peak_mb": peak_mb}))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--one":
+        run_one(*sys.argv[2:5])
+        sys.exit(0)
+
+    json_path = sys.argv[1] if len(sys.argv) > 1 else JSON_PATH
+    dataset_dir = sys.argv[2] if len(sys.argv) > 2 else DATASET_PATH
+    open_temporal_store(dataset_dir, json_path)
+
+    print(f"{'mode':>11} {'chunks':>7} {'load s':>7} {'peak RSS MB':>12}")
+    for mode in MODES:
+        out = subprocess.run([sys.executable, __file__, "--one", mode, json_path, dataset_dir],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:>11} {r['chunks']:>7} {r['seconds']:>7.2f} {r['peak_mb']:>12.0f}")
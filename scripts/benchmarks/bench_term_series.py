@@ -0,0 +1,68 @@
+"""
+bench_term_series.py
+====================
+
+Monthly series for a set of terms, per chunking method:
+
+  matrix : at query time from X_bm25_chunks.npz (load, slice the term
+           columns, group the rows by month)
+  index  : TermSeriesIndex.series on the memory-mapped term_series
+
+    python scripts/benchmarks/bench_term_series.py [stage2_json]
+
+Run build_term_series.py first; the two must agree exactly.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import load_npz
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.retrieval.term_series import TERM_SERIES_PATHS, TermSeriesIndex
+from scripts.stage2_Temporal_Indexing.build_term_series import BM25_ROOT, BM25_SUBDIRS, STAGE2_JSON, bm25_rows
+
+TERM_SETS = [
+    ["israel"],
+    ["hamas", "gaza", "ceasefire"],
+    ["climate", "energy", "emissions", "net", "zero"],
+]
+REPEATS = 20
+
+
+def matrix_series(bm25_dir, entries, chunking_method, terms, months):
+    X = load_npz(bm25_dir / "X_bm25_chunks.npz").tocsc()
+    with open(bm25_dir / "bm25_feature_names.txt", "r", encoding="utf-8") as f:
+        vocab = {line.rstrip("\n"): i for i, line in enumerate(f)}
+    ts, _ = bm25_rows(entries, chunking_method, X.shape[0])
+    cols = X[:, [vocab[t] for t in terms if t in vocab]]
+    month_of = ts.astype("datetime64[s]").astype("datetime64[M]")
+    month_idx = np.searchsorted(months, month_of[cols.indices])
+    return np.bincount(month_idx, minlength=len(months)).astype(np.float64)
+
+
+if __name__ == "__main__":
+    stage2_json = sys.argv[1] if len(sys.argv) > 1 else STAGE2_JSON
+    with open(stage2_json, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    print(f"{'method':>13} {'terms':>6} {'matrix ms':>10} {'index ms':>9} {'same':>5}")
+    for chunking_method, subdir in BM25_SUBDIRS.items():
+        index = TermSeriesIndex.load(TERM_SERIES_PATHS[chunking_method])
+        months = np.array(index.months, dtype="datetime64[M]")
+        for terms in TERM_SETS:
+            t0 = time.perf_counter()
+            expected = matrix_series(BM25_ROOT / subdir, entries, chunking_method, terms, months)
+            matrix_ms = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            for _ in range(REPEATS):
+                got = index.series(terms)
+            index_ms = (time.perf_counter() - t0) * 1000 / REPEATS
+            same = bool(np.array_equal(got, expected))
+            print(f"{chunking_method:>13} {len(terms):>6} {matrix_ms:>10.1f} {index_ms:>9.3f} {str(same):>5}")
@@ -0,0 +1,69 @@
+"""
+bench_tokens.py
+===============
+
+Memory and build time: interned TokenStreams vs one list of strings per
+chunk (the old `bm25_tokens`), and BM25Index built from each.
+
+    python scripts/benchmarks/bench_tokens.py [chunks_dir]
+
+Fails loudly if the two BM25 indexes differ.
+"""
+
+import pickle
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+
+from scripts.vectorization.bm25_index import BM25Index
+from scripts.vectorization.token_streams import TokenStreams, bm25_tokenize
+from scripts.vectorization.vector_index import load_chunks_from_dir
+
+
+def _measure(fn):
+    """
+    (result, seconds, peak MB, retained MB). Timed and traced in separate
+    calls, since tracemalloc slows allocation-heavy code down a lot.
+    """
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1e6, retained / 1e6
+
+
+if __name__ == "__main__":
+    chunks_dir = sys.argv[1] if len(sys.argv) > 1 else "hierarchical_chunks"
+
+    print(f"[LOAD] {chunks_dir}")
+    texts = [c.text for c in load_chunks_from_dir(chunks_dir, Path(chunks_dir).name)]
+    print(f"[LOAD] {len(texts)} chunks")
+
+    tokens, tok_s, tok_peak, tok_mb = _measure(lambda: [bm25_tokenize(t) for t in texts])
+    streams, str_s, str_peak, str_mb = _measure(lambda: TokenStreams.build(texts))
+
+    bm25_a, bm25_a_s, _, _ = _measure(lambda: BM25Index.from_tokens(tokens))
+    bm25_b, bm25_b_s, _, _ = _measure(lambda: BM25Index.from_streams(streams))
+
+    assert bm25_a.vocab == bm25_b.vocab, "vocabularies differ"
+    for name in ("idf", "doc_len", "norm", "indptr", "post_docs", "post_tf"):
+        assert np.array_equal(getattr(bm25_a, name), getattr(bm25_b, name)), f"{name} differs"
+
+    list_pickle = len(pickle.dumps(tokens)) / 1e6
+    stream_disk = (streams.ids.nbytes + streams.offsets.nbytes + len(pickle.dumps(streams.vocab))) / 1e6
+
+    print(f"\n{len(streams.ids)} tokens, {len(streams.vocab)} terms\n")
+    print(f"{'':>16} {'tokenize s':>11} {'peak MB':>9} {'held MB':>9} {'saved MB':>9} {'BM25 build s':>13}")
+    print(f"{'list of str':>16} {tok_s:>11.2f} {tok_peak:>9.1f} {tok_mb:>9.1f} {list_pickle:>9.1f} {bm25_a_s:>13.2f}")
+    print(f"{'TokenStreams':>16} {str_s:>11.2f} {str_peak:>9.1f} {str_mb:>9.1f} {stream_disk:>9.1f} {bm25_b_s:>13.2f}")
+    print("\n[OK] identical BM25 index")
@@ -0,0 +1,105 @@
+import re
+import warnings
+from datetime import date, datetime, timezone
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Sentinel for chunks without a date: sorts after every real timestamp
+MISSING_TS = np.iinfo(np.int64).max
+MISSING_DAY = np.iinfo(np.int32).max
+
+EPOCH = datetime(1970, 1, 1)
+
+_DATE_RE = re.compile(r"(\d{4})[_-](\d{2})[_-](\d{2})")
+
+
+def date_from_name(name: str) -> Optional[date]:
+    """
+    Date embedded in a document / file name:
+      uk_2023-07-03.txt          -> 2023-07-03
+      UK_debates2023-06-28.txt   -> 2023-06-28
+    """
+    if not name:
+        return None
+    m = _DATE_RE.search(name)
+    if not m:
+        return None
+    try:
+        return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    except ValueError:
+        return None
+
+
+def to_unix_seconds(d) -> int:
+    """
+    Unix seconds (UTC) for a date or naive datetime; supports pre-1970 dates.
+    """
+    if isinstance(d, datetime):
+        if d.tzinfo is not None:
+            d = d.astimezone(timezone.utc).replace(tzinfo=None)
+        return int((d - EPOCH).total_seconds())
+    return (d - EPOCH.date()).days * 86400
+
+
+def year_bounds(year: int) -> Tuple[int, int]:
+    """
+    [start, end) in Unix seconds for a calendar year.
+    """
+    return to_unix_seconds(date(year, 1, 1)), to_unix_seconds(date(year + 1, 1, 1))
+
+
+def to_epoch_day(d) -> int:
+    """
+    Days since 1970-01-01 for a date or datetime (time of day dropped).
+    """
+    return to_unix_seconds(d) // 86400
+
+
+def epoch_days(timestamps: np.ndarray) -> np.ndarray:
+    """
+    int32 epoch days from int64 Unix seconds; MISSING_TS -> MISSING_DAY.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    missing = ts == MISSING_TS
+    days = np.where(missing, 0, ts // 86400).astype(np.int32)
+    days[missing] = MISSING_DAY
+    return days
+
+
+def iso_to_unix_seconds(values) -> np.ndarray:
+    """
+    int64 Unix seconds from ISO date / datetime strings in one NumPy pass;
+    empty, non-string (None, NaN) or unparsable values -> MISSING_TS.
+    Values with a UTC offset are converted to UTC.
+    """
+    raw = [v if isinstance(v, str) and v else "NaT" for v in values]
+    try:
+        # NumPy only warns about UTC offsets; those values take the slow path
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            parsed = np.array(raw, dtype="datetime64[s]")
+    except (ValueError, Warning):
+        parsed = np.array([_parse_iso(v) for v in raw], dtype="datetime64[s]")
+    missing = np.isnat(parsed)
+    out = parsed.astype(np.int64)
+    out[missing] = MISSING_TS
+    return out
+
+
+def iso_to_epoch_days(values) -> np.ndarray:
+    """
+    int32 epoch days from ISO date / datetime strings; empty or
+    unparsable values -> MISSING_DAY.
+    """
+    return epoch_days(iso_to_unix_seconds(values))
+
+
+def _parse_iso(value: str) -> np.datetime64:
+    try:
+        d = datetime.fromisoformat(value)
+    except ValueError:
+        return np.datetime64("NaT")
+    if d.tzinfo is not None:
+        d = d.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(d, "s")
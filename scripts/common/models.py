@@ -1,5 +1,15 @@
+from __future__ import annotations
+
+import json
 from dataclasses import dataclass
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from scripts.common.dates import EPOCH, MISSING_TS, date_from_name, epoch_days, to_unix_seconds
+
 
 @dataclass
 class Chunk:
@@ -7,3 +17,268 @@ class Chunk:
     doc_id: str
     text: str
     meta: Dict[str, Any]
+
+
+# =============================
+# Columnar chunk storage
+# =============================
+def country_from_doc_id(doc_id: str) -> Optional[str]:
+    """
+    uk_2023-07-03 / UK_debates2023-06-28 -> "uk"; us_2024-01-09 -> "us".
+    """
+    prefix = doc_id.split("_", 1)[0].lower() if doc_id else ""
+    return prefix or None
+
+
+def _encode(values: List[Optional[str]], dtype) -> tuple:
+    """
+    Dictionary encoding: (codes, vocabulary); None -> -1.
+    """
+    vocab: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=dtype)
+    for i, v in enumerate(values):
+        codes[i] = -1 if v is None else vocab.setdefault(v, len(vocab))
+    return codes, list(vocab)
+
+
+def _decode(codes: np.ndarray, vocab: List[str], i: int) -> Optional[str]:
+    code = int(codes[i])
+    return None if code < 0 else vocab[code]
+
+
+class ChunkView:
+    """
+    Lightweight read-only Chunk backed by one row of a ChunkStore.
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "ChunkStore", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def chunk_id(self) -> str:
+        return self._store.chunk_ids[self._row]
+
+    @property
+    def doc_id(self) -> str:
+        return self._store.doc_id(self._row)
+
+    @property
+    def text(self) -> str:
+        return self._store.text(self._row)
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        return self._store.timestamp(self._row)
+
+    @property
+    def country(self) -> Optional[str]:
+        return _decode(self._store.country_codes, self._store.countries, self._row)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._store.meta(self._row)
+
+    def __repr__(self) -> str:
+        return f"ChunkView(chunk_id={self.chunk_id!r}, doc_id={self.doc_id!r})"
+
+
+class ChunkStore(Sequence):
+    """
+    Chunks as columns instead of one object + meta dict each:
+      chunk_ids                 - list of str
+      doc_codes / doc_ids       - dictionary-encoded doc id (int32)
+      timestamps                - int64 Unix seconds (MISSING_TS if unknown)
+      days                      - int32 epoch days (MISSING_DAY if unknown)
+      country_codes / countries - categorical (int8, -1 = unknown)
+      chunking_codes / chunkings
+      source_codes / source_dirs - source_path = <dir>/<chunk_id>.txt
+      texts / text_offsets      - UTF-8 buffer + int64 (n + 1) byte offsets
+      extra                     - {row: meta} for keys without a column
+
+    Indexing returns ChunkView objects, so code written against Chunk
+    keeps working; hot paths read the columns directly.
+    """
+
+    def __init__(self, chunk_ids, doc_codes, doc_ids, timestamps, country_codes, countries,
+                 chunking_codes, chunkings, source_codes, source_dirs, texts, text_offsets,
+                 extra: Optional[Dict[int, Dict[str, Any]]] = None, days: Optional[np.ndarray] = None):
+        self.chunk_ids = chunk_ids
+        self.doc_codes = doc_codes
+        self.doc_ids = doc_ids
+        self.timestamps = timestamps
+        self.country_codes = country_codes
+        self.countries = countries
+        self.chunking_codes = chunking_codes
+        self.chunkings = chunkings
+        self.source_codes = source_codes
+        self.source_dirs = source_dirs
+        self.texts = texts
+        self.text_offsets = text_offsets
+        self.extra = extra or {}
+        self.days = epoch_days(timestamps) if days is None else days
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[Chunk]) -> "ChunkStore":
+        """
+        Timestamps come from meta["timestamp"] when present, otherwise from
+        the date in doc_id; country from meta["country"] or the doc_id prefix.
+        """
+        n = len(chunks)
+        timestamps = np.full(n, MISSING_TS, dtype=np.int64)
+        countries, chunkings, source_dirs = [], [], []
+        extra: Dict[int, Dict[str, Any]] = {}
+
+        for i, c in enumerate(chunks):
+            meta = dict(c.meta or {})
+
+            ts = meta.pop("timestamp", None)
+            if ts is None:
+                ts = date_from_name(c.doc_id)
+            if ts is not None:
+                timestamps[i] = to_unix_seconds(ts)
+
+            countries.append(meta.pop("country", None) or country_from_doc_id(c.doc_id))
+            chunkings.append(meta.pop("chunking", None))
+
+            source = meta.pop("source_path", None)
+            if source is not None and Path(source).name != f"{c.chunk_id}.txt":
+                meta["source_path"] = source  # does not follow the <dir>/<chunk_id>.txt layout
+                source = None
+            source_dirs.append(None if source is None else str(Path(source).parent))
+
+            if meta:
+                extra[i] = meta
+
+        encoded = [c.text.encode("utf-8") for c in chunks]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(t) for t in encoded])
+        texts = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        doc_codes, doc_ids = _encode([c.doc_id for c in chunks], np.int32)
+        country_codes, countries = _encode(countries, np.int8)
+        chunking_codes, chunkings = _encode(chunkings, np.int8)
+        source_codes, source_dirs = _encode(source_dirs, np.int32)
+
+        return cls([c.chunk_id for c in chunks], doc_codes, doc_ids, timestamps, country_codes, countries,
+                   chunking_codes, chunkings, source_codes, source_dirs, texts, offsets, extra)
+
+    def take(self, rows) -> "ChunkStore":
+        """
+        New store with the given rows, in the given order (vocabularies are shared).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = np.asarray(self.text_offsets[:-1])[rows]
+        ends = np.asarray(self.text_offsets[1:])[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        buf = np.asarray(self.texts)
+        texts = np.concatenate([buf[s:e] for s, e in zip(starts, ends)]) if len(rows) else buf[:0]
+        new_row = {int(r): j for j, r in enumerate(rows)}
+        return ChunkStore(
+            [self.chunk_ids[r] for r in rows],
+            np.asarray(self.doc_codes)[rows], self.doc_ids,
+            np.asarray(self.timestamps)[rows],
+            np.asarray(self.country_codes)[rows], self.countries,
+            np.asarray(self.chunking_codes)[rows], self.chunkings,
+            np.asarray(self.source_codes)[rows], self.source_dirs,
+            texts, offsets,
+            {new_row[r]: m for r, m in self.extra.items() if r in new_row},
+            np.asarray(self.days)[rows],
+        )
+
+    # -----------------------------
+    # Row access
+    # -----------------------------
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ChunkView(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return ChunkView(self, i)
+
+    def text(self, i: int) -> str:
+        start, end = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return self.texts[start:end].tobytes().decode("utf-8")
+
+    def doc_id(self, i: int) -> str:
+        return self.doc_ids[int(self.doc_codes[i])]
+
+    def timestamp(self, i: int) -> Optional[datetime]:
+        ts = int(self.timestamps[i])
+        return None if ts == MISSING_TS else EPOCH + timedelta(seconds=ts)
+
+    def meta(self, i: int) -> Dict[str, Any]:
+        meta: Dict[str, Any] = {}
+        source_dir = _decode(self.source_codes, self.source_dirs, i)
+        if source_dir is not None:
+            meta["source_path"] = str(Path(source_dir) / f"{self.chunk_ids[i]}.txt")
+        chunking = _decode(self.chunking_codes, self.chunkings, i)
+        if chunking is not None:
+            meta["chunking"] = chunking
+        ts = self.timestamp(i)
+        if ts is not None:
+            meta["timestamp"] = ts
+        meta.update(self.extra.get(i, {}))
+        return meta
+
+    def to_chunks(self) -> List[Chunk]:
+        return [Chunk(self.chunk_ids[i], self.doc_id(i), self.text(i), self.meta(i)) for i in range(len(self))]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: Path) -> None:
+        """
+        texts.bin, text_offsets.npy, timestamps.npy, epoch_days.npy, chunk_*.npy, chunks.json
+        """
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "texts.bin", "wb") as f:
+            f.write(np.asarray(self.texts, dtype=np.uint8).tobytes())
+        np.save(out / "text_offsets.npy", np.asarray(self.text_offsets, dtype=np.int64))
+        np.save(out / "timestamps.npy", np.asarray(self.timestamps, dtype=np.int64))
+        np.save(out / "epoch_days.npy", np.asarray(self.days, dtype=np.int32))
+        np.save(out / "chunk_doc.npy", np.asarray(self.doc_codes))
+        np.save(out / "chunk_country.npy", np.asarray(self.country_codes))
+        np.save(out / "chunk_chunking.npy", np.asarray(self.chunking_codes))
+        np.save(out / "chunk_source.npy", np.asarray(self.source_codes))
+        with open(out / "chunks.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "chunk_ids": self.chunk_ids,
+                "doc_ids": self.doc_ids,
+                "countries": self.countries,
+                "chunkings": self.chunkings,
+                "source_dirs": self.source_dirs,
+                "extra": {str(r): m for r, m in self.extra.items()},
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, src: Path, mmap_mode: Optional[str] = "r") -> "ChunkStore":
+        with open(src / "chunks.json", "r", encoding="utf-8") as f:
+            cols = json.load(f)
+        if mmap_mode is not None and (src / "texts.bin").stat().st_size > 0:
+            texts = np.memmap(src / "texts.bin", dtype=np.uint8, mode="r")
+        else:
+            texts = np.fromfile(src / "texts.bin", dtype=np.uint8)
+        return cls(
+            cols["chunk_ids"],
+            np.load(src / "chunk_doc.npy"), cols["doc_ids"],
+            np.load(src / "timestamps.npy"),
+            np.load(src / "chunk_country.npy"), cols["countries"],
+            np.load(src / "chunk_chunking.npy"), cols["chunkings"],
+            np.load(src / "chunk_source.npy"), cols["source_dirs"],
+            texts,
+            np.load(src / "text_offsets.npy", mmap_mode=mmap_mode),
+            {int(r): m for r, m in cols.get("extra", {}).items()},
+            np.load(src / "epoch_days.npy") if (src / "epoch_days.npy").exists() else None,
+        )
@@ -1,34 +1,48 @@
-from datetime import timedelta
-from scripts.retriever import retrieve
-from scripts.vectorization.vector_index import VectorIndex
+import numpy as np
 
-INDEX_PATHS = {
-    "fixed_660": "vector_indexes/fixed_660/vector_index.pkl",
-    "hierarchical": "vector_indexes/hierarchical/vector_index.pkl",
-}
+from scripts.common.dates import MISSING_TS
+from scripts.retrieval.retriever import PARTITION_REGISTRY, retrieve_window
+
+def early_late_windows(first_ts, last_ts, months=8):
+    """
+    [start, end) Unix-second windows covering the first and the last
+    `months` (30-day months) between two dated timestamps.
+    """
+    window = 30 * months * 86400
+    return (int(first_ts), int(first_ts) + window + 1), (int(last_ts) - window, int(last_ts) + 1)
 
-def split_early_late(chunks, months=8):
-    chunks = sorted(chunks, key=lambda c: c.meta["timestamp"])
 
-    start = chunks[0].meta["timestamp"]
-    end = chunks[-1].meta["timestamp"]
+def split_early_late(chunks, months=8):
+    """
+    Early / late windows over a time-ordered ChunkStore, found by binary
+    search on its timestamp column (undated chunks are ignored).
+    """
+    ts = chunks.timestamps
+    n_dated = int(np.searchsorted(ts, MISSING_TS, side="left"))
+    if n_dated == 0:
+        return [], []
 
-    early_end = start + timedelta(days=30 * months)
-    late_start = end - timedelta(days=30 * months)
+    (_, early_end), (late_start, _) = early_late_windows(ts[0], ts[n_dated - 1], months)
 
-    early = [c for c in chunks if c.meta["timestamp"] <= early_end]
-    late = [c for c in chunks if c.meta["timestamp"] >= late_start]
+    early = chunks[:int(np.searchsorted(ts[:n_dated], early_end, side="left"))]
+    late = chunks[int(np.searchsorted(ts[:n_dated], late_start, side="left")):n_dated]
 
     return early, late
 
 
-def evolution_retrieve(query, method, chunking_type, k=5):
-    index = VectorIndex.load(INDEX_PATHS[chunking_type])
+def evolution_retrieve(query, method, chunking_type, k=5, months=8):
+    """
+    Top-k for the query within the early and within the late window
+    (see split_early_late), each retrieved on the month-partitioned index.
+    """
+    pindex = PARTITION_REGISTRY.get(chunking_type)
+    if pindex.min_ts is None:
+        return [], []
 
-    early_chunks, late_chunks = split_early_late(index.chunks)
+    early, late = early_late_windows(pindex.min_ts, pindex.max_ts, months)
 
-    early_results = retrieve(query, method, chunking_type, k)
-    late_results = retrieve(query, method, chunking_type, k)
+    early_results = retrieve_window(query, method, chunking_type, k, *early, parse_dates=False)
+    late_results = retrieve_window(query, method, chunking_type, k, *late, parse_dates=False)
 
     return early_results, late_results
 
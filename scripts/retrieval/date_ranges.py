@@ -0,0 +1,250 @@
+# date_ranges.py
+# Query-time temporal constraints: date phrases in a query -> date
+# intervals, as [start_ts, end_ts) Unix-second ranges the retrieval layer
+# turns into row ranges.
+#
+#   "in 2023"                             -> 2023
+#   "in March 2024", "Mar 2024"           -> that month
+#   "last quarter of 2023", "Q4 2023"     -> 2023-10-01 .. 2023-12-31
+#   "first half of 2024", "H1 2024"       -> 2024-01-01 .. 2024-06-30
+#   "first and last quarter of 2023",
+#   "Q1 and Q3 2024"                      -> one interval per quarter
+#   "between 2019 and 2024",
+#   "from March 2023 to June 2024"        -> one interval over both ends
+#   "his first and last speech"           -> first / last document day
+#   "the earliest and latest documents"   -> first / last `months` months
+#
+# Each match consumes its span, so "last quarter of 2023" is neither read
+# again as the year 2023 nor as a corpus-relative "last". Corpus-relative
+# phrases need the corpus' first and last timestamp, and are only read
+# when the query names no absolute dates. Only the temporal entry points
+# (early / late windows, see temporal_retrieval) pass those bounds: in plain
+# retrieval "the latest report on inflation" is not a one-day filter.
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+from scripts.common.dates import EPOCH, to_unix_seconds
+
+# Length of a plural corpus-relative window ("earliest documents")
+RELATIVE_MONTHS = 8
+
+# Part of the result-cache key: bump when parsing changes what a query matches
+PARSER_VERSION = 3
+
+_YEAR = r"(?:19|20)\d{2}"
+
+_MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6,
+    "july": 7, "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8,
+    "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = "(?:" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+
+_ORDINALS = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+    "fourth": 4, "4th": 4, "last": -1, "final": -1,
+}
+_ORDINAL = "(?:" + "|".join(_ORDINALS) + ")"
+_ORDINAL_RE = re.compile(rf"\b{_ORDINAL}\b", re.I)
+
+# Coordinated parts of one year: "first and last", "Q1, Q2 and Q4"
+_AND = r"(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*&\s*)(?:the\s+)?"
+_ORDINALS_LIST = rf"{_ORDINAL}(?:{_AND}{_ORDINAL})*"
+
+# A month-or-year end point of an explicit range: "2019", "March 2023"
+_POINT = rf"(?:({_MONTH})\s+(?:of\s+)?)?({_YEAR})"
+
+_DOC_NOUN = (r"(?:speech(?:es)?|address(?:es)?|statements?|documents?|debates?|"
+             r"sessions?|remarks|hearings?|records?|reports?)")
+_FIRST = r"(?:first|earliest)"
+_LAST = r"(?:last|latest|final|most\s+recent)"
+
+_RANGE_RES = [
+    re.compile(rf"\b(?:between|from)\s+{_POINT}\s+(?:and|to|until|till|through)\s+{_POINT}\b", re.I),
+    re.compile(rf"\b{_POINT}\s*(?:-|–|to|through)\s*{_POINT}\b", re.I),
+]
+_QUARTER_RES = [
+    (re.compile(rf"\b(?:the\s+)?({_ORDINALS_LIST})\s+quarters?\s+(?:of\s+|in\s+)?({_YEAR})\b", re.I), "ordinal"),
+    (re.compile(rf"\b(Q[1-4](?:{_AND}Q[1-4])*)\s*(?:of\s+)?({_YEAR})\b", re.I), "number"),
+    (re.compile(rf"\b({_YEAR})\s*Q([1-4])\b", re.I), "year_first"),
+]
+_HALF_RES = [
+    (re.compile(rf"\b(?:the\s+)?({_ORDINALS_LIST})\s+(?:half|halves)\s+(?:of\s+|in\s+)?({_YEAR})\b", re.I), "ordinal"),
+    (re.compile(rf"\b(H[12](?:{_AND}H[12])*)\s*(?:of\s+)?({_YEAR})\b", re.I), "number"),
+]
+_PART_NUMBER_RE = re.compile(r"[QH]([1-4])", re.I)
+_MONTH_RE = re.compile(rf"\b({_MONTH})\s+(?:of\s+)?({_YEAR})\b", re.I)
+_YEAR_RE = re.compile(rf"\b({_YEAR})\b")
+_RELATIVE_RES = [
+    re.compile(rf"\b({_FIRST})\s+and\s+(?:the\s+|his\s+|her\s+|their\s+)?({_LAST})\s+(?:\w+\s+){{0,2}}?({_DOC_NOUN})\b", re.I),
+    re.compile(rf"\b({_FIRST}|{_LAST})\s+(?:\w+\s+){{0,2}}?({_DOC_NOUN})\b", re.I),
+]
+
+
+@dataclass(frozen=True)
+class DateInterval:
+    start_ts: int    # inclusive, Unix seconds
+    end_ts: int      # exclusive
+    kind: str        # year | month | quarter | half | range | first | last
+    phrase: str
+
+    @property
+    def first_day(self) -> date:
+        return (EPOCH + timedelta(seconds=self.start_ts)).date()
+
+    @property
+    def last_day(self) -> date:
+        return (EPOCH + timedelta(seconds=self.end_ts - 1)).date()
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _months_ts(year: int, month: int, n: int) -> Tuple[int, int]:
+    """
+    [start, end) of n calendar months starting at year-month.
+    """
+    start = date(year, month, 1)
+    return to_unix_seconds(start), to_unix_seconds(start + relativedelta(months=n))
+
+
+def _month_number(name: str) -> int:
+    return _MONTHS[name.lower().rstrip(".")]
+
+
+def _point_ts(month: Optional[str], year: str) -> Tuple[int, int]:
+    if month:
+        return _months_ts(int(year), _month_number(month), 1)
+    return _months_ts(int(year), 1, 12)
+
+
+def _ordinal(word: str, last: int) -> int:
+    n = _ORDINALS[word.lower()]
+    return last if n == -1 else n
+
+
+def _parts(words: str, form: str, last: int) -> List[int]:
+    """
+    Part numbers of a (possibly coordinated) "first and last" / "Q1 and Q3".
+    """
+    if form == "ordinal":
+        return [_ordinal(w, last) for w in _ORDINAL_RE.findall(words)]
+    return [int(n) for n in _PART_NUMBER_RE.findall(words)]
+
+
+def _relative(which: str, plural: bool, min_ts: int, max_ts: int, months: int) -> Tuple[int, int]:
+    """
+    A single document ("first speech") is the first / last dated day; a
+    plural one ("earliest documents") the first / last `months` months.
+    """
+    first = which.lower() in ("first", "earliest")
+    if not plural:
+        day = (min_ts if first else max_ts) // 86400 * 86400
+        return day, day + 86400
+    if first:
+        end = EPOCH + timedelta(seconds=min_ts) + relativedelta(months=months)
+        return min_ts, to_unix_seconds(end) + 1
+    start = EPOCH + timedelta(seconds=max_ts) - relativedelta(months=months)
+    return to_unix_seconds(start), max_ts + 1
+
+
+# -----------------------------
+# Parser
+# -----------------------------
+def parse_date_ranges(query: str, min_ts: Optional[int] = None, max_ts: Optional[int] = None,
+                      months: int = RELATIVE_MONTHS) -> List[DateInterval]:
+    """
+    Every date interval the query names, oldest first. min_ts / max_ts
+    (first and last timestamp of the corpus being searched) anchor
+    "first" / "last" / "earliest" / "latest" phrases; without them those
+    phrases are ignored.
+    """
+    text = query
+    found: List[DateInterval] = []
+
+    def take(m: re.Match, start_ts: int, end_ts: int, kind: str):
+        nonlocal text
+        found.append(DateInterval(start_ts, end_ts, kind, m.group(0)))
+        # Blank the span (same length, so later offsets stay valid)
+        text = text[:m.start()] + " " * (m.end() - m.start()) + text[m.end():]
+
+    for regex in _RANGE_RES:
+        for m in list(regex.finditer(text)):
+            a = _point_ts(m.group(1), m.group(2))
+            b = _point_ts(m.group(3), m.group(4))
+            a, b = sorted((a, b))
+            take(m, a[0], b[1], "range")
+
+    for regex, form in _QUARTER_RES:
+        for m in list(regex.finditer(text)):
+            if form == "year_first":
+                year, quarters = m.group(1), [int(m.group(2))]
+            else:
+                year, quarters = m.group(2), _parts(m.group(1), form, 4)
+            for q in dict.fromkeys(quarters):
+                if 1 <= q <= 4:
+                    take(m, *_months_ts(int(year), 3 * q - 2, 3), "quarter")
+
+    for regex, form in _HALF_RES:
+        for m in list(regex.finditer(text)):
+            for h in dict.fromkeys(_parts(m.group(1), form, 2)):
+                if 1 <= h <= 2:
+                    take(m, *_months_ts(int(m.group(2)), 6 * h - 5, 6), "half")
+
+    for m in list(_MONTH_RE.finditer(text)):
+        take(m, *_months_ts(int(m.group(2)), _month_number(m.group(1)), 1), "month")
+
+    for m in list(_YEAR_RE.finditer(text)):
+        take(m, *_months_ts(int(m.group(1)), 1, 12), "year")
+
+    # Relative phrases only when the query names no absolute dates
+    if not found and min_ts is not None and max_ts is not None:
+        for regex in _RELATIVE_RES:
+            for m in list(regex.finditer(text)):
+                noun = m.group(m.lastindex)
+                plural = noun.lower().endswith("s") and noun.lower() not in ("address",)
+                for which in m.groups()[:-1]:
+                    kind = "first" if which.lower() in ("first", "earliest") else "last"
+                    take(m, *_relative(which, plural, min_ts, max_ts, months), kind)
+
+    found.sort(key=lambda iv: (iv.start_ts, iv.end_ts))
+    return found
+
+
+# -----------------------------
+# Range arithmetic
+# -----------------------------
+def merge_intervals(intervals: Sequence[DateInterval]) -> List[Tuple[int, int]]:
+    """
+    Disjoint, sorted [start_ts, end_ts) ranges covering the intervals.
+    """
+    merged: List[List[int]] = []
+    for iv in sorted(intervals, key=lambda iv: iv.start_ts):
+        if merged and iv.start_ts <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], iv.end_ts)
+        else:
+            merged.append([iv.start_ts, iv.end_ts])
+    return [(lo, hi) for lo, hi in merged]
+
+
+def clip_ranges(ranges: Sequence[Tuple[int, int]], start_ts: Optional[int] = None,
+                end_ts: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    The non-empty parts of `ranges` inside [start_ts, end_ts) (None = open).
+    """
+    out = []
+    for lo, hi in ranges:
+        if start_ts is not None:
+            lo = max(lo, start_ts)
+        if end_ts is not None:
+            hi = min(hi, end_ts)
+        if lo < hi:
+            out.append((lo, hi))
+    return out
@@ -0,0 +1,57 @@
+# fusion.py
+# Hybrid fusion over a candidate set: each signal contributes its top-N rows,
+# and the signals are combined over the union of those rows only.
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+FUSION_METHODS = ("rrf", "zscore", "minmax")
+
+# Per-signal weights (the original hybrid blend)
+DEFAULT_WEIGHTS = {"bm25": 0.3, "dense": 0.7}
+RRF_K = 60
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """
+    1-based rank of every entry, best score first (ties keep input order).
+    """
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[order] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+def _normalize(scores: np.ndarray, method: str) -> np.ndarray:
+    if method == "rrf":
+        return 1.0 / (RRF_K + _ranks(scores))
+    if method == "zscore":
+        return (scores - scores.mean()) / (scores.std() + 1e-6)
+    lo, hi = scores.min(), scores.max()
+    return (scores - lo) / (hi - lo + 1e-6)
+
+
+def fuse(signal_scores: Dict[str, np.ndarray], method: str = "minmax",
+         weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Fused score per candidate.
+
+    signal_scores: {signal name: scores of every union candidate}, all
+    aligned on the same candidate order. Each signal is normalized over
+    the candidates (reciprocal rank, z-score or min-max) and the results
+    are summed with the given weights.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+    if len(signal_scores) == 1:
+        # A single signal needs no normalization
+        return np.asarray(next(iter(signal_scores.values())), dtype=np.float64)
+
+    weights = weights or DEFAULT_WEIGHTS
+    fused = None
+    for name, scores in signal_scores.items():
+        part = weights.get(name, 1.0) * _normalize(np.asarray(scores, dtype=np.float64), method)
+        fused = part if fused is None else fused + part
+    return fused
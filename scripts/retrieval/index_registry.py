@@ -0,0 +1,160 @@
+# index_registry.py
+# Keeps loaded VectorIndex objects warm across retrieve() calls.
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from scripts.vectorization.vector_index import MANIFEST_NAME, VectorIndex
+
+
+# -----------------------------
+# Helpers: artifact signature / size
+# -----------------------------
+def _artifact_signature(path: str) -> Tuple[Any, ...]:
+    """
+    (mtime_ns, version) of an index artifact.
+    For directories the manifest is the commit point, so its mtime is used
+    (plain and partitioned indexes both have one).
+    """
+    p = Path(path)
+    if p.is_dir():
+        st = os.stat(p / MANIFEST_NAME)
+        with open(p / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return (st.st_mtime_ns, json.load(f).get("version"))
+    st = os.stat(p)
+    return (st.st_mtime_ns, None)
+
+
+def _artifact_nbytes(path: str) -> int:
+    """
+    Size of the artifact on disk; an upper bound on what the index
+    occupies once all of its pages are resident.
+    """
+    p = Path(path)
+    if p.is_dir():
+        # Only the generation the manifest names; the previous one is kept
+        # on disk for readers still opening it
+        with open(p / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            data = json.load(f).get("data")
+        root = p / data if data else p
+        return sum(f.stat().st_size for f in root.rglob("*") if f.is_file())
+    return p.stat().st_size
+
+
+@dataclass
+class _Entry:
+    index: VectorIndex
+    signature: Tuple[Any, ...]
+    nbytes: int
+    load_seconds: float
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+class IndexRegistry:
+    """
+    Process-resident cache of indexes keyed by chunking type.
+    - keeps indexes warm between calls
+    - evicts least-recently-used entries above memory_budget_mb
+    - reloads an entry when its artifact's mtime or version changes
+    - counts hits / misses / reloads / evictions / load time
+    """
+
+    def __init__(
+        self,
+        paths: Dict[str, str],
+        memory_budget_mb: Optional[float] = None,
+        loader: Callable[[str], VectorIndex] = VectorIndex.load,
+    ):
+        self.paths = dict(paths)
+        self.memory_budget_mb = memory_budget_mb
+        self.loader = loader
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, chunking_type: str) -> VectorIndex:
+        if chunking_type not in self.paths:
+            raise KeyError(f"Unknown chunking type: {chunking_type}")
+        path = self.paths[chunking_type]
+
+        with self._lock:
+            signature = _artifact_signature(path)
+            entry = self._entries.get(chunking_type)
+
+            if entry is not None and entry.signature == signature:
+                self.hits += 1
+                self._entries.move_to_end(chunking_type)
+                return entry.index
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+                del self._entries[chunking_type]
+
+            t0 = time.perf_counter()
+            index = self.loader(path)
+            elapsed = time.perf_counter() - t0
+            self.load_seconds += elapsed
+
+            self._entries[chunking_type] = _Entry(index, signature, _artifact_nbytes(path), elapsed)
+            self._evict(keep=chunking_type)
+            return index
+
+    def _evict(self, keep: str):
+        if self.memory_budget_mb is None:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        while self.resident_bytes() > budget and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            del self._entries[oldest]
+            self.evictions += 1
+
+    def fingerprint(self, chunking_type: str) -> str:
+        """
+        Identity of the artifact on disk (path, mtime, version), read
+        without loading the index; changes whenever the index is rebuilt.
+        """
+        if chunking_type not in self.paths:
+            raise KeyError(f"Unknown chunking type: {chunking_type}")
+        path = self.paths[chunking_type]
+        return ":".join([path, *map(str, _artifact_signature(path))])
+
+    def resident_bytes(self) -> int:
+        return sum(e.nbytes for e in self._entries.values())
+
+    def invalidate(self, chunking_type: Optional[str] = None):
+        with self._lock:
+            if chunking_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(chunking_type, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.reloads
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "load_seconds": self.load_seconds,
+            "resident_mb": self.resident_bytes() / (1024 * 1024),
+            "loaded": {k: round(e.load_seconds, 4) for k, e in self._entries.items()},
+        }
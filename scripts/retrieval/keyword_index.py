@@ -0,0 +1,127 @@
+# keyword_index.py
+# Term -> entry inverted index over the Stage 2 temporal index, for the
+# keyword-overlap scorers (retrieve_eval, Stage 3 score_baseline).
+#
+# Score of an entry = number of distinct query terms that occur in its
+# text_preview as whole tokens. It is computed by merging the query terms'
+# posting lists instead of testing every term against every preview.
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def keyword_terms(text: str) -> List[str]:
+    """
+    Lowercased whole tokens (same split as normalize_query / score_baseline).
+    """
+    return _WORD_RE.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    CSR postings: entries containing term t are
+    post_docs[indptr[t]:indptr[t + 1]] (sorted positions in `entries`).
+    """
+
+    def __init__(self, entries: Sequence[Any], vocab: Dict[str, int], indptr: np.ndarray, post_docs: np.ndarray):
+        self.entries = entries
+        self.vocab = vocab
+        self.indptr = indptr
+        self.post_docs = post_docs
+        self._pos = {id(e): i for i, e in enumerate(entries)}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, entries: Sequence[Any], field: str = "text_preview") -> "KeywordIndex":
+        """
+        One pass over the entries. Pass the index to retrieve_eval /
+        score_baseline (index=...) to score any sub-list of `entries`.
+        """
+        vocab: Dict[str, int] = {}
+        term_ids = array("i")
+        lengths = array("q")
+        for e in entries:
+            terms = set(keyword_terms(e.get(field) or ""))
+            term_ids.extend([vocab.setdefault(t, len(vocab)) for t in terms])
+            lengths.append(len(terms))
+
+        term_of = np.frombuffer(term_ids, dtype=np.int32) if term_ids else np.zeros(0, dtype=np.int32)
+        doc_of = np.repeat(np.arange(len(entries), dtype=np.int32), np.frombuffer(lengths, dtype=np.int64))
+
+        # Group by term; the stable sort keeps each posting list in entry order
+        order = np.argsort(term_of, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_of, minlength=len(vocab)), out=indptr[1:])
+
+        return cls(entries, vocab, indptr, doc_of[order])
+
+    @classmethod
+    def lookup(cls, entries: Sequence[Any], index: Optional["KeywordIndex"] = None) -> "KeywordIndex":
+        """
+        `index` if it holds every one of `entries`, else a throwaway index
+        built over them.
+        """
+        if index is not None and index.covers(entries):
+            return index
+        return cls.build(entries)
+
+    def covers(self, subset: Sequence[Any]) -> bool:
+        """
+        True if every element of `subset` is one of this index's entries
+        (the same object; the index keeps them alive, so ids stay unique).
+        """
+        if subset is self.entries:
+            return True
+        pos, entries = self._pos, self.entries
+        for e in subset:
+            i = pos.get(id(e))
+            if i is None or entries[i] is not e:
+                return False
+        return True
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def _positions(self, subset: Sequence[Any]) -> np.ndarray:
+        if subset is self.entries:
+            return np.arange(len(self.entries), dtype=np.int64)
+        pos = self._pos
+        return np.fromiter((pos[id(e)] for e in subset), dtype=np.int64, count=len(subset))
+
+    def match(self, query: str, subset: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (indices into `subset`, scores) of every subset entry sharing at
+        least one term with the query, best first; ties keep subset order.
+        """
+        term_ids = {self.vocab[t] for t in keyword_terms(query) if t in self.vocab}
+        if not term_ids or not len(subset):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Merge the posting lists: each entry appears once per matching term
+        postings = np.concatenate([self.post_docs[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        docs, counts = np.unique(postings, return_counts=True)
+
+        # Restrict to the subset and map back to subset order
+        rank = np.full(len(self.entries), -1, dtype=np.int64)
+        rank[self._positions(subset)] = np.arange(len(subset))
+        sub = rank[docs]
+        keep = sub >= 0
+        sub, counts = sub[keep], counts[keep]
+
+        order = np.lexsort((sub, -counts))
+        return sub[order], counts[order]
+
+    def top_k(self, query: str, subset: Sequence[Any], k: int) -> List[Any]:
+        idx, _ = self.match(query, subset)
+        return [subset[i] for i in idx[:k]]
@@ -0,0 +1,206 @@
+# rerank.py
+# Optional cascade rerank stage after fusion: a local cross-encoder rescores
+# the head of the fused list, as far down as a per-query latency budget allows.
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from scripts.retrieval.retriever import retrieve
+from scripts.vectorization.model_pool import get_cross_encoder
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Most fused candidates a query may send to the cross-encoder
+RERANK_CANDIDATES = 50
+# Per-query time allowed for reranking (cache hits are free)
+RERANK_BUDGET_MS = 150.0
+# Pairs per cross-encoder call; the cascade checks budget and margin between calls
+RERANK_BATCH = 8
+# Stop once a whole batch scores this far below the current k-th best
+RERANK_MARGIN = 2.0
+# (query, chunk_id) scores kept across calls
+PAIR_CACHE_SIZE = 50_000
+
+LATENCY_WINDOW = 2048
+
+
+class PairScoreCache:
+    """
+    LRU of cross-encoder scores keyed by (query, chunk_id).
+    """
+
+    def __init__(self, max_items: int = PAIR_CACHE_SIZE):
+        self.max_items = max_items
+        self._scores: "OrderedDict[tuple[str, str], float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str, chunk_id: str) -> Optional[float]:
+        key = (query, chunk_id)
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, query: str, chunk_id: str, score: float) -> None:
+        self._scores[(query, chunk_id)] = score
+        self._scores.move_to_end((query, chunk_id))
+        while len(self._scores) > self.max_items:
+            self._scores.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class CascadeReranker:
+    """
+    Reranks a fused candidate list (best first) in batches of `batch_size`:
+      - cached (query, chunk_id) pairs cost nothing
+      - before each call, the cost of the next batch is estimated from the
+        running time per pair; the cascade stops if it would exceed the budget
+      - once k candidates are scored, it stops when a whole batch falls more
+        than `margin` below the k-th best score (the tail is not catching up)
+    Reranked candidates come first, by cross-encoder score; the rest keep
+    their fused order after them.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, device: Optional[str] = None,
+                 budget_ms: float = RERANK_BUDGET_MS, max_candidates: int = RERANK_CANDIDATES,
+                 batch_size: int = RERANK_BATCH, margin: float = RERANK_MARGIN,
+                 cache_size: int = PAIR_CACHE_SIZE):
+        self.model_name = model_name
+        self.device = device
+        self.budget_ms = budget_ms
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.margin = margin
+        self.cache = PairScoreCache(cache_size)
+
+        self._ms_per_pair: Optional[float] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """
+        Clears the counters and latency samples (not the pair cache).
+        """
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.queries = 0
+        self.pairs_scored = 0
+        self.margin_stops = 0
+        self.budget_stops = 0
+        self.cache.hits = 0
+        self.cache.misses = 0
+
+    @property
+    def model(self):
+        return get_cross_encoder(self.model_name, self.device)
+
+    def _predict(self, query: str, texts: List[str]) -> np.ndarray:
+        t0 = time.perf_counter()
+        scores = np.asarray(
+            self.model.predict([(query, t) for t in texts], batch_size=self.batch_size, show_progress_bar=False),
+            dtype=np.float64,
+        ).reshape(-1)
+        ms = (time.perf_counter() - t0) * 1000.0 / max(len(texts), 1)
+        # Running estimate of the cost per pair, used to plan the next batch
+        self._ms_per_pair = ms if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * ms
+        self.pairs_scored += len(texts)
+        return scores
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], k: int,
+               budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k of `candidates` (retrieve() results, best first) after the
+        cascade. Reranked results get a "rerank_score" key.
+        """
+        t0 = time.perf_counter()
+        budget = self.budget_ms if budget_ms is None else budget_ms
+        head = candidates[:self.max_candidates]
+        scores: Dict[int, float] = {}
+
+        pos = 0
+        while pos < len(head):
+            batch = list(range(pos, min(pos + self.batch_size, len(head))))
+            pos = batch[-1] + 1
+
+            todo = []
+            for i in batch:
+                cached = self.cache.get(query, head[i]["chunk_id"])
+                if cached is None:
+                    todo.append(i)
+                else:
+                    scores[i] = cached
+
+            if todo:
+                # The first batch always runs, so every query gets some reranking
+                elapsed = (time.perf_counter() - t0) * 1000.0
+                if self._ms_per_pair is not None and scores and elapsed + len(todo) * self._ms_per_pair > budget:
+                    self.budget_stops += 1
+                    break
+                for i, s in zip(todo, self._predict(query, [head[i]["text"] for i in todo])):
+                    scores[i] = float(s)
+                    self.cache.put(query, head[i]["chunk_id"], float(s))
+
+            if len(scores) > k:
+                kth = np.partition(np.fromiter(scores.values(), dtype=np.float64), -k)[-k]
+                if max(scores[i] for i in batch) < kth - self.margin:
+                    self.margin_stops += 1
+                    break
+
+        reranked = sorted(scores, key=lambda i: (-scores[i], i))
+        rest = [i for i in range(len(candidates)) if i not in scores]
+        results = [dict(candidates[i], rerank_score=scores[i]) for i in reranked]
+        results += [candidates[i] for i in rest[:max(k - len(results), 0)]]
+
+        self.queries += 1
+        self.latencies.append((time.perf_counter() - t0) * 1000.0)
+        return results[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Added latency (p50 / p95 over the last LATENCY_WINDOW queries) and
+        how often each cutoff fired.
+        """
+        ms = np.fromiter(self.latencies, dtype=np.float64)
+        return {
+            "queries": self.queries,
+            "pairs_scored": self.pairs_scored,
+            "pairs_per_query": round(self.pairs_scored / self.queries, 2) if self.queries else 0.0,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "margin_stops": self.margin_stops,
+            "budget_stops": self.budget_stops,
+            "p50_ms": round(float(np.percentile(ms, 50)), 3) if len(ms) else 0.0,
+            "p95_ms": round(float(np.percentile(ms, 95)), 3) if len(ms) else 0.0,
+        }
+
+
+_DEFAULT_RERANKER: Optional[CascadeReranker] = None
+
+
+def get_reranker() -> CascadeReranker:
+    """
+    Process-wide reranker (shares its pair cache and latency stats).
+    """
+    global _DEFAULT_RERANKER
+    if _DEFAULT_RERANKER is None:
+        _DEFAULT_RERANKER = CascadeReranker()
+    return _DEFAULT_RERANKER
+
+
+def retrieve_reranked(query: str, method: str, chunking_type: str, k: int,
+                      reranker: Optional[CascadeReranker] = None, budget_ms: Optional[float] = None,
+                      **retrieve_kwargs) -> List[Dict[str, Any]]:
+    """
+    retrieve() for the top max_candidates, then the cascade rerank down to k.
+    """
+    reranker = reranker or get_reranker()
+    candidates = retrieve(query, method, chunking_type, max(k, reranker.max_candidates), **retrieve_kwargs)
+    return reranker.rerank(query, candidates, k, budget_ms=budget_ms)
@@ -0,0 +1,218 @@
+# result_cache.py
+# Cache of final retrieve() result lists, in front of retrieve_batch().
+#
+# Key: normalized query + every setting that changes the ranking + the
+# index fingerprint (artifact path, mtime, format version). Rebuilding an
+# index changes its fingerprint, so stale entries are simply never hit.
+# k is not part of the key: an entry stored for k=10 also answers k=5.
+#
+# The on-disk file is append-only between compactions: superseded lines
+# (an entry re-stored for a larger k) are dropped when the file is first
+# scanned, and once it grows past RESULT_CACHE_DISK_MB the oldest entries
+# are dropped too, down to 3/4 of the cap.
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from scripts.vectorization.embedding_cache import normalize_query_text
+
+# Default location of the on-disk tier (None disables it)
+RESULT_CACHE_DIR: Optional[str] = "vector_indexes/result_cache"
+RESULT_CACHE_MEMORY_ENTRIES = 4096
+RESULT_CACHE_DISK_MB = 256
+
+Results = List[Dict[str, Any]]
+
+
+class ResultCache:
+    """
+    Two tiers:
+      1. in-memory LRU of (k, results) per key (max_memory_entries)
+      2. append-only results.jsonl under cache_dir (survives restarts);
+         one {"key", "k", "results"} line per entry, later lines win;
+         compacted to the last line per key, oldest entries first out
+         above max_disk_mb
+    """
+
+    def __init__(self, cache_dir: str | Path | None = RESULT_CACHE_DIR,
+                 max_memory_entries: int = RESULT_CACHE_MEMORY_ENTRIES,
+                 max_disk_mb: float = RESULT_CACHE_DISK_MB):
+        self.path = Path(cache_dir) / "results.jsonl" if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._memory: "OrderedDict[str, Tuple[int, Results]]" = OrderedDict()
+        self._offsets: Optional[Dict[str, Tuple[int, int]]] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.truncated = 0
+        self.compactions = 0
+
+    @staticmethod
+    def key(query: str, **params: Any) -> str:
+        raw = json.dumps([normalize_query_text(query), sorted(params.items())], default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    # -----------------------------
+    # Disk tier
+    # -----------------------------
+    def _disk_offsets(self) -> Dict[str, Tuple[int, int]]:
+        """
+        key -> (stored k, byte offset of its line), scanned once on first use.
+        A torn last line (crash mid-append) is ignored; a file holding
+        superseded or torn lines, or over the size cap, is compacted.
+        """
+        if self._offsets is None:
+            self._offsets = {}
+            self._disk_bytes = 0
+            lines = 0
+            if self.path is not None and self.path.exists():
+                with open(self.path, "rb") as f:
+                    offset = 0
+                    for line in f:
+                        lines += 1
+                        try:
+                            entry = json.loads(line)
+                            self._offsets[entry["key"]] = (int(entry["k"]), offset)
+                        except (ValueError, KeyError):
+                            pass
+                        offset += len(line)
+                self._disk_bytes = offset
+            if lines > len(self._offsets) or self._disk_bytes > self.max_disk_bytes:
+                self._compact(self.max_disk_bytes)
+        return self._offsets
+
+    def _compact(self, max_bytes: int):
+        """
+        Rewrites results.jsonl with the live line of each key, newest
+        entries first in line until max_bytes is reached; older ones are
+        dropped. The new file replaces the old one atomically.
+        """
+        by_offset = sorted(self._offsets.items(), key=lambda item: item[1][1])
+        kept: List[Tuple[str, int, bytes]] = []
+        size = 0
+        with open(self.path, "rb") as f:
+            for key, (k, offset) in reversed(by_offset):
+                f.seek(offset)
+                line = f.readline()
+                if size + len(line) > max_bytes:
+                    break
+                kept.append((key, k, line))
+                size += len(line)
+
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        offsets: Dict[str, Tuple[int, int]] = {}
+        with open(tmp, "wb") as f:
+            for key, k, line in reversed(kept):
+                offsets[key] = (k, f.tell())
+                f.write(line)
+        os.replace(tmp, self.path)
+        self._offsets = offsets
+        self._disk_bytes = size
+        self.compactions += 1
+
+    def _read_disk(self, offset: int) -> Results:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["results"]
+
+    def _write_disk(self, key: str, k: int, results: Results):
+        line = (json.dumps({"key": key, "k": k, "results": results}, ensure_ascii=False) + "\n").encode("utf-8")
+        offsets = self._disk_offsets()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        offsets[key] = (k, offset)
+        self._disk_bytes = offset + len(line)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._compact(self.max_disk_bytes * 3 // 4)
+
+    # -----------------------------
+    # Lookup / store
+    # -----------------------------
+    @staticmethod
+    def _covers(stored_k: int, results: Results, k: int) -> bool:
+        # A list shorter than its k holds every match, so it answers any k
+        return stored_k >= k or len(results) < stored_k
+
+    def _remember(self, key: str, k: int, results: Results):
+        self._memory[key] = (k, results)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, k: int) -> Optional[Results]:
+        """
+        Top-k results for key (copies), or None if no stored entry covers k.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._covers(entry[0], entry[1], k):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._serve(entry, k)
+
+            if self.path is not None:
+                on_disk = self._disk_offsets().get(key)
+                if on_disk is not None and (entry is None or on_disk[0] > entry[0]):
+                    entry = (on_disk[0], self._read_disk(on_disk[1]))
+                    self._remember(key, *entry)
+                    if self._covers(entry[0], entry[1], k):
+                        self.disk_hits += 1
+                        return self._serve(entry, k)
+
+            self.misses += 1
+            return None
+
+    def _serve(self, entry: Tuple[int, Results], k: int) -> Results:
+        stored_k, results = entry
+        if k < stored_k:
+            self.truncated += 1
+        return [dict(r) for r in results[:k]]
+
+    def put(self, key: str, k: int, results: Results):
+        """
+        Stores results for key unless an entry for a larger k is already held.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= k:
+                return
+            results = [dict(r) for r in results]
+            self._remember(key, k, results)
+            if self.path is not None:
+                on_disk = self._disk_offsets().get(key)
+                if on_disk is None or on_disk[0] < k:
+                    self._write_disk(key, k, results)
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._memory.clear()
+            if disk and self.path is not None and self.path.exists():
+                self.path.unlink()
+                self._offsets = None
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "truncated": self.truncated,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._offsets) if self._offsets is not None else 0,
+            "disk_bytes": self._disk_bytes,
+            "compactions": self.compactions,
+        }
@@ -9,18 +9,70 @@
 
 import re
 import numpy as np
-from datetime import datetime
-from sklearn.metrics.pairwise import cosine_similarity
 from scripts.vectorization.vector_index import VectorIndex
+from scripts.vectorization.partitioned_index import PartitionedIndex
+from scripts.retrieval.index_registry import IndexRegistry
+from scripts.common.dates import year_bounds
+from scripts.retrieval.date_ranges import PARSER_VERSION, clip_ranges, merge_intervals, parse_date_ranges
+from scripts.retrieval.time_decay import apply_time_decay, as_of_day
+from scripts.retrieval.fusion import DEFAULT_WEIGHTS, fuse
+from scripts.retrieval.result_cache import ResultCache
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.vectorization.token_streams import bm25_tokenize_cached
 
 # timestamp_iso
 
 # Paths to pre-built vector indexes
 INDEX_PATHS = {
-    "fixed_660": "vector_indexes/fixed_660/vector_index.pkl",
-    "hierarchical": "vector_indexes/hierarchical/vector_index.pkl",
+    "fixed_660": "vector_indexes/fixed_660/vector_index",
+    "hierarchical": "vector_indexes/hierarchical/vector_index",
 }
 
+# Loaded indexes stay resident; least-recently-used ones are dropped above this budget
+INDEX_MEMORY_BUDGET_MB = 4096
+
+INDEX_REGISTRY = IndexRegistry(INDEX_PATHS, memory_budget_mb=INDEX_MEMORY_BUDGET_MB)
+
+# Month-partitioned copies of the same indexes, for time-window queries
+PARTITIONED_INDEX_PATHS = {
+    "fixed_660": "vector_indexes/fixed_660/partitioned_index",
+    "hierarchical": "vector_indexes/hierarchical/partitioned_index",
+}
+
+PARTITION_REGISTRY = IndexRegistry(PARTITIONED_INDEX_PATHS, memory_budget_mb=INDEX_MEMORY_BUDGET_MB,
+                                   loader=PartitionedIndex.load)
+
+# Soft time decay: (1 - alpha) * score + alpha * kernel(age in years)
+TIME_DECAY_ALPHA = 0.3
+TIME_DECAY_LAMBDA = 0.5
+TIME_DECAY_KERNEL = "rational"
+
+# Candidate generation: every signal contributes its top-N rows per query,
+# and fusion / decay / ranking only look at the union of those rows
+FUSION_CANDIDATES = 100
+HYBRID_FUSION = "minmax"   # rrf | zscore | minmax
+
+# Dense candidates of whole-index queries from the index's IVF structure
+# (approximate, see scripts/benchmarks/bench_ann.py) instead of an exact
+# scan; only used when the index was built with one
+DENSE_ANN = False
+METHOD_SIGNALS = {
+    "bm25": ("bm25",),
+    "dense": ("dense",),
+    "hybrid": ("bm25", "dense"),
+}
+
+# Final result lists, keyed by query + settings + index fingerprint
+# (memory LRU + on-disk tier); None disables caching
+RESULT_CACHE = ResultCache()
+
+
+def get_index(chunking_type: str) -> VectorIndex:
+    """
+    Returns the (cached) index for a chunking type.
+    """
+    return INDEX_REGISTRY.get(chunking_type)
+
 
 def extract_year_from_query(query: str):
     """
@@ -37,98 +89,308 @@ def hard_time_filter(chunks, scores, year):
     Keep only chunks whose timestamp year == requested year.
     Returns indices to keep.
     """
-    keep = []
-    for i, c in enumerate(chunks):
-        ts = c.meta.get("timestamp_iso")
-        if ts is not None and ts.year == year:
-            keep.append(i)
-    return keep
+    lo, hi = year_bounds(year)
+    ts = chunks.timestamps
+    return np.flatnonzero((ts >= lo) & (ts < hi))
 
 
-def apply_time_decay(scores, chunks, query_time, alpha=0.3, lambd=0.5):
+def retrieve(query: str, method: str, chunking_type: str, k: int, as_of=None,
+             decay_kernel: str = TIME_DECAY_KERNEL, fusion: str = HYBRID_FUSION,
+             use_ann: bool = DENSE_ANN):
     """
-    Soft time-decay scoring:
-    Combines semantic similarity with temporal recency.
+    Main retrieval function with temporal awareness (Stage 3).
+    as_of is the query time for the decay (date / datetime, None = now).
     """
-    new_scores = []
+    return retrieve_batch([query], method, chunking_type, k, as_of=as_of,
+                          decay_kernel=decay_kernel, fusion=fusion, use_ann=use_ann)[0]
 
-    for s, c in zip(scores, chunks):
-        ts = c.meta.get("timestamp")
 
-        # If no timestamp, keep original score
-        if ts is None:
-            new_scores.append(s)
-            continue
+def query_row_ranges(index: VectorIndex, query: str):
+    """
+    Row ranges a query may match. Index rows are time-ordered, so each
+    date interval the query names (see date_ranges) is a contiguous slice
+    found by binary search; without any, the whole index. Corpus-relative
+    phrases ("the latest report") are not date constraints here; only the
+    temporal entry points read them (see temporal_retrieval.split_windows).
+    """
+    intervals = parse_date_ranges(query)
+    if not intervals:
+        return (slice(0, len(index.chunks)),)
+    ranges = (index.time_slice(lo, hi) for lo, hi in merge_intervals(intervals))
+    return tuple(rows for rows in ranges if rows.stop > rows.start)
 
-        # Time difference in years
-        delta_years = abs((query_time - ts).days) / 365
 
-        # Rational decay function
-        time_score = 1 / (1 + lambd * delta_years)
+def _signal_candidates(index: VectorIndex, queries, q_vecs, signal: str, rows: slice, n: int,
+                       use_ann: bool = False):
+    """
+    Per query: (row ids, scores) of the signal's top-n rows within `rows`.
+    With use_ann, whole-index dense candidates come from the IVF index
+    (when the index has one).
+    """
+    full = rows.start == 0 and rows.stop == len(index.chunks)
+    if signal == "dense":
+        if full and use_ann and getattr(index, "ann", None) is not None:
+            return [index.dense_search(v, n) for v in q_vecs]
+        # Exact scores only: a quantized copy yields just its rescored rows
+        return index.dense_candidates(q_vecs, n, rows=None if full else rows)
 
-        # Final combined score
-        final_score = (1 - alpha) * s + alpha * time_score
-        new_scores.append(final_score)
+    scores = index.bm25_scores_batch(queries, rows=None if full else rows)
+    return _top_n(scores, rows, n)
 
-    return np.array(new_scores)
+
+def _top_n(scores: np.ndarray, rows: slice, n: int):
+    """
+    Per query: (row ids, scores) of the n best columns of a block of scores
+    over `rows`.
+    """
+    n = min(n, scores.shape[1])
+    top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    return [(top[g] + rows.start, scores[g, top[g]]) for g in range(len(scores))]
 
 
-def retrieve(query: str, method: str, chunking_type: str, k: int):
+def _range_candidates(index: VectorIndex, queries, q_vecs, signal: str, ranges, n: int,
+                      use_ann: bool = False):
     """
-    Main retrieval function with temporal awareness (Stage 3).
+    _signal_candidates over several row ranges: the ranges are scored
+    (BM25 in one pass over each posting list) and each yields its own
+    top-n, so one period cannot crowd the others out of the candidates.
     """
-    # Load pre-built index
-    index = VectorIndex.load(INDEX_PATHS[chunking_type])
-
-    # Compute similarity scores
-    bm25_scores = index.bm25_scores(query)
-    q_vec = index.encode_query_dense(query)
-    dense_scores = cosine_similarity(q_vec, index.dense_matrix)[0]
-
-    # Choose retrieval method
-    if method == "bm25":
-        final_scores = bm25_scores
-    elif method == "dense":
-        final_scores = dense_scores
-    elif method == "hybrid":
-        norm_bm25 = (bm25_scores - bm25_scores.min()) / (bm25_scores.max() - bm25_scores.min() + 1e-6)
-        final_scores = 0.3 * norm_bm25 + 0.7 * dense_scores
+    if len(ranges) == 1:
+        return _signal_candidates(index, queries, q_vecs, signal, ranges[0], n, use_ann)
+    if signal == "bm25":
+        blocks = index.bm25_scores_ranges(queries, ranges)
+        per_range = [_top_n(scores, rows, n) for rows, scores in zip(ranges, blocks)]
     else:
+        per_range = [_signal_candidates(index, queries, q_vecs, signal, rows, n, use_ann) for rows in ranges]
+    return [
+        (np.concatenate([lists[g][0] for lists in per_range]), np.concatenate([lists[g][1] for lists in per_range]))
+        for g in range(len(queries))
+    ]
+
+
+def _signal_scores(index: VectorIndex, query: str, q_vec, signal: str, docs: np.ndarray) -> np.ndarray:
+    """
+    Exact scores of one signal for a sorted array of rows.
+    """
+    if signal == "bm25":
+        return index._bm25_index().score_docs(list(bm25_tokenize_cached(query)), docs)
+    return np.asarray(index.dense_matrix[docs], dtype=np.float32) @ q_vec
+
+
+def _union_scores(index: VectorIndex, query: str, q_vec, lists):
+    """
+    (candidate rows, {signal: scores}) over the union of the per-signal
+    lists. A signal's score for a row outside its own top-N is computed exactly.
+    """
+    docs = np.unique(np.concatenate([np.asarray(ids, dtype=np.int64) for ids, _ in lists.values()]))
+    signal_scores = {}
+    for signal, (ids, scores) in lists.items():
+        vals = np.full(len(docs), np.nan)
+        vals[np.searchsorted(docs, ids)] = scores
+        missing = np.isnan(vals)
+        if missing.any():
+            vals[missing] = _signal_scores(index, query, q_vec, signal, docs[missing])
+        signal_scores[signal] = vals
+    return docs, signal_scores
+
+
+def _fuse_candidates(index: VectorIndex, query: str, q_vec, lists, fusion: str):
+    """
+    (candidate rows, fused scores) over the union of the per-signal lists.
+    """
+    docs, signal_scores = _union_scores(index, query, q_vec, lists)
+    return docs, fuse(signal_scores, method=fusion)
+
+
+def retrieve_batch(queries, method: str, chunking_type: str, k: int, as_of=None,
+                   decay_kernel: str = TIME_DECAY_KERNEL, fusion: str = HYBRID_FUSION,
+                   use_cache: bool = True, use_ann: bool = DENSE_ANN):
+    """
+    Batched version of retrieve(). Returns one result list per query, in
+    input order.
+
+    Queries found in RESULT_CACHE (for this k or a larger one) skip
+    retrieval; the rest are retrieved together and stored.
+    """
+    queries = list(queries)
+    if method not in METHOD_SIGNALS:
         raise ValueError("Unknown method")
+    if not queries:
+        return []
+    if not use_cache or RESULT_CACHE is None:
+        return _retrieve_batch(queries, method, chunking_type, k, as_of, decay_kernel, fusion, use_ann)
+
+    params = {
+        "method": method,
+        "chunking_type": chunking_type,
+        "index": INDEX_REGISTRY.fingerprint(chunking_type),
+        "as_of_day": as_of_day(as_of),
+        "decay": (decay_kernel, TIME_DECAY_ALPHA, TIME_DECAY_LAMBDA),
+        "fusion": (fusion, sorted(DEFAULT_WEIGHTS.items()), FUSION_CANDIDATES),
+        "dates": PARSER_VERSION,
+        "dense_ann": bool(use_ann) and method != "bm25",
+    }
+    keys = [ResultCache.key(q, **params) for q in queries]
+    results = [RESULT_CACHE.get(key, k) for key in keys]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        computed = _retrieve_batch([queries[i] for i in missing], method, chunking_type, k,
+                                   as_of, decay_kernel, fusion, use_ann)
+        for i, res in zip(missing, computed):
+            RESULT_CACHE.put(keys[i], k, res)
+            results[i] = res
+    return results
 
-    # ----- Stage 3 begins -----
+
+def _retrieve_batch(queries, method: str, chunking_type: str, k: int, as_of,
+                    decay_kernel: str, fusion: str, use_ann: bool = False):
+    """
+    One encoder forward pass for all queries, one matrix product per signal.
+
+    Date constraints are pushed down: queries are grouped by the row
+    ranges their date phrases allow (a year, a quarter, "between 2019 and
+    2024", ...), and only those rows are scored. Each signal the
+    method needs then yields its top FUSION_CANDIDATES rows (split evenly
+    across a query's ranges, at least k from each); fusion, time decay and
+    the final sort run on the union of those candidates only.
+    """
+    # Pre-built index (kept warm by the registry)
+    index = get_index(chunking_type)
     chunks = index.chunks
 
-    # Hard temporal filtering
-    year_constraint = extract_year_from_query(query)
-    if year_constraint is not None:
-        idx = hard_time_filter(chunks, final_scores, year_constraint)
-        final_scores = final_scores[idx]
-        chunks = [chunks[i] for i in idx]
+    q_vecs = index.encode_queries_dense(queries) if method in ("dense", "hybrid") else None
 
-    # Soft temporal decay
-    query_time = datetime.now()
-    final_scores = apply_time_decay(
-        final_scores,
-        chunks,
-        query_time,
-        alpha=0.3,
-        lambd=0.5
-    )
+    # ----- Stage 3: hard temporal filtering (row ranges) -----
+    groups = {}
+    for i, query in enumerate(queries):
+        ranges = query_row_ranges(index, query)
+        groups.setdefault(tuple((rows.start, rows.stop) for rows in ranges), []).append(i)
 
-    # Rank and return Top-K
-    top_idx = np.argsort(-final_scores)[:k]
+    batch_results = [[] for _ in queries]
 
+    for key, members in groups.items():
+        if not key:
+            continue
+        ranges = [slice(lo, hi) for lo, hi in key]
+        group_queries = [queries[i] for i in members]
+        group_vecs = q_vecs[members] if q_vecs is not None else None
+        # The candidate budget is split across the query's date ranges
+        n = max(k, FUSION_CANDIDATES // len(ranges))
+        candidates = {
+            signal: _range_candidates(index, group_queries, group_vecs, signal, ranges, n, use_ann)
+            for signal in METHOD_SIGNALS[method]
+        }
+
+        for g, i in enumerate(members):
+            lists = {signal: cands[g] for signal, cands in candidates.items()}
+            docs, fused = _fuse_candidates(
+                index, group_queries[g], group_vecs[g] if group_vecs is not None else None, lists, fusion
+            )
+            if len(docs) == 0:
+                continue
+
+            # Soft temporal decay
+            final_scores = apply_time_decay(
+                fused, chunks.days[docs], as_of,
+                alpha=TIME_DECAY_ALPHA, lambd=TIME_DECAY_LAMBDA, kernel=decay_kernel,
+            )
+
+            # Rank and return Top-K
+            top = np.argsort(-final_scores, kind="stable")[:k]
+            batch_results[i] = [
+                {
+                    "chunk_id": chunks.chunk_ids[docs[j]],
+                    "text": chunks.text(docs[j]),
+                    "score": float(final_scores[j]),
+                    "method_used": method
+                }
+                for j in top
+            ]
+
+    return batch_results
+
+
+def retrieve_window(query: str, method: str, chunking_type: str, k: int,
+                    start_ts=None, end_ts=None, as_of=None,
+                    decay_kernel: str = TIME_DECAY_KERNEL, fusion: str = HYBRID_FUSION,
+                    parse_dates: bool = True):
+    """
+    retrieve() restricted to chunks with start_ts <= timestamp < end_ts
+    (Unix seconds; None = open), on the month-partitioned index.
+
+    Only partitions overlapping the window (narrowed to the date intervals
+    the query names, unless parse_dates=False; absolute dates only, as in
+    query_row_ranges) are opened. Each is scored with its own BM25
+    statistics and dense slice and yields its per-signal top-n (the
+    FUSION_CANDIDATES budget split across partitions, at least k); the
+    lists are merged and fused into one top-k. Results also carry
+    "timestamp_iso".
+    """
+    if method not in METHOD_SIGNALS:
+        raise ValueError("Unknown method")
+    pindex = PARTITION_REGISTRY.get(chunking_type)
+
+    intervals = parse_date_ranges(query) if parse_dates else []
+    if intervals:
+        windows = clip_ranges(merge_intervals(intervals), start_ts, end_ts)
+    else:
+        windows = [(start_ts, end_ts)]
+    unbounded = windows == [(None, None)]
+
+    # (window, partition) pairs; disjoint windows never share rows
+    spans = [(w, p) for w in windows for p in pindex.route(*w)]
+    if not spans:
+        return []
+
+    q_vecs = None
+    if method in ("dense", "hybrid"):
+        q_vecs = pindex.partition(spans[0][1]["name"]).encode_queries_dense([query])
+
+    # Each partition contributes its per-signal top-n (raw scores); fusion
+    # and decay then run once over the union, as in retrieve_batch()
+    n = max(k, FUSION_CANDIDATES // len(spans))
+    owners, rows_of, days, signal_parts = [], [], [], {s: [] for s in METHOD_SIGNALS[method]}
+    for (lo, hi), p in spans:
+        part = pindex.partition(p["name"])
+        if unbounded:
+            rows = slice(0, len(part.chunks))
+        else:
+            rows = part.time_slice(lo if lo is not None else np.iinfo(np.int64).min,
+                                   hi if hi is not None else np.iinfo(np.int64).max)
+        if rows.stop <= rows.start:
+            continue
+        lists = {
+            signal: _signal_candidates(part, [query], q_vecs, signal, rows, n)[0]
+            for signal in METHOD_SIGNALS[method]
+        }
+        docs, signal_scores = _union_scores(part, query, q_vecs[0] if q_vecs is not None else None, lists)
+        owners.extend([part] * len(docs))
+        rows_of.append(docs)
+        days.append(np.asarray(part.chunks.days)[docs])
+        for signal, vals in signal_scores.items():
+            signal_parts[signal].append(vals)
+    if not rows_of:
+        return []
+
+    rows_of = np.concatenate(rows_of)
+    fused = fuse({s: np.concatenate(v) for s, v in signal_parts.items()}, method=fusion)
+    final_scores = apply_time_decay(
+        fused, np.concatenate(days), as_of,
+        alpha=TIME_DECAY_ALPHA, lambd=TIME_DECAY_LAMBDA, kernel=decay_kernel,
+    )
+    # Stable sort: equal scores keep partition (time) order
     results = []
-    for i in top_idx:
-        c = chunks[i]
+    for j in np.argsort(-final_scores, kind="stable")[:k]:
+        part, row = owners[j], int(rows_of[j])
+        ts = part.chunks.timestamp(row)
         results.append({
-            "chunk_id": c.chunk_id,
-            "text": c.text,
-            "score": float(final_scores[i]),
-            "method_used": method
+            "chunk_id": part.chunks.chunk_ids[row],
+            "text": part.chunks.text(row),
+            "score": float(final_scores[j]),
+            "method_used": method,
+            "timestamp_iso": ts.date().isoformat() if ts is not None else None,
         })
-
     return results
 
 
@@ -138,21 +400,13 @@ def normalize_query(q: str):
     return q.split()
 
 
-def retrieve_eval(query, chunks, chunking_type, k=10):
+def retrieve_eval(query, chunks, chunking_type, k=10, index=None):
     """
     Evaluation-only retriever.
-    Uses precomputed BM25 scores stored in chunks (no index loading).
+    Keyword overlap on text_preview (no index loading): the number of
+    distinct query terms a preview contains as whole tokens, computed from
+    the posting lists of `index` (a KeywordIndex over a superset of
+    `chunks`; one is built over `chunks` if it is missing or does not
+    cover them). Ties keep the input order.
     """
-    # Simple keyword matching fallback (enough for Stage 4)
-    query_terms = set(normalize_query(query))
-
-
-    scored = []
-    for c in chunks:
-        text = c.get("text_preview", "").lower()
-        score = sum(1 for t in query_terms if t in text)
-        if score > 0:
-            scored.append((score, c))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for _, c in scored[:k]]
+    return KeywordIndex.lookup(chunks, index).top_k(query, chunks, k)
@@ -0,0 +1,424 @@
+# server.py
+# Long-running local retrieval service (asyncio, stdlib only).
+#
+#   python -m scripts.retrieval.server [port]
+#
+# Keeps the fixed_660 / hierarchical indexes and the e5 encoder warm, and
+# coalesces concurrent /retrieve requests into micro-batches: requests with
+# the same settings that arrive within BATCH_WAIT_MS share one
+# retrieve_batch() call (one encoder forward pass, one matrix product per
+# signal).
+#
+# Endpoints (JSON in, JSON out):
+#   POST /retrieve           {"query", "method", "chunking_type", "k", "as_of"?, "decay_kernel"?, "fusion"?,
+#                             "rerank"?, "rerank_budget_ms"?}
+#   POST /temporal_retrieve  {"query", "chunking_method", "embedding_method", "corpus"?, "k"?, "months"?}
+#   GET  /stats              queue depth, batch sizes, per-endpoint latency, rerank latency,
+#                            result cache hits
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from scripts.retrieval.keyword_index import KeywordIndex
+from scripts.retrieval.rerank import get_reranker
+from scripts.retrieval import retriever
+from scripts.retrieval.retriever import (
+    HYBRID_FUSION,
+    INDEX_PATHS,
+    TIME_DECAY_KERNEL,
+    get_index,
+    retrieve_batch,
+    retrieve_eval,
+)
+from scripts.retrieval.temporal_retrieval import TemporalCorpus, temporal_retrieve
+from scripts.retrieval.temporal_store import DATASET_PATH, JSON_PATH, TemporalStore, open_temporal_store
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Micro-batching: a batch is dispatched BATCH_WAIT_MS after its first
+# request arrives, or as soon as it holds MAX_BATCH_SIZE requests
+BATCH_WAIT_MS = 5.0
+MAX_BATCH_SIZE = 32
+
+# Scoring runs off the event loop; one worker keeps batches serialized, so
+# requests arriving while a batch is scored pile up into the next one
+SCORING_WORKERS = 1
+
+# Stage 2 chunk metadata used by /temporal_retrieve: the partitioned
+# dataset, converted from the JSON if missing or older
+STAGE2_DATASET_PATH = DATASET_PATH
+STAGE2_INDEX_PATH = JSON_PATH
+
+# Latency samples kept per endpoint for the percentiles in /stats
+LATENCY_WINDOW = 2048
+
+MAX_BODY_BYTES = 1 << 20
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+class ServiceStats:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.latencies: Dict[str, deque] = {}
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_batch = 0
+        self.started = time.time()
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(seconds * 1000.0)
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.batched_requests += size
+        self.max_batch = max(self.max_batch, size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = {}
+        for endpoint, samples in self.latencies.items():
+            ms = np.fromiter(samples, dtype=np.float64)
+            latency[endpoint] = {
+                "count": self.requests[endpoint],
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "latency": latency,
+        }
+
+
+# -----------------------------
+# Micro-batcher
+# -----------------------------
+BatchKey = Tuple[str, str, int, Optional[str], str, str]
+
+
+class MicroBatcher:
+    """
+    Groups /retrieve requests by their settings and runs each group through
+    retrieve_batch() in one call.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, stats: ServiceStats,
+                 wait_ms: float = BATCH_WAIT_MS, max_batch: int = MAX_BATCH_SIZE):
+        self.executor = executor
+        self.stats = stats
+        self.wait = wait_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: Dict[BatchKey, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+        # Running batches; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Requests waiting for their batch to be dispatched.
+        """
+        return sum(len(v) for v in self._pending.values())
+
+    def submit(self, key: BatchKey, query: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((query, fut))
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.wait, self._flush, key)
+        return fut
+
+    def _flush(self, key: BatchKey) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            self.stats.errors += 1
+            print(f"[ERROR] batch: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def _run(self, key: BatchKey, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        method, chunking_type, k, as_of, decay_kernel, fusion = key
+        queries = [q for q, _ in batch]
+        self.in_flight += len(batch)
+        self.stats.record_batch(len(batch))
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor,
+                lambda: retrieve_batch(
+                    queries, method, chunking_type, k,
+                    as_of=date.fromisoformat(as_of) if as_of else None,
+                    decay_kernel=decay_kernel, fusion=fusion,
+                ),
+            )
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result((res, len(batch)))
+        finally:
+            self.in_flight -= len(batch)
+
+
+# -----------------------------
+# Service
+# -----------------------------
+class RetrievalService:
+    def __init__(self, wait_ms: float = BATCH_WAIT_MS, max_batch: int = MAX_BATCH_SIZE,
+                 workers: int = SCORING_WORKERS, stage2_dataset: str = STAGE2_DATASET_PATH,
+                 stage2_path: str = STAGE2_INDEX_PATH):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval")
+        self.stats = ServiceStats()
+        self.batcher = MicroBatcher(self.executor, self.stats, wait_ms, max_batch)
+        self.stage2_dataset = stage2_dataset
+        self.stage2_path = stage2_path
+        self._store: Optional[TemporalStore] = None
+        self._systems: Dict[Tuple[str, str, Optional[str]], Tuple[TemporalCorpus, KeywordIndex]] = {}
+
+    # -----------------------------
+    # Warm-up
+    # -----------------------------
+    def warm_up(self) -> None:
+        """
+        Loads every index and the encoder once, before the first request.
+        """
+        for chunking_type in INDEX_PATHS:
+            t0 = time.perf_counter()
+            try:
+                index = get_index(chunking_type)
+            except FileNotFoundError as e:
+                print(f"[WARN] {chunking_type}: index not available ({e})")
+                continue
+            index.encode_queries_dense(["warm-up query"])
+            print(f"[WARM] {chunking_type}: {len(index.chunks)} chunks in {time.perf_counter() - t0:.2f}s")
+
+        try:
+            self._load_stage2()
+        except FileNotFoundError:
+            print(f"[WARN] {self.stage2_path} not found; /temporal_retrieve disabled until it exists")
+
+    def _load_stage2(self) -> TemporalStore:
+        if self._store is None:
+            self._store = open_temporal_store(self.stage2_dataset, self.stage2_path)
+            print(f"[WARM] stage2: {len(self._store)} chunks")
+        return self._store
+
+    def _system_chunks(self, chunking_method: str, embedding_method: str,
+                       corpus: Optional[str] = None) -> Tuple[TemporalCorpus, KeywordIndex]:
+        """
+        Stage 2 chunks of one system (and corpus), read from their partition
+        of the dataset, and the keyword index over them; built once and kept.
+        """
+        key = (chunking_method, embedding_method, corpus)
+        if key not in self._systems:
+            selection = self._load_stage2().corpus(corpus, chunking_method, embedding_method)
+            self._systems[key] = selection, KeywordIndex.build(selection.chunks)
+        return self._systems[key]
+
+    # -----------------------------
+    # Endpoints
+    # -----------------------------
+    async def retrieve(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        With "rerank", the batch retrieves the reranker's candidate depth and
+        each query is then reranked down to k on its own budget.
+        """
+        k = int(req.get("k", 10))
+        rerank = bool(req.get("rerank", False))
+        key: BatchKey = (
+            req.get("method", "hybrid"),
+            req["chunking_type"],
+            max(k, get_reranker().max_candidates) if rerank else k,
+            req.get("as_of"),
+            req.get("decay_kernel", TIME_DECAY_KERNEL),
+            req.get("fusion", HYBRID_FUSION),
+        )
+        results, batch_size = await self.batcher.submit(key, req["query"])
+        if rerank:
+            budget = req.get("rerank_budget_ms")
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                lambda: get_reranker().rerank(req["query"], results, k,
+                                              budget_ms=float(budget) if budget is not None else None),
+            )
+        return {"results": results, "batch_size": batch_size}
+
+    async def temporal_retrieve(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Early / late windows over the Stage 2 chunks (keyword retriever,
+        so there is nothing to batch; it only runs off the event loop).
+        """
+        chunking_method = req["chunking_method"]
+        embedding_method = req["embedding_method"]
+        corpus = (req.get("corpus") or "").upper() or None
+
+        def run():
+            chunks, keyword_index = self._system_chunks(chunking_method, embedding_method, corpus)
+            return temporal_retrieve(
+                req["query"], chunks, partial(retrieve_eval, index=keyword_index),
+                k=int(req.get("k", 5)), months=int(req.get("months", 14)),
+                chunking_method=chunking_method, embedding_method=embedding_method,
+            )
+
+        early, late = await asyncio.get_running_loop().run_in_executor(self.executor, run)
+        return {"early": early, "late": late}
+
+    def stats_payload(self) -> Dict[str, Any]:
+        payload = self.stats.snapshot()
+        payload["queue_depth"] = self.batcher.queue_depth
+        payload["in_flight"] = self.batcher.in_flight
+        payload["rerank"] = get_reranker().stats()
+        if retriever.RESULT_CACHE is not None:
+            payload["result_cache"] = retriever.RESULT_CACHE.stats()
+        return payload
+
+    # -----------------------------
+    # HTTP
+    # -----------------------------
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if method == "GET" and path == "/stats":
+            return 200, self.stats_payload()
+        if method == "GET" and path == "/health":
+            return 200, {"ok": True}
+
+        handlers = {"/retrieve": self.retrieve, "/temporal_retrieve": self.temporal_retrieve}
+        if path not in handlers:
+            return 404, {"error": f"unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        t0 = time.perf_counter()
+        try:
+            req = json.loads(body or b"{}")
+            payload = await handlers[path](req)
+        except (KeyError, ValueError, TypeError) as e:
+            self.stats.errors += 1
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except FileNotFoundError as e:
+            self.stats.errors += 1
+            return 503, {"error": str(e)}
+        except Exception as e:
+            self.stats.errors += 1
+            print(f"[ERROR] {method} {path}: {type(e).__name__}: {e}", file=sys.stderr)
+            traceback.print_exc()
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        elapsed = time.perf_counter() - t0
+        self.stats.record(path, elapsed)
+        payload["latency_ms"] = round(elapsed * 1000.0, 3)
+        return 200, payload
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Minimal HTTP/1.1: one JSON request per message, keep-alive by default.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _write_response(writer, 400, {"error": "bad request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.stats.errors += 1
+                    await _write_response(writer, 400, {"error": "bad Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await _write_response(writer, 413, {"error": "body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method.upper(), target.split("?", 1)[0], body)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[SERVE] http://{host}:{port} (batch wait {self.batcher.wait * 1000:.1f} ms, "
+              f"max batch {self.batcher.max_batch})")
+        async with server:
+            await server.serve_forever()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                          keep_alive: bool) -> None:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    try:
+        asyncio.run(RetrievalService().serve(HOST, port))
+    except KeyboardInterrupt:
+        print("\n[STOP] server stopped")
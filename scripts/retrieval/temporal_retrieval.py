@@ -2,10 +2,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Any, Callable, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 from dateutil.relativedelta import relativedelta
-from scripts.retrieval.retriever import extract_year_from_query
+from scripts.common.dates import EPOCH, MISSING_TS, iso_to_unix_seconds, to_unix_seconds, year_bounds
+from scripts.retrieval.date_ranges import DateInterval, parse_date_ranges
+from scripts.retrieval.retriever import PARTITION_REGISTRY, retrieve_window
+from scripts.retrieval.term_series import TermSeriesIndex
 
 
 # -----------------------------
@@ -33,92 +38,175 @@ def _get_field(chunk: Any, key: str, default=None):
 # -----------------------------
 # Helpers: timestamp extraction
 # -----------------------------
-def _get_ts_dt(chunk: Any) -> Optional[datetime]:
+def chunk_timestamps(chunks: Sequence[Any]) -> np.ndarray:
     """
-    Extract datetime from a chunk.
+    int64 Unix seconds per chunk, MISSING_TS where there is no usable date.
     Supports:
       - timestamp_unix (int seconds)
-      - timestamp_iso (ISO string or datetime)
+      - timestamp_iso (ISO string or datetime); strings are parsed in
+        one NumPy pass
     Works for dict chunks and object chunks.
     """
-    ts_unix = _get_field(chunk, "timestamp_unix", None)
-    #   - timestamp_unix (int seconds)
-    #   - timestamp_iso (ISO string or datetime)
-    # Works for dict chunks and object chunks.
-    
-    ts_unix = _get_field(chunk, "timestamp_unix", None)
-    if ts_unix is not None:
-        try:
-            return datetime.utcfromtimestamp(int(ts_unix))
-        except Exception:
-            pass
-
-    ts_iso = _get_field(chunk, "timestamp_iso", None)
-    ts_iso = _get_field(chunk, "timestamp_iso", None)
-
-    if isinstance(ts_iso, datetime):
-        return ts_iso
-    if isinstance(ts_iso, datetime):
-        return ts_iso
-
-    if isinstance(ts_iso, str):
-        try:
-            return datetime.fromisoformat(ts_iso)
-        except ValueError:
-            # handle 'Z'
-            # handle 'Z'
+    ts = np.full(len(chunks), MISSING_TS, dtype=np.int64)
+    iso_rows: List[int] = []
+    iso_values: List[str] = []
+    for i, c in enumerate(chunks):
+        ts_unix = _get_field(c, "timestamp_unix", None)
+        if ts_unix is not None:
             try:
-                return datetime.fromisoformat(ts_iso.replace("Z", "+00:00"))
-            except Exception:
-                return None
+                ts[i] = int(ts_unix)
+                continue
+            except (TypeError, ValueError):
+                pass
 
-    return None
+        ts_iso = _get_field(c, "timestamp_iso", None)
+        if isinstance(ts_iso, datetime):
+            ts[i] = to_unix_seconds(ts_iso)
+        elif isinstance(ts_iso, str) and ts_iso:
+            iso_rows.append(i)
+            iso_values.append(ts_iso)
 
+    if iso_rows:
+        ts[iso_rows] = iso_to_unix_seconds(iso_values)
+    return ts
 
-def _sort_by_time(chunks: List[Any], newest_first: bool) -> List[Any]:
-     
-    def key_fn(c: Any):
-        dt = _get_ts_dt(c)
-        return (dt is None, dt if dt is not None else datetime.min)
-    chunks_sorted = sorted(chunks, key=key_fn, reverse=newest_first)
 
-    # Ensure None timestamps always last
+def _time_order(ts: np.ndarray, newest_first: bool) -> np.ndarray:
+    """
+    Stable order of a timestamp column; undated (MISSING_TS) always last.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    if newest_first:
+        return np.lexsort((-ts, ts == MISSING_TS))
+    return np.argsort(ts, kind="stable")
+
 
-    # Ensure None timestamps always last
-    with_ts = [c for c in chunks_sorted if _get_ts_dt(c) is not None]
-    no_ts = [c for c in chunks_sorted if _get_ts_dt(c) is None]
-    return with_ts + no_ts
+def _sort_by_time(chunks: List[Any], newest_first: bool) -> List[Any]:
+    order = _time_order(chunk_timestamps(chunks), newest_first)
+    return [chunks[i] for i in order]
 
 
 # -----------------------------
-# Type filtering (4 configurations)
+# Corpus with a precomputed timestamp column
 # -----------------------------
-def filter_by_type(
-    all_chunks: Iterable[Any],
-    chunking_method: Optional[str] = None,
-    embedding_method: Optional[str] = None,
-) -> List[Any]:
+class TemporalCorpus:
     """
-    Filter chunks by:
-      - chunking_method: "fixed_660" / "hierarchical"
-      - embedding_method: "bm25" / "dense_e5_base" (or whatever you used)
-    If a filter is None => don't filter by it.
+    Chunks plus their timestamps, parsed once:
+
+        ts[i]        -> Unix seconds of chunks[i] (MISSING_TS if undated)
+        order        -> positions in `chunks`, oldest first (stable)
+        sorted_ts    -> ts[order], ascending, undated at the end
+
+    A window is a searchsorted slice of sorted_ts. The chunks it selects
+    come back in corpus order, so retrievers break ties as they would on
+    the plain list.
     """
-    out = []
-    for c in all_chunks:
-        cm = _get_field(c, "chunking_method", None)
-        em = _get_field(c, "embedding_method", None)
 
-        if chunking_method is not None and cm != chunking_method:
-            continue
-        if embedding_method is not None and em != embedding_method:
-            continue
-        out.append(c)
-    return out
+    def __init__(self, chunks: Iterable[Any], ts: Optional[np.ndarray] = None, order: Optional[np.ndarray] = None):
+        self.chunks = chunks if isinstance(chunks, list) else list(chunks)
+        self.ts = chunk_timestamps(self.chunks) if ts is None else np.asarray(ts, dtype=np.int64)
+        self.order = np.argsort(self.ts, kind="stable") if order is None else order
+        self.sorted_ts = self.ts[self.order]
+        self.n_dated = int(np.searchsorted(self.sorted_ts, MISSING_TS, side="left"))
+        self.min_ts = int(self.sorted_ts[0]) if self.n_dated else None
+        self.max_ts = int(self.sorted_ts[self.n_dated - 1]) if self.n_dated else None
+        self._pos: Optional[Dict[int, int]] = None
+        self._selections: Dict[Tuple, "TemporalCorpus"] = {}
+        self._windows: Dict[Tuple[int, int], List[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    # -----------------------------
+    # Sub-corpora
+    # -----------------------------
+    def _subset(self, mask: np.ndarray) -> "TemporalCorpus":
+        """
+        The chunks under `mask`; the time order is carried over, not re-sorted.
+        """
+        new_pos = np.cumsum(mask) - 1
+        order = new_pos[self.order[mask[self.order]]]
+        keep = np.flatnonzero(mask)
+        return TemporalCorpus([self.chunks[i] for i in keep], self.ts[keep], order)
+
+    def select(self, chunking_method: Optional[str] = None, embedding_method: Optional[str] = None) -> "TemporalCorpus":
+        """
+        filter_by_type on the corpus; each selection is computed once and kept.
+        """
+        key = (chunking_method, embedding_method)
+        if key not in self._selections:
+            mask = np.fromiter(
+                (
+                    (chunking_method is None or _get_field(c, "chunking_method", None) == chunking_method)
+                    and (embedding_method is None or _get_field(c, "embedding_method", None) == embedding_method)
+                    for c in self.chunks
+                ),
+                dtype=bool, count=len(self.chunks),
+            )
+            self._selections[key] = self if mask.all() else self._subset(mask)
+        return self._selections[key]
+
+    # -----------------------------
+    # Windows
+    # -----------------------------
+    def rows(self, start_ts: int, end_ts: int) -> np.ndarray:
+        """
+        Positions (corpus order) of the chunks with start_ts <= ts <= end_ts.
+        """
+        lo = np.searchsorted(self.sorted_ts[:self.n_dated], start_ts, side="left")
+        hi = np.searchsorted(self.sorted_ts[:self.n_dated], end_ts, side="right")
+        return np.sort(self.order[lo:hi])
+
+    def window(self, start: Union[datetime, int], end: Union[datetime, int]) -> List[Any]:
+        """
+        Chunks with timestamps in [start, end] (datetimes or Unix seconds).
+        Windows repeat across queries (same months / year), so each list is
+        built once and kept.
+        """
+        if isinstance(start, datetime):
+            start = to_unix_seconds(start)
+        if isinstance(end, datetime):
+            end = to_unix_seconds(end)
+        key = (int(start), int(end))
+        if key not in self._windows:
+            self._windows[key] = [self.chunks[i] for i in self.rows(*key)]
+        return self._windows[key]
+
+    def year(self, year: int) -> List[Any]:
+        start, end = year_bounds(year)
+        return self.window(start, end - 1)
+
+    def windows(self, months: int) -> Optional["TemporalWindows"]:
+        if self.min_ts is None:
+            return None
+        return windows_from_bounds(self.min_ts, self.max_ts, months)
+
+    def bounds(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """
+        First and last timestamp in [start_ts, end_ts) (None = open), or
+        None if no dated chunk falls inside.
+        """
+        dated = self.sorted_ts[:self.n_dated]
+        lo = 0 if start_ts is None else int(np.searchsorted(dated, start_ts, side="left"))
+        hi = self.n_dated if end_ts is None else int(np.searchsorted(dated, end_ts, side="left"))
+        if hi <= lo:
+            return None
+        return int(dated[lo]), int(dated[hi - 1])
+
+    def sort_by_time(self, chunks: List[Any], newest_first: bool) -> List[Any]:
+        """
+        _sort_by_time for chunks of this corpus, using the stored timestamps.
+        """
+        if self._pos is None:
+            self._pos = {id(c): i for i, c in enumerate(self.chunks)}
+        pos = [self._pos.get(id(c)) for c in chunks]
+        if None in pos:
+            return _sort_by_time(chunks, newest_first)
+        order = _time_order(self.ts[pos], newest_first)
+        return [chunks[i] for i in order]
 
 
 # -----------------------------
-# Core: temporal split windows
 # Type filtering (4 configurations)
 # -----------------------------
 def filter_by_type(
@@ -156,44 +244,73 @@ class TemporalWindows:
     late_end: datetime
 
 
-def build_windows_from_corpus(all_chunks: Iterable[Any], months: int = 8) -> TemporalWindows:
+def windows_from_bounds(min_ts: int, max_ts: int, months: int) -> TemporalWindows:
     """
-    Builds two windows:
-      - early: [min_ts, min_ts + months]
+    Builds two windows from the corpus' first and last timestamp:
       - early: [min_ts, min_ts + months]
       - late:  [max_ts - months, max_ts]
     """
-    dts = [_get_ts_dt(c) for c in all_chunks]
-    dts = [dt for dt in dts if dt is not None]
-
-    if not dts:
-        now = datetime.utcnow()
-        return TemporalWindows(now, now, now, now)
+    min_dt = EPOCH + timedelta(seconds=int(min_ts))
+    max_dt = EPOCH + timedelta(seconds=int(max_ts))
+    return TemporalWindows(
+        min_dt, min_dt + relativedelta(months=months),
+        max_dt - relativedelta(months=months), max_dt,
+    )
 
-    min_ts = min(dts)
-    max_ts = max(dts)
 
-    early_start = min_ts
-    early_end = min_ts + relativedelta(months=months)
+def split_windows(
+    intervals: List[DateInterval],
+    bounds: Callable[[Optional[int], Optional[int]], Optional[Tuple[int, int]]],
+    months: int,
+) -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    (early, late) [start_ts, end_ts) ranges for the date intervals a query
+    names (see date_ranges):
+      - two or more: the oldest and the newest interval
+      - one range ("between 2019 and 2024"): early / late windows of
+        `months` months at either end of the data inside it
+      - one other interval ("in 2023", "last quarter of 2023"): that
+        interval for both
+      - none: early / late windows over the whole corpus
+    bounds(start_ts, end_ts) gives the first and last timestamp inside a
+    range, or None if it holds no data (then the result is None).
+    """
+    if len(intervals) >= 2:
+        first, last = intervals[0], intervals[-1]
+        return (first.start_ts, first.end_ts), (last.start_ts, last.end_ts)
+    if intervals and intervals[0].kind != "range":
+        only = (intervals[0].start_ts, intervals[0].end_ts)
+        return only, only
+
+    lo, hi = (intervals[0].start_ts, intervals[0].end_ts) if intervals else (None, None)
+    inside = bounds(lo, hi)
+    if inside is None:
+        return None
+    w = windows_from_bounds(*inside, months)
+    # Windows are inclusive at both ends; the ranges are half-open
+    early = (to_unix_seconds(w.early_start), to_unix_seconds(w.early_end) + 1)
+    late = (to_unix_seconds(w.late_start), to_unix_seconds(w.late_end) + 1)
+    if intervals:
+        early = (max(early[0], lo), min(early[1], hi))
+        late = (max(late[0], lo), min(late[1], hi))
+    return early, late
 
-    late_end = max_ts
-    late_start = max_ts - relativedelta(months=months)
 
-    return TemporalWindows(early_start, early_end, late_start, late_end)
+def build_windows_from_corpus(all_chunks: Iterable[Any], months: int = 8) -> TemporalWindows:
+    corpus = all_chunks if isinstance(all_chunks, TemporalCorpus) else TemporalCorpus(all_chunks)
+    windows = corpus.windows(months)
+    if windows is None:
+        now = datetime.utcnow()
+        return TemporalWindows(now, now, now, now)
+    return windows
 
 
 def filter_by_window(all_chunks: Iterable[Any], start: datetime, end: datetime) -> List[Any]:
     """
     Keep only chunks with timestamps in [start, end].
     """
-    out = []
-    for c in all_chunks:
-        dt = _get_ts_dt(c)
-        if dt is None:
-            continue
-        if start <= dt <= end:
-            out.append(c)
-    return out
+    corpus = all_chunks if isinstance(all_chunks, TemporalCorpus) else TemporalCorpus(all_chunks)
+    return corpus.window(start, end)
 
 
 # -----------------------------
@@ -203,20 +320,29 @@ RetrieverFn = Callable[[str, List[Any], int], List[Any]]
 
 def temporal_retrieve(
     query: str,
-    all_chunks: List[Any],
+    all_chunks: Union[TemporalCorpus, List[Any]],
     retriever: RetrieverFn,
     k: int = 10,
     months: int = 14,
     chunking_method: Optional[str] = None,
     embedding_method: Optional[str] = None,
+    term_index: Optional[TermSeriesIndex] = None,
+    country: Optional[str] = None,
 ) -> Tuple[List[Any], List[Any]]:
     """
     Returns:
       early_chunks, late_chunks
 
-    Optional config filters (for 4 systems):
-      - chunking_method: fixed_660 / hierarchical
-      - embedding_method: bm25 / dense_e5_base
+    all_chunks is a TemporalCorpus, a TemporalStore (temporal_store: the
+    corpus / chunking / embedding selection is read from the partitioned
+    dataset, once per selection), or a plain list (wrapped, which parses
+    its timestamps on every call; build the corpus once when querying it
+    repeatedly).
+
+    With a term_index (term_series, same chunking method), queries that
+    name no absolute dates take their windows from the months in which the
+    query's informative terms occur (in `country`, if given) instead of
+    from the whole corpus.
 
     Optional config filters (for 4 systems):
       - chunking_method: fixed_660 / hierarchical
@@ -227,49 +353,96 @@ def temporal_retrieve(
       - late list sorted NEW -> OLD
       - both lists contain only chunks from the correct time window
     """
-   # 0) Filter by system type (optional)
-    typed_chunks = filter_by_type(
-        all_chunks,
-        chunking_method=chunking_method,
-        embedding_method=embedding_method,
-    )
+    if isinstance(all_chunks, TemporalCorpus):
+        corpus = all_chunks
+    elif hasattr(all_chunks, "corpus"):
+        # TemporalStore (temporal_store imports this module, hence no isinstance)
+        corpus = all_chunks.corpus(country, chunking_method, embedding_method)
+    else:
+        corpus = TemporalCorpus(all_chunks)
 
-    if not typed_chunks:
+    # 0) Filter by system type (optional)
+    typed = corpus.select(chunking_method=chunking_method, embedding_method=embedding_method)
+    if not len(typed):
         return [], []
 
-    # 0.5) Hard year filter (if year in query)
-    year = extract_year_from_query(query)
-    if year is not None:
-        typed_chunks = [
-            c for c in typed_chunks
-            if c.get("timestamp_iso", "").startswith(str(year))
-        ]
-
-    if not typed_chunks:
+    # 1) Windows: date intervals named in the query ("in 2023", "last
+    #    quarter of 2023", "first and last speech", ...), else months-long
+    #    windows at either end of the corpus (or, with a term_index, of the
+    #    months its informative terms occur in)
+    intervals = parse_date_ranges(query, typed.min_ts, typed.max_ts, months=months)
+    if term_index is not None and all(iv.kind in ("first", "last") for iv in intervals):
+        # No absolute dates: anchor on the months the query's terms (minus
+        # its date phrases) occur in
+        terms = query
+        for iv in intervals:
+            terms = terms.replace(iv.phrase, " ")
+        span = term_index.active_range(terms, country)
+        active = typed.bounds(*span) if span is not None else None
+        if active is not None:
+            intervals = (parse_date_ranges(query, *active, months=months)
+                         or [DateInterval(active[0], active[1] + 1, "range", "active terms")])
+    windows = split_windows(intervals, typed.bounds, months)
+    if windows is None:
         return [], []
 
-
-    if year is not None:
-        early_corpus = typed_chunks
-        late_corpus = typed_chunks
-    else:
-        windows = build_windows_from_corpus(typed_chunks, months=months)
-        early_corpus = filter_by_window(typed_chunks, windows.early_start, windows.early_end)
-        late_corpus = filter_by_window(typed_chunks, windows.late_start, windows.late_end)
+    # 2) Row ranges: searchsorted slices of the timestamp column
+    (early_lo, early_hi), (late_lo, late_hi) = windows
+    early_corpus = typed.window(early_lo, early_hi - 1)
+    late_corpus = typed.window(late_lo, late_hi - 1)
+    if not early_corpus and not late_corpus:
+        return [], []
 
-    # 3) Dual retrieval
     # 3) Dual retrieval
     early_top = retriever(query, early_corpus, k)
     late_top = retriever(query, late_corpus, k)
 
     # 4) Required ordering
-    early_top = _sort_by_time(list(early_top), newest_first=False)  # old -> new
-    late_top = _sort_by_time(list(late_top), newest_first=True)     # new -> old
-    # 4) Required ordering
-    early_top = _sort_by_time(list(early_top), newest_first=False)  # old -> new
-    late_top = _sort_by_time(list(late_top), newest_first=True)     # new -> old
+    early_top = typed.sort_by_time(list(early_top), newest_first=False)  # old -> new
+    late_top = typed.sort_by_time(list(late_top), newest_first=True)     # new -> old
 
     return early_top, late_top
 
 
+# -----------------------------
+# API: temporal_retrieve over the month-partitioned index
+# -----------------------------
+def temporal_retrieve_partitioned(
+    query: str,
+    method: str,
+    chunking_type: str,
+    k: int = 10,
+    months: int = 14,
+    as_of=None,
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Same windows and ordering as temporal_retrieve, on the vector index:
+    min/max timestamps come from the partition manifest, and each window
+    only opens the month partitions it overlaps (see retrieve_window).
+    """
+    pindex = PARTITION_REGISTRY.get(chunking_type)
+    if pindex.min_ts is None:
+        return [], []
+
+    def bounds(lo, hi):
+        # From the manifest: the first / last partition the range overlaps
+        parts = [p for p in pindex.route(lo, hi) if p["min_ts"] is not None]
+        if not parts:
+            return None
+        first, last = parts[0]["min_ts"], parts[-1]["max_ts"]
+        return (first if lo is None else max(first, lo)), (last if hi is None else min(last, hi - 1))
+
+    intervals = parse_date_ranges(query, pindex.min_ts, pindex.max_ts, months=months)
+    windows = split_windows(intervals, bounds, months)
+    if windows is None:
+        return [], []
+    (early_lo, early_hi), (late_lo, late_hi) = windows
+    # The windows already reflect the query's dates
+    early_top = retrieve_window(query, method, chunking_type, k, early_lo, early_hi,
+                                as_of=as_of, parse_dates=False)
+    late_top = retrieve_window(query, method, chunking_type, k, late_lo, late_hi,
+                               as_of=as_of, parse_dates=False)
 
+    early_top = _sort_by_time(list(early_top), newest_first=False)  # old -> new
+    late_top = _sort_by_time(list(late_top), newest_first=True)     # new -> old
+    return early_top, late_top
@@ -0,0 +1,330 @@
+# temporal_store.py
+# The Stage 2 temporal index as a partitioned Parquet dataset, the read
+# path of the Stage 3 / Stage 4 runners:
+#
+#   stage2_outputs/temporal_index_dataset/
+#       manifest.json   - format/version, the current data-<id>/ generation
+#       data-<id>/corpus=UK/chunking_method=fixed_660/embedding_method=bm25/part-0.parquet
+#       ...
+#
+# A rewrite goes into a new data-<id>/ generation and the manifest naming
+# it is replaced last, atomically (as VectorIndex.save does), so a reader
+# always finds a complete dataset. The previous generation is kept for
+# readers that opened it; older ones are removed.
+#
+# A reader asks for one (corpus, chunking method, embedding method)
+# selection. The filter is pushed down to the partition directories, so
+# only the matching files are opened. text_preview, most of the bytes, is
+# left out of that read: it is loaded for the whole selection the first
+# time a chunk's text is accessed (or the chunk is iterated or copied).
+#
+# "corpus" is a partition column only, the corpus as the runners define
+# it: the UK_ / US_ prefix of the source file name (UNKNOWN otherwise).
+# It is not part of the chunks, whose Stage 2 "country" field is stored
+# unchanged.
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from scripts.common.dates import MISSING_TS, iso_to_unix_seconds
+from scripts.retrieval.temporal_retrieval import TemporalCorpus
+
+DATASET_PATH = "stage2_outputs/temporal_index_dataset"
+DATASET_FORMAT = "temporal_dataset"
+DATASET_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+JSON_PATH = "stage2_outputs/temporal_index_stage2.json"
+PARTITION_KEYS = ["corpus", "chunking_method", "embedding_method"]
+LAZY_COLUMNS = ("text_preview",)
+CORPORA = ("UK", "US")
+
+
+def source_corpus(sources: pd.Series) -> pd.Series:
+    """
+    UK / US from the source file name prefix, else UNKNOWN.
+    """
+    prefix = sources.fillna("").astype(str).str.split("_", n=1).str[0].str.upper()
+    return prefix.where(prefix.isin(CORPORA), "UNKNOWN")
+
+
+# -----------------------------
+# Write
+# -----------------------------
+def write_temporal_dataset(frame: pd.DataFrame, root: str | Path = DATASET_PATH) -> Path:
+    """
+    Writes Stage 2 entries (TemporalVectorIndex.table columns) as a
+    hive-partitioned dataset in a new generation under `root`. Row order
+    within a partition is kept, so a selection reads back in the Stage 2
+    order.
+    """
+    root = Path(root)
+    table = pa.Table.from_pandas(frame.assign(corpus=source_corpus(frame["source"])), preserve_index=False)
+    root.mkdir(parents=True, exist_ok=True)
+    previous = (read_dataset_manifest(root) or {}).get("data")
+    data_name = f"data-{os.urandom(6).hex()}"
+    ds.write_dataset(
+        table, root / data_name, format="parquet",
+        partitioning=PARTITION_KEYS, partitioning_flavor="hive",
+        preserve_order=True,
+    )
+
+    manifest = {
+        "format": DATASET_FORMAT,
+        "version": DATASET_FORMAT_VERSION,
+        "data": data_name,
+        "num_rows": table.num_rows,
+    }
+    tmp = root / (MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, root / MANIFEST_NAME)
+
+    for old in root.glob("data-*"):
+        if old.name not in (data_name, previous):
+            shutil.rmtree(old, ignore_errors=True)
+    # Datasets written before generations kept their partitions at the top level
+    for old in root.glob(f"{PARTITION_KEYS[0]}=*"):
+        shutil.rmtree(old, ignore_errors=True)
+    return root
+
+
+def read_dataset_manifest(root: str | Path) -> Optional[Dict[str, Any]]:
+    """
+    The dataset manifest under `root`, or None if there is no dataset of
+    the current format there.
+    """
+    path = Path(root) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != DATASET_FORMAT or manifest.get("version") != DATASET_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def json_to_frame(entries: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Stage 2 JSON entries -> the columns write_temporal_dataset expects
+    (embeddings_shape flattened to bm25_dim / dense_dim).
+    """
+    frame = pd.DataFrame(entries)
+    shapes = frame.pop("embeddings_shape") if "embeddings_shape" in frame else pd.Series([{}] * len(frame))
+    frame["bm25_dim"] = pd.array([(s or {}).get("bm25") for s in shapes], dtype="Int64")
+    frame["dense_dim"] = pd.array([(s or {}).get("dense_e5_base") for s in shapes], dtype="Int64")
+    frame["timestamp_unix"] = frame["timestamp_unix"].astype("Int64")
+    return frame
+
+
+# -----------------------------
+# Read
+# -----------------------------
+class _LazyColumn:
+    """
+    One column of a selection, read on first use.
+    """
+
+    def __init__(self, dataset: ds.Dataset, expr: Optional[ds.Expression], name: str, n_rows: int):
+        self.dataset = dataset
+        self.expr = expr
+        self.name = name
+        self.n_rows = n_rows
+        self.values: Optional[List[Any]] = None
+
+    def __getitem__(self, row: int) -> Any:
+        if self.values is None:
+            values = self.dataset.to_table(columns=[self.name], filter=self.expr).column(0).to_pylist()
+            if len(values) != self.n_rows:
+                raise RuntimeError(f"{self.name}: read {len(values)} rows, expected {self.n_rows}")
+            self.values = values
+        return self.values[row]
+
+
+class StoredChunk(dict):
+    """
+    A Stage 2 entry read from the dataset. Lazy columns (text_preview)
+    are filled in on first access, and before the entry is iterated,
+    copied, compared or pickled, so it reads like the JSON entry.
+    """
+
+    __slots__ = ("_lazy", "_row")
+
+    def _fill(self) -> "StoredChunk":
+        for key, column in self._lazy.items():
+            if not dict.__contains__(self, key):
+                dict.__setitem__(self, key, column[self._row])
+        return self
+
+    def __missing__(self, key: str) -> Any:
+        column = self._lazy.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = self[key] = column[self._row]
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or key in self._lazy
+
+    def __len__(self) -> int:
+        return dict.__len__(self._fill())
+
+    def __iter__(self):
+        return dict.__iter__(self._fill())
+
+    def keys(self):
+        return dict.keys(self._fill())
+
+    def values(self):
+        return dict.values(self._fill())
+
+    def items(self):
+        return dict.items(self._fill())
+
+    def copy(self) -> Dict[str, Any]:
+        return dict.copy(self._fill())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, StoredChunk):
+            other._fill()
+        return dict.__eq__(self._fill(), other)
+
+    def __ne__(self, other: object) -> bool:
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return dict.__repr__(self._fill())
+
+    def __reduce__(self):
+        return dict, (dict.copy(self._fill()),)
+
+
+class TemporalStore:
+    def __init__(self, root: str | Path = DATASET_PATH):
+        self.root = Path(root)
+        manifest = read_dataset_manifest(self.root)
+        if manifest is None:
+            raise FileNotFoundError(f"No temporal dataset at {self.root}")
+        # Pinned to one generation: a rewrite never changes what this store reads
+        self.data = self.root / manifest["data"]
+        self.dataset = ds.dataset(str(self.data), format="parquet", partitioning="hive")
+        # Chunk columns read up front; the "corpus" partition column is only a filter
+        self.eager_columns = [c for c in self.dataset.schema.names
+                              if c not in LAZY_COLUMNS and c != PARTITION_KEYS[0]]
+        self._chunks: Dict[Tuple, List[StoredChunk]] = {}
+        self._corpora: Dict[Tuple, TemporalCorpus] = {}
+
+    def __len__(self) -> int:
+        return self.count()
+
+    @staticmethod
+    def _filter(corpus: Optional[str], chunking_method: Optional[str],
+                embedding_method: Optional[str]) -> Optional[ds.Expression]:
+        expr = None
+        for key, value in zip(PARTITION_KEYS, (corpus, chunking_method, embedding_method)):
+            if value is not None:
+                term = ds.field(key) == value
+                expr = term if expr is None else expr & term
+        return expr
+
+    def count(self, corpus: Optional[str] = None, chunking_method: Optional[str] = None,
+              embedding_method: Optional[str] = None) -> int:
+        """
+        Rows in the selection, from the Parquet footers (no data pages read).
+        """
+        return self.dataset.count_rows(filter=self._filter(corpus, chunking_method, embedding_method))
+
+    def table(self, corpus: Optional[str] = None, chunking_method: Optional[str] = None,
+              embedding_method: Optional[str] = None, columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        The selection's columns (default: all but the lazy ones) as Arrow.
+        """
+        expr = self._filter(corpus, chunking_method, embedding_method)
+        return self.dataset.to_table(columns=columns or self.eager_columns, filter=expr)
+
+    def chunks(self, corpus: Optional[str] = None, chunking_method: Optional[str] = None,
+               embedding_method: Optional[str] = None) -> List[StoredChunk]:
+        """
+        The selection as Stage 2 entries (same keys and order as the JSON),
+        built once per selection.
+        """
+        key = (corpus, chunking_method, embedding_method)
+        if key not in self._chunks:
+            expr = self._filter(*key)
+            columns = self.dataset.to_table(columns=self.eager_columns, filter=expr).to_pydict()
+            n = len(columns["id"])
+            lazy = {c: _LazyColumn(self.dataset, expr, c, n) for c in LAZY_COLUMNS if c in self.dataset.schema.names}
+            bm25, dense = columns.pop("bm25_dim", [None] * n), columns.pop("dense_dim", [None] * n)
+            names = list(columns)
+            chunks = []
+            for row, values in enumerate(zip(*columns.values())):
+                chunk = StoredChunk(zip(names, values))
+                chunk["embeddings_shape"] = {"bm25": bm25[row], "dense_e5_base": dense[row]}
+                chunk._lazy, chunk._row = lazy, row
+                chunks.append(chunk)
+            self._chunks[key] = chunks
+        return self._chunks[key]
+
+    def corpus(self, corpus: Optional[str] = None, chunking_method: Optional[str] = None,
+               embedding_method: Optional[str] = None) -> TemporalCorpus:
+        """
+        The selection as a TemporalCorpus; timestamps come straight from the
+        timestamp_unix column (ISO dates parsed only where it is missing).
+        """
+        key = (corpus, chunking_method, embedding_method)
+        if key not in self._corpora:
+            chunks = self.chunks(*key)
+            table = self.table(*key, columns=["timestamp_unix", "timestamp_iso"])
+            ts = table.column("timestamp_unix").to_numpy(zero_copy_only=False)
+            missing = np.isnan(ts) if ts.dtype.kind == "f" else np.zeros(len(ts), dtype=bool)
+            ts = np.where(missing, MISSING_TS, np.nan_to_num(ts)).astype(np.int64)
+            if missing.any():
+                iso = table.column("timestamp_iso").to_pylist()
+                rows = np.flatnonzero(missing)
+                ts[rows] = iso_to_unix_seconds([iso[i] or "" for i in rows])
+            self._corpora[key] = TemporalCorpus(chunks, ts)
+        return self._corpora[key]
+
+
+def dataset_mtime(root: str | Path) -> Optional[float]:
+    """
+    When the current generation under `root` was completed (its manifest
+    written), or None if there is no dataset of the current format.
+    """
+    if read_dataset_manifest(root) is None:
+        return None
+    return (Path(root) / MANIFEST_NAME).stat().st_mtime
+
+
+def open_temporal_store(root: str | Path = DATASET_PATH, json_path: str | Path = JSON_PATH) -> TemporalStore:
+    """
+    The dataset at `root`, (re)converted from the Stage 2 JSON if it does
+    not exist yet or the JSON was written after it.
+    """
+    built = dataset_mtime(root)
+    if built is None:
+        print(f"[STORE] no current dataset at {root}; converting {json_path}")
+    elif Path(json_path).exists() and Path(json_path).stat().st_mtime > built:
+        print(f"[STORE] {json_path} is newer than {root}; converting again")
+    else:
+        return TemporalStore(root)
+    with open(json_path, "r", encoding="utf-8") as f:
+        write_temporal_dataset(json_to_frame(json.load(f)), root)
+    return TemporalStore(root)
@@ -0,0 +1,276 @@
+# term_series.py
+# Precomputed (term x month x country) counts over the BM25 vocabulary of
+# one chunking method, for "how did usage of X change over time" questions.
+#
+# A count is the number of chunks that contain the term (from the nonzero
+# pattern of bm25_chunks_outputs/<method>/X_bm25_chunks.npz) in a given
+# month and country. Layout of an index directory:
+#
+#   manifest.json  - format/version, months ("YYYY-MM", contiguous),
+#                    countries, chunk counts
+#   terms.txt      - the vocabulary (bm25_feature_names.txt order)
+#   indptr.npy     - int64, per term: its cells are cells[indptr[t]:indptr[t + 1]]
+#   cells.npy      - int32, month * n_countries + country, ascending per term
+#   counts.npy     - int32, chunks containing the term in that cell
+#   term_totals.npy- int64, chunks containing the term overall
+#   totals.npy     - int32 (months x countries), dated chunks per cell
+#
+# Only nonzero cells are stored; the arrays are memory-mapped on load, so
+# a series for a few terms reads a few hundred bytes.
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from scripts.common.dates import MISSING_TS, to_unix_seconds
+from scripts.retrieval.index_registry import IndexRegistry
+
+TERM_SERIES_FORMAT = "term_series"
+TERM_SERIES_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+TERM_SERIES_PATHS = {
+    "fixed_660": "stage2_outputs/term_series/fixed_660",
+    "hierarchical": "stage2_outputs/term_series/hierarchical",
+}
+
+# Terms found in more than this share of all chunks say little about when
+# a topic was discussed; active_range() ignores them when rarer ones exist
+INFORMATIVE_MAX_SHARE = 0.02
+
+# Same tokens as the BM25 vectorizer (lowercase, \b\w+\b)
+_TOKEN_RE = re.compile(r"\w+")
+
+Terms = Union[str, Sequence[str]]
+
+
+class TermSeriesIndex:
+    def __init__(self, root: Optional[Path], manifest: Dict[str, Any], terms: List[str],
+                 indptr: np.ndarray, cells: np.ndarray, counts: np.ndarray,
+                 term_totals: np.ndarray, totals: np.ndarray):
+        self.root = Path(root) if root is not None else None
+        self.manifest = manifest
+        self.terms = terms
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.cells = cells
+        self.counts = counts
+        self.term_totals = term_totals
+        self.totals = totals
+        self.months: List[str] = manifest["months"]
+        self.countries: List[str] = manifest["countries"]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, X, terms: Sequence[str], timestamps: np.ndarray, countries: Sequence[str],
+              out: str | Path | None = None) -> "TermSeriesIndex":
+        """
+        X: (chunks x terms) BM25 matrix (only its nonzero pattern is used),
+        with one timestamp (Unix seconds, MISSING_TS if undated) and one
+        country per row. Undated rows are left out. Saved under `out` if given.
+        """
+        ts = np.asarray(timestamps, dtype=np.int64)
+        if X.shape != (len(ts), len(terms)) or len(countries) != len(ts):
+            raise ValueError(f"Shape mismatch: X {X.shape}, {len(ts)} timestamps, "
+                             f"{len(countries)} countries, {len(terms)} terms")
+        dated = np.flatnonzero(ts != MISSING_TS)
+
+        month_of = ts[dated].astype("datetime64[s]").astype("datetime64[M]")
+        if len(dated):
+            first, last = month_of.min(), month_of.max()
+            months = np.arange(first, last + 1)
+            month_idx = (month_of - first).astype(np.int64)
+        else:
+            months = np.zeros(0, dtype="datetime64[M]")
+            month_idx = np.zeros(0, dtype=np.int64)
+        country_names, country_idx = np.unique(np.asarray(countries, dtype=str)[dated], return_inverse=True)
+        n_countries = max(len(country_names), 1)
+        cell_of = month_idx * n_countries + country_idx
+        n_cells = len(months) * n_countries
+
+        # (cells x chunks) indicator times (chunks x terms) incidence
+        present = csr_matrix(X)[dated]
+        present = csr_matrix((np.ones(present.nnz, dtype=np.int32), present.indices, present.indptr),
+                             shape=present.shape)
+        group = csr_matrix((np.ones(len(dated), dtype=np.int32), (cell_of, np.arange(len(dated)))),
+                           shape=(n_cells, len(dated)))
+        by_term = (group @ present).T.tocsr()
+        by_term.sort_indices()
+
+        manifest = {
+            "format": TERM_SERIES_FORMAT,
+            "version": TERM_SERIES_FORMAT_VERSION,
+            "months": [str(m) for m in months],
+            "countries": [str(c) for c in country_names],
+            "num_terms": len(terms),
+            "num_chunks": int(len(ts)),
+            "num_dated": int(len(dated)),
+        }
+        index = cls(
+            None, manifest, list(terms),
+            by_term.indptr.astype(np.int64),
+            by_term.indices.astype(np.int32),
+            by_term.data.astype(np.int32),
+            np.asarray(by_term.sum(axis=1)).ravel().astype(np.int64),
+            np.bincount(cell_of, minlength=n_cells).reshape(len(months), n_countries).astype(np.int32),
+        )
+        if out is not None:
+            index.save(out)
+        return index
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: str | Path):
+        """
+        Arrays first, manifest last: a half-written directory never loads.
+        """
+        out = Path(out)
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "terms.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.terms))
+        np.save(out / "indptr.npy", np.asarray(self.indptr, dtype=np.int64))
+        np.save(out / "cells.npy", np.asarray(self.cells, dtype=np.int32))
+        np.save(out / "counts.npy", np.asarray(self.counts, dtype=np.int32))
+        np.save(out / "term_totals.npy", np.asarray(self.term_totals, dtype=np.int64))
+        np.save(out / "totals.npy", np.asarray(self.totals, dtype=np.int32))
+        tmp = out / (MANIFEST_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, out / MANIFEST_NAME)
+        self.root = out
+
+    @classmethod
+    def load(cls, path: str | Path, mmap_mode: Optional[str] = "r") -> "TermSeriesIndex":
+        root = Path(path)
+        with open(root / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != TERM_SERIES_FORMAT:
+            raise ValueError(f"Not a term series directory: {path}")
+        if manifest.get("version") != TERM_SERIES_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported term series version {manifest.get('version')} "
+                f"(expected {TERM_SERIES_FORMAT_VERSION}): {path}"
+            )
+        with open(root / "terms.txt", "r", encoding="utf-8") as f:
+            terms = f.read().split("\n")
+        return cls(
+            root, manifest, terms,
+            np.load(root / "indptr.npy", mmap_mode=mmap_mode),
+            np.load(root / "cells.npy", mmap_mode=mmap_mode),
+            np.load(root / "counts.npy", mmap_mode=mmap_mode),
+            np.load(root / "term_totals.npy"),
+            np.load(root / "totals.npy"),
+        )
+
+    # -----------------------------
+    # Series
+    # -----------------------------
+    def lookup(self, terms: Terms) -> List[int]:
+        """
+        Vocabulary ids of the terms (a text is tokenized like the BM25
+        vectorizer); unknown terms and repeats are dropped.
+        """
+        if isinstance(terms, str):
+            terms = _TOKEN_RE.findall(terms.lower())
+        ids = []
+        for t in terms:
+            i = self.term_ids.get(t.lower())
+            if i is not None and i not in ids:
+                ids.append(i)
+        return ids
+
+    def _country(self, country: Optional[str]) -> Optional[int]:
+        if country is None:
+            return None
+        try:
+            return self.countries.index(country)
+        except ValueError:
+            raise KeyError(f"Unknown country {country!r}; have {self.countries}") from None
+
+    def counts_matrix(self, terms: Terms, country: Optional[str] = None) -> np.ndarray:
+        """
+        (matched terms x months) chunk counts, in lookup() order; all
+        countries summed unless `country` is given.
+        """
+        ids = self.lookup(terms)
+        c = self._country(country)
+        n_c = len(self.countries)
+        out = np.zeros((len(ids), len(self.months)), dtype=np.int64)
+        for row, t in enumerate(ids):
+            lo, hi = int(self.indptr[t]), int(self.indptr[t + 1])
+            cells = np.asarray(self.cells[lo:hi])
+            counts = np.asarray(self.counts[lo:hi])
+            if c is not None:
+                keep = cells % n_c == c
+                cells, counts = cells[keep], counts[keep]
+            np.add.at(out[row], cells // n_c, counts)
+        return out
+
+    def period_totals(self, country: Optional[str] = None) -> np.ndarray:
+        """
+        Dated chunks per month (one country, or all).
+        """
+        c = self._country(country)
+        return self.totals[:, c].astype(np.int64) if c is not None else self.totals.sum(axis=1)
+
+    def series(self, terms: Terms, country: Optional[str] = None, relative: bool = False) -> np.ndarray:
+        """
+        Per month: chunks containing each term, summed over the terms; with
+        relative=True divided by the month's chunk count (0 for empty months).
+        """
+        values = self.counts_matrix(terms, country).sum(axis=0).astype(np.float64)
+        if relative:
+            totals = self.period_totals(country)
+            values = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+        return values
+
+    # -----------------------------
+    # Informative windows
+    # -----------------------------
+    def informative(self, terms: Terms, max_share: float = INFORMATIVE_MAX_SHARE) -> List[str]:
+        """
+        The terms found in at most max_share of all dated chunks (all of
+        them if none is that rare).
+        """
+        ids = self.lookup(terms)
+        limit = max_share * max(self.manifest["num_dated"], 1)
+        rare = [t for t in ids if self.term_totals[t] <= limit]
+        return [self.terms[t] for t in (rare or ids)]
+
+    def month_bounds(self, i: int) -> Tuple[int, int]:
+        """
+        [start, end) of month i in Unix seconds.
+        """
+        start = np.datetime64(self.months[i], "M")
+        return (to_unix_seconds(start.astype("datetime64[D]").item()),
+                to_unix_seconds((start + 1).astype("datetime64[D]").item()))
+
+    def active_range(self, terms: Terms, country: Optional[str] = None,
+                     max_share: float = INFORMATIVE_MAX_SHARE, min_count: int = 1) -> Optional[Tuple[int, int]]:
+        """
+        [start, end) (Unix seconds) from the first to the last month in
+        which the query's informative terms occur at least min_count
+        times, or None if they never do.
+        """
+        terms = self.informative(terms, max_share)
+        if not terms:
+            return None
+        active = np.flatnonzero(self.series(terms, country) >= min_count)
+        if not len(active):
+            return None
+        return self.month_bounds(int(active[0]))[0], self.month_bounds(int(active[-1]))[1]
+
+
+TERM_REGISTRY = IndexRegistry(TERM_SERIES_PATHS, loader=TermSeriesIndex.load)
@@ -0,0 +1,51 @@
+# time_decay.py
+# Soft temporal decay (Stage 3) as one NumPy expression over a candidate set.
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Optional
+
+import numpy as np
+
+from scripts.common.dates import MISSING_DAY, to_epoch_day
+
+DAYS_PER_YEAR = 365.25
+
+# Kernels over the age in years (dy) of a chunk relative to as_of
+DECAY_KERNELS = {
+    "rational": lambda dy, lambd: 1.0 / (1.0 + lambd * dy),
+    "exponential": lambda dy, lambd: np.exp(-lambd * dy),
+    "gaussian": lambda dy, lambd: np.exp(-lambd * dy * dy),
+}
+
+
+def as_of_day(as_of: Optional[date] = None) -> int:
+    """
+    Epoch day of the query time; None means today.
+    """
+    return to_epoch_day(as_of if as_of is not None else datetime.now())
+
+
+def time_scores(days: np.ndarray, as_of: Optional[date] = None, lambd: float = 0.5,
+                kernel: str = "rational") -> np.ndarray:
+    """
+    Recency score in (0, 1] per row; NaN where the row has no date.
+    """
+    if kernel not in DECAY_KERNELS:
+        raise ValueError(f"Unknown decay kernel: {kernel}")
+    days = np.asarray(days)
+    dy = np.abs(as_of_day(as_of) - days.astype(np.float64)) / DAYS_PER_YEAR
+    out = DECAY_KERNELS[kernel](dy, lambd)
+    return np.where(days == MISSING_DAY, np.nan, out)
+
+
+def apply_time_decay(scores: np.ndarray, days: np.ndarray, as_of: Optional[date] = None,
+                     alpha: float = 0.3, lambd: float = 0.5, kernel: str = "rational") -> np.ndarray:
+    """
+    (1 - alpha) * score + alpha * kernel(age); undated rows keep their score.
+
+    scores: (n_rows,) or (n_queries x n_rows); days: int32 epoch day per row.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    t = time_scores(days, as_of, lambd, kernel)
+    return np.where(np.isnan(t), scores, (1 - alpha) * scores + alpha * t)
@@ -0,0 +1,93 @@
+"""
+build_term_series.py
+====================
+
+Builds the per-month term counts (scripts/retrieval/term_series.py) for
+each chunking method from the Stage 2 outputs:
+
+    bm25_chunks_outputs/<subdir>/X_bm25_chunks.npz     which chunk has which term
+    bm25_chunks_outputs/<subdir>/bm25_feature_names.txt
+    stage2_outputs/temporal_index_stage2.json          timestamp of every chunk
+
+and writes stage2_outputs/term_series/<chunking_method>/.
+
+    python scripts/stage2_Temporal_Indexing/build_term_series.py [stage2_json]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import load_npz
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.common.dates import MISSING_TS
+from scripts.retrieval.term_series import TERM_SERIES_PATHS, TermSeriesIndex
+from scripts.retrieval.temporal_retrieval import chunk_timestamps
+
+BM25_ROOT = Path("bm25_chunks_outputs")
+BM25_SUBDIRS = {"fixed_660": "fixed", "hierarchical": "hierarchical"}
+STAGE2_JSON = "stage2_outputs/temporal_index_stage2.json"
+
+SAMPLE_TERMS = ["israel", "gaza", "climate", "budget"]
+
+
+def chunk_country(entry) -> str:
+    """
+    UK / US from the source file name (as run_temporal_queries selects a
+    corpus); the Stage 2 "country" field when the name has no prefix.
+    """
+    prefix = str(entry.get("source") or "").split("_", 1)[0].upper()
+    return prefix if prefix in ("UK", "US") else str(entry.get("country") or "UNKNOWN")
+
+
+def bm25_rows(entries, chunking_method, n_rows):
+    """
+    Timestamp and country of every BM25 matrix row, from the Stage 2
+    "<chunking_method>_bm25_<row>" entries.
+    """
+    ts = np.full(n_rows, MISSING_TS, dtype=np.int64)
+    countries = np.full(n_rows, "UNKNOWN", dtype=object)
+    mine = [e for e in entries if e["chunking_method"] == chunking_method and e["embedding_method"] == "bm25"]
+    rows = np.array([int(e["id"].rsplit("_", 1)[1]) for e in mine], dtype=np.int64)
+    if len(rows) and rows.max() >= n_rows:
+        raise ValueError(f"{chunking_method}: Stage 2 row {rows.max()} outside the {n_rows}-row BM25 matrix")
+    ts[rows] = chunk_timestamps(mine)
+    countries[rows] = [chunk_country(e) for e in mine]
+    return ts, countries
+
+
+if __name__ == "__main__":
+    stage2_json = sys.argv[1] if len(sys.argv) > 1 else STAGE2_JSON
+
+    print(f"[LOAD] {stage2_json}")
+    with open(stage2_json, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    print(f"[LOAD] {len(entries)} entries")
+
+    for chunking_method, subdir in BM25_SUBDIRS.items():
+        bm25_dir = BM25_ROOT / subdir
+        print(f"\n[BUILD] {chunking_method} <- {bm25_dir}")
+        t0 = time.perf_counter()
+        X = load_npz(bm25_dir / "X_bm25_chunks.npz")
+        with open(bm25_dir / "bm25_feature_names.txt", "r", encoding="utf-8") as f:
+            terms = [line.rstrip("\n") for line in f]
+        ts, countries = bm25_rows(entries, chunking_method, X.shape[0])
+
+        index = TermSeriesIndex.build(X, terms, ts, countries, out=TERM_SERIES_PATHS[chunking_method])
+        m = index.manifest
+        print(f"[BUILD] {m['num_terms']} terms x {len(m['months'])} months x {len(m['countries'])} countries "
+              f"({len(index.cells)} nonzero cells, {m['num_dated']}/{m['num_chunks']} chunks dated) "
+              f"in {time.perf_counter() - t0:.1f} s")
+
+        index = TermSeriesIndex.load(TERM_SERIES_PATHS[chunking_method])
+        t0 = time.perf_counter()
+        series = index.series(SAMPLE_TERMS, relative=True)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"[QUERY] {SAMPLE_TERMS}: {len(series)}-month series in {ms:.2f} ms")
+
+    print("\n[DONE] Saved:", ", ".join(TERM_SERIES_PATHS.values()))
@@ -6,18 +6,25 @@ sys.path.append(str(PROJECT_ROOT))
 import pandas as pd
 import numpy as np
 from scipy.sparse import load_npz
-import pickle
 import json
 from datetime import datetime
 import re
+import time
 import matplotlib.pyplot as plt
-from collections import defaultdict, Counter
 import logging
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 # For NLP date extraction
 import spacy
 from dateutil import parser as dateutil_parser
 
+from scripts.vectorization.vector_index import VectorIndex
+from scripts.retrieval.temporal_store import write_temporal_dataset
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -61,12 +68,9 @@ def load_dense_embeddings():
     """Load dense embeddings"""
     print("🧠 Loading dense embeddings...")
     
-    with open("vector_indexes/fixed_660/vector_index.pkl", "rb") as f:
-        idx_fixed = pickle.load(f)
-    
-    with open("vector_indexes/hierarchical/vector_index.pkl", "rb") as f:
-        idx_hier = pickle.load(f)
-    
+    idx_fixed = VectorIndex.load("vector_indexes/fixed_660/vector_index")
+    idx_hier = VectorIndex.load("vector_indexes/hierarchical/vector_index")
+
     return {
         'fixed_660': idx_fixed.dense_matrix,
         'hierarchical': idx_hier.dense_matrix
@@ -106,90 +110,108 @@ def extract_date_from_filename(filename):
     return None
 
 
+def temporal_columns(sources):
+    """
+    timestamp_iso / timestamp_unix / extraction_confidence for every row of
+    `sources`: each distinct file name is parsed once and the result
+    broadcast to all of its chunks.
+    """
+    codes, files = pd.factorize(sources)
+    # One entry per distinct file, plus None for missing names (code -1)
+    iso = [extract_date_from_filename(f) if isinstance(f, str) else None for f in files] + [None]
+    unix = [to_unix_seconds_safe(datetime.fromisoformat(d)) if d else None for d in iso]
+
+    iso = np.array(iso, dtype=object)[codes]
+    return pd.DataFrame({
+        'timestamp_iso': pd.Series(iso, index=sources.index, dtype=object),
+        'timestamp_unix': pd.Series(pd.array(unix, dtype='Int64')[codes], index=sources.index),
+        'extraction_confidence': np.where(pd.notna(iso), 1.0, 0.0),
+    }, index=sources.index)
+
+
 # ============================================================
 # 3. TEMPORAL VECTOR INDEX CLASS
 # ============================================================
 
+# Embedding method -> tag in the chunk id ("<chunking>_<tag>_<row>")
+ID_TAGS = {'bm25': 'bm25', 'dense_e5_base': 'dense'}
+
+COLUMNS = ['id', 'text_preview', 'source', 'country', 'chunking_method', 'embedding_method',
+           'timestamp_iso', 'timestamp_unix', 'extraction_confidence', 'bm25_dim', 'dense_dim']
+
+
+def chunk_columns(df_subset):
+    """
+    Columns shared by every embedding method of one chunking method:
+    preview, source, country and the temporal metadata.
+    """
+    text = df_subset['text'].fillna('').astype(str)
+    preview = text.str.slice(0, 300).where(text.str.len() <= 300, text.str.slice(0, 300) + "...")
+    base = pd.DataFrame({
+        'text_preview': preview,
+        'source': df_subset['orig_file'],
+        'country': df_subset['country'],
+    })
+    return base.join(temporal_columns(df_subset['orig_file']))
+
+
+def _column_list(series):
+    """Plain Python values, None for missing (for json.dump)"""
+    return series.to_numpy(dtype=object, na_value=None).tolist()
+
+
 class TemporalVectorIndex:
     """Unified temporal index with embeddings and temporal metadata"""
     
     def __init__(self):
-        self.chunks = []
-        self.extraction_log = []
+        # One DataFrame per (chunking method, embedding method), in COLUMNS order
+        self.blocks = []
+        self._table = None
+        self._chunks = None
     
-    def add_chunk_with_temporal_metadata(self,
-                                         chunk_id,
-                                         text,
-                                         source,
-                                         country,
-                                         chunking_method,
-                                         embedding_method,
-                                         bm25_vector=None,
-                                         dense_vector=None):
-        """Add chunk with automatic date extraction and temporal metadata"""
-        
-        # Extract date using filename
-        timestamp_iso = extract_date_from_filename(source)
-        strategy = "filename" if timestamp_iso else "none"
-        confidence = 1.0 if timestamp_iso else 0     
-
-        timestamp_unix = None
-        extraction_success = False
-        
-        if timestamp_iso:
-            try:
-                dt = datetime.fromisoformat(timestamp_iso)
-                timestamp_unix = to_unix_seconds_safe(dt)
-                extraction_success = True
-            except Exception as e:
-                logger.warning(f"Error converting {timestamp_iso}: {e}")
-                timestamp_unix = None
-                extraction_success = False
-        
-        # Log extraction attempt
-        self.extraction_log.append({
-            'chunk_id': chunk_id,
-            'success': extraction_success,
-            'date': timestamp_iso,
-            'confidence': confidence,
-            'country': country,
-            'source': source,
-            'embedding_method': embedding_method
-        })
-        
-        # Convert BM25 vector if provided
-        bm25_dense = None
-        if bm25_vector is not None:
-            if hasattr(bm25_vector, 'toarray'):
-                bm25_dense = bm25_vector.toarray().flatten().tolist()
-            else:
-                bm25_dense = bm25_vector.tolist() if isinstance(bm25_vector, np.ndarray) else bm25_vector
-        
-        # Convert dense vector if provided
-        dense_list = None
-        if dense_vector is not None:
-            if isinstance(dense_vector, np.ndarray):
-                dense_list = dense_vector.tolist()
-            else:
-                dense_list = dense_vector
-        
-        chunk_data = {
-            'id': chunk_id,
-            'text_preview': text[:300] + "..." if len(text) > 300 else text,
-            'source': source,
-            'country': country,
-            'chunking_method': chunking_method,
-            'embedding_method': embedding_method,
-            'timestamp_iso': timestamp_iso,
-            'timestamp_unix': timestamp_unix,
-            'extraction_confidence': confidence,
-            'embeddings_shape': {
-                'bm25': len(bm25_dense) if bm25_dense else None,
-                'dense_e5_base': len(dense_list) if dense_list else None
-            }
-        }
-        
-        self.chunks.append(chunk_data)
+    def add_chunks(self, base, chunking_method, embedding_method, matrix_shape):
+        """
+        Adds one entry per row of `base` (chunk_columns of one chunking
+        method, in matrix row order). The embedding dimension is the
+        matrix's column count.
+        """
+        n_rows, dim = matrix_shape
+        if n_rows < len(base):
+            raise ValueError(f"{chunking_method}/{embedding_method}: matrix has {n_rows} rows "
+                             f"for {len(base)} chunks")
+        n = len(base)
+        missing = pd.array([None] * n, dtype='Int64')
+        present = pd.array(np.full(n, dim), dtype='Int64')
+        block = base.reset_index(drop=True).assign(
+            id=f"{chunking_method}_{ID_TAGS[embedding_method]}_" + pd.Series(np.arange(n)).astype(str),
+            chunking_method=chunking_method,
+            embedding_method=embedding_method,
+            bm25_dim=present if embedding_method == 'bm25' else missing,
+            dense_dim=present if embedding_method != 'bm25' else missing,
+        )
+        self.blocks.append(block[COLUMNS])
+        self._table = self._chunks = None
+    
+    @property
+    def table(self):
+        """All entries as one DataFrame"""
+        if self._table is None:
+            self._table = pd.concat(self.blocks, ignore_index=True) if self.blocks else pd.DataFrame(columns=COLUMNS)
+        return self._table
+    
+    @property
+    def chunks(self):
+        """All entries as dicts, in the Stage 2 JSON format"""
+        if self._chunks is None:
+            t = self.table
+            flat = ['id', 'text_preview', 'source', 'country', 'chunking_method', 'embedding_method',
+                    'timestamp_iso', 'timestamp_unix', 'extraction_confidence']
+            cols = [_column_list(t[c]) for c in flat]
+            self._chunks = [
+                {**dict(zip(flat, values)), 'embeddings_shape': {'bm25': bm25, 'dense_e5_base': dense}}
+                for *values, bm25, dense in zip(*cols, _column_list(t['bm25_dim']), _column_list(t['dense_dim']))
+            ]
+        return self._chunks
     
     def save_to_json(self, filepath):
         """Save temporal index to JSON"""
@@ -201,7 +223,16 @@ class TemporalVectorIndex:
     def save_extraction_log(self, filepath):
         """Save date extraction analysis"""
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        df_log = pd.DataFrame(self.extraction_log)
+        t = self.table
+        df_log = pd.DataFrame({
+            'chunk_id': t['id'],
+            'success': t['timestamp_iso'].notna(),
+            'date': t['timestamp_iso'],
+            'confidence': t['extraction_confidence'],
+            'country': t['country'],
+            'source': t['source'],
+            'embedding_method': t['embedding_method'],
+        })
         df_log.to_csv(filepath, index=False)
         print(f"✅ Saved extraction log to {filepath}")
         
@@ -218,17 +249,13 @@ class TemporalVectorIndex:
         print(f"   ❌ Failed: {total_count - success_count} ({100-success_rate:.1f}%)")
         
         print(f"\n   By embedding method:")
-        for emb_method in df_log['embedding_method'].unique():
-            method_data = df_log[df_log['embedding_method'] == emb_method]
-            method_success = method_data['success'].sum()
-            method_total = len(method_data)
+        by_method = df_log.groupby('embedding_method', sort=False)['success'].agg(['sum', 'count'])
+        for emb_method, (method_success, method_total) in by_method.iterrows():
             print(f"      • {emb_method}: {method_success}/{method_total} ({100*method_success/method_total:.1f}%)")
         
         print(f"\n   By country:")
-        for country in df_log['country'].unique():
-            country_data = df_log[df_log['country'] == country]
-            country_success = country_data['success'].sum()
-            country_total = len(country_data)
+        by_country = df_log.groupby('country', sort=False, dropna=False)['success'].agg(['sum', 'count'])
+        for country, (country_success, country_total) in by_country.iterrows():
             print(f"      • {country}: {country_success}/{country_total} ({100*country_success/country_total:.1f}%)")
         
         print("="*70 + "\n")
@@ -236,42 +263,42 @@ class TemporalVectorIndex:
     def save_to_parquet(self, filepath):
         """Save metadata to Parquet"""
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        df = pd.DataFrame(self.chunks)
-        df.to_parquet(filepath)
+        self.table.to_parquet(filepath, index=False)
         print(f"✅ Saved metadata to {filepath}")
     
+    def save_to_dataset(self, root):
+        """Save as the partitioned Parquet dataset the Stage 3 / 4 runners read"""
+        write_temporal_dataset(self.table, root)
+        print(f"✅ Saved partitioned dataset to {root}")
+    
     def get_stats(self):
         """Print comprehensive statistics"""
-        dates = [c['timestamp_iso'] for c in self.chunks if c['timestamp_iso']]
+        t = self.table
+        dates = t['timestamp_iso'].dropna()
         
         print("\n" + "="*70)
         print("📊 TEMPORAL INDEX STATISTICS")
         print("="*70)
-        print(f"   Total chunks: {len(self.chunks)}")
-        print(f"   Chunks with valid dates: {len(dates)} ({100*len(dates)/len(self.chunks):.1f}%)")
-        print(f"   Chunks without dates: {len(self.chunks) - len(dates)}")
+        print(f"   Total chunks: {len(t)}")
+        print(f"   Chunks with valid dates: {len(dates)} ({100*len(dates)/len(t):.1f}%)")
+        print(f"   Chunks without dates: {len(t) - len(dates)}")
         
-        if dates:
-            years = [d[:4] for d in dates]
-            print(f"\n   📅 Date range: {min(dates)} to {max(dates)}")
-            year_dist = dict(Counter(years))
+        if len(dates):
+            print(f"\n   📅 Date range: {dates.min()} to {dates.max()}")
             print(f"   📈 Year distribution:")
-            for year in sorted(year_dist.keys()):
-                print(f"      {year}: {year_dist[year]} chunks")
+            for year, count in dates.str.slice(0, 4).value_counts().sort_index().items():
+                print(f"      {year}: {count} chunks")
         
         print(f"\n   🌍 Country distribution:")
-        countries = Counter([c['country'] for c in self.chunks])
-        for country, count in sorted(countries.items()):
+        for country, count in t['country'].value_counts().sort_index().items():
             print(f"      {country}: {count}")
         
         print(f"\n   🔀 Chunking methods:")
-        methods = Counter([c['chunking_method'] for c in self.chunks])
-        for method, count in sorted(methods.items()):
+        for method, count in t['chunking_method'].value_counts().sort_index().items():
             print(f"      {method}: {count}")
         
         print(f"\n   🧠 Embedding methods:")
-        embeddings = Counter([c['embedding_method'] for c in self.chunks])
-        for emb, count in sorted(embeddings.items()):
+        for emb, count in t['embedding_method'].value_counts().sort_index().items():
             print(f"      {emb}: {count}")
         print("="*70 + "\n")
 
@@ -282,20 +309,14 @@ class TemporalVectorIndex:
 def visualize_temporal_dist(temporal_index, output_path="stage2_outputs/temporal_distribution.png"):
     """Create histogram of temporal distribution"""
     
-    years = defaultdict(int)
-    
-    for chunk in temporal_index.chunks:
-        if chunk['timestamp_iso']:
-            year = chunk['timestamp_iso'][:4]
-            years[year] += 1
+    years = temporal_index.table['timestamp_iso'].dropna().str.slice(0, 4).value_counts().sort_index()
     
-    if not years:
+    if years.empty:
         print("⚠️ No valid dates to visualize")
         return
     
-    sorted_years = sorted(years.items())
-    x = [y for y, c in sorted_years]
-    y = [c for y, c in sorted_years]
+    x = years.index.tolist()
+    y = years.tolist()
     
     plt.figure(figsize=(14, 6))
     plt.bar(x, y, color='steelblue', edgecolor='black', alpha=0.7)
@@ -310,6 +331,14 @@ def visualize_temporal_dist(temporal_index, output_path="stage2_outputs/temporal
     plt.show()
 
 
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
 
 # ============================================================
 # 5. MAIN EXECUTION
@@ -319,6 +348,7 @@ if __name__ == "__main__":
     print("\n" + "="*70)
     print("🚀 STAGE 2: TEMPORAL INDEXING WITH SEPARATED EMBEDDING METHODS")
     print("="*70)
+    build_start = time.perf_counter()
     
     # Load data
     print("\n📥 LOADING DATA...")
@@ -331,7 +361,7 @@ if __name__ == "__main__":
     print(f"   • Chunking methods: {df_chunks['chunking_method'].unique()}")
     print(f"   • Country distribution: {df_chunks['country'].value_counts().to_dict()}")
     
-    # Build temporal index
+    # Build temporal index: whole columns per chunking method, no per-row work
     print(f"\n🔨 BUILDING TEMPORAL INDEX...")
     temporal_index = TemporalVectorIndex()
     
@@ -341,61 +371,34 @@ if __name__ == "__main__":
         df_subset = df_chunks[df_chunks['chunking_method'] == chunking_method].reset_index(drop=True)
         print(f"      Total chunks in this method: {len(df_subset)}")
         
-        bm25_mat = bm25_matrices[chunking_method]
-        dense_mat = dense_embeddings[chunking_method]
+        # Dates parsed once per source file, shared by both embedding methods
+        base = chunk_columns(df_subset)
+        print(f"      Dates parsed for {df_subset['orig_file'].nunique()} source files")
         
-        # Process BM25 embeddings
-        print(f"      ➡️ Processing BM25 embeddings...")
-        for idx, row in df_subset.iterrows():
-            if idx % 500 == 0:
-                print(f"         BM25: Processing chunk {idx}/{len(df_subset)}", end='\r')
-            
-            bm25_row = bm25_mat[idx]
-            
-            temporal_index.add_chunk_with_temporal_metadata(
-                chunk_id=f"{chunking_method}_bm25_{idx}",
-                text=row['text'],
-                source=row['orig_file'],
-                country=row['country'],
-                chunking_method=chunking_method,
-                embedding_method='bm25',
-                bm25_vector=bm25_row,
-                dense_vector=None
-            )
+        temporal_index.add_chunks(base, chunking_method, 'bm25', bm25_matrices[chunking_method].shape)
         print(f"      ✅ BM25 completed: {len(df_subset)} chunks added")
         
-        # Process Dense embeddings
-        print(f"      ➡️ Processing Dense embeddings...")
-        for idx, row in df_subset.iterrows():
-            if idx % 500 == 0:
-                print(f"         Dense: Processing chunk {idx}/{len(df_subset)}", end='\r')
-            
-            dense_row = dense_mat[idx]
-            
-            temporal_index.add_chunk_with_temporal_metadata(
-                chunk_id=f"{chunking_method}_dense_{idx}",
-                text=row['text'],
-                source=row['orig_file'],
-                country=row['country'],
-                chunking_method=chunking_method,
-                embedding_method='dense_e5_base',
-                bm25_vector=None,
-                dense_vector=dense_row
-            )
+        temporal_index.add_chunks(base, chunking_method, 'dense_e5_base', dense_embeddings[chunking_method].shape)
         print(f"      ✅ Dense completed: {len(df_subset)} chunks added")
+    index_seconds = time.perf_counter() - build_start
     
     # Save outputs
     print(f"\n💾 SAVING OUTPUTS...")
     temporal_index.save_to_json("stage2_outputs/temporal_index_stage2.json")
     temporal_index.save_to_parquet("stage2_outputs/temporal_index_metadata.parquet")
+    temporal_index.save_to_dataset("stage2_outputs/temporal_index_dataset")
     temporal_index.save_extraction_log("stage2_outputs/date_extraction_analysis.csv")
+    build_seconds = time.perf_counter() - build_start
     
     # Statistics
     temporal_index.get_stats()
+    peak = peak_rss_mb()
+    print(f"⏱️ Build: {build_seconds:.1f} s ({index_seconds:.1f} s to the in-memory index), "
+          f"peak RSS: {f'{peak:.0f} MB' if peak is not None else 'n/a'}")
     
     # Visualization
     print("📈 CREATING VISUALIZATIONS...")
     visualize_temporal_dist(temporal_index)
     
     print("\n✅ STAGE 2 COMPLETED SUCCESSFULLY!")
-    print(f"   📁 Output files saved to: stage2_outputs/")
\ No newline at end of file
+    print(f"   📁 Output files saved to: stage2_outputs/")
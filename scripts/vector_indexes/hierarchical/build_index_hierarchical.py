@@ -5,6 +5,7 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 sys.path.append(str(PROJECT_ROOT))
 
 from scripts.vectorization.vector_index import VectorIndex, load_chunks_from_dir
+from scripts.vectorization.partitioned_index import PartitionedIndex
 
 
 
@@ -16,16 +17,48 @@ if __name__ == "__main__":
     OUTPUT_DIR = PROJECT_ROOT / "vector_indexes" / "hierarchical"
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    OUTPUT_INDEX = OUTPUT_DIR / "vector_index.pkl"
+    OUTPUT_INDEX = OUTPUT_DIR / "vector_index"
+    OUTPUT_PARTITIONS = OUTPUT_DIR / "partitioned_index"
+
+    # Encoding: sharded + resumable. Every worker process loads its own copy
+    # of the model (~0.5 GB resident each), so memory grows with the count;
+    # raise it only on a machine with RAM to match (None = one per CPU)
+    ENCODE_SHARD_DIR = OUTPUT_DIR / "encode_shards"
+    ENCODE_WORKERS = 2
+
+    # IVF ANN over the dense matrix: off until scripts/benchmarks/bench_ann.py
+    # shows an acceptable recall / latency trade-off on this index
+    BUILD_ANN = False
+
+    # int8 copy of the dense matrix for first-stage scoring (only its
+    # rescored rows become candidates); off until bench_quant.py shows the
+    # recall / latency trade-off on this index
+    QUANTIZE = False
 
     print("[LOAD] Loading chunks...")
     chunks = load_chunks_from_dir(CHUNKS_DIR, CHUNKING_NAME)
     print(f"[LOAD] {len(chunks)} chunks loaded")
 
     print("[BUILD] Building vector index (BM25 + Dense)...")
-    index = VectorIndex(chunks)
+    index = VectorIndex(chunks, encode_shard_dir=ENCODE_SHARD_DIR, encode_workers=ENCODE_WORKERS)
+    stats = index.embedding_stats
+    print(f"[BUILD] Embeddings: {stats['reused']} reused, {stats['computed']} computed")
+
+    if BUILD_ANN:
+        print("[BUILD] Building ANN (IVF) over the dense matrix...")
+        index.build_ann()
+        print(f"[BUILD] {index.ann.nlist} lists")
+
+    if QUANTIZE:
+        print("[BUILD] Quantizing dense matrix (int8)...")
+        index.quantize("int8")
+        print(f"[BUILD] {index.quant.nbytes / 1e6:.1f} MB (float32: {index.dense_matrix.nbytes / 1e6:.1f} MB)")
 
     print("[SAVE] Saving index...")
     index.save(str(OUTPUT_INDEX))
 
-    print("[DONE] Saved:", OUTPUT_INDEX)
+    print("[SAVE] Saving month partitions...")
+    partitioned = PartitionedIndex.build(index, OUTPUT_PARTITIONS)
+    print(f"[SAVE] {len(partitioned.partitions)} partitions")
+
+    print("[DONE] Saved:", OUTPUT_INDEX, OUTPUT_PARTITIONS)
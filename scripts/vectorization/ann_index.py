@@ -0,0 +1,139 @@
+"""
+ann_index.py
+============
+
+IVF (inverted file) approximate nearest-neighbour index over the
+normalized e5 dense matrix. Pure NumPy, CPU only.
+
+- build: spherical k-means splits the rows into `nlist` clusters
+- search: score the centroids, open the `nprobe` closest lists and
+  score only the rows inside them
+
+The index stores row ids only; vectors are read from the dense matrix
+it was built for (memory-mapped when the VectorIndex was loaded).
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+
+DEFAULT_NPROBE = 8
+
+
+def _default_nlist(n_rows: int) -> int:
+    return max(1, min(n_rows, int(4 * np.sqrt(n_rows))))
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, list_indptr: np.ndarray, list_ids: np.ndarray,
+                 vectors: np.ndarray, nprobe: int = DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_ids = list_ids
+        self.vectors = vectors
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int | None = None, n_iter: int = 20,
+              sample_size: int = 50_000, seed: int = 0, batch_size: int = 8192,
+              nprobe: int = DEFAULT_NPROBE) -> "IVFIndex":
+        """
+        Spherical k-means on (a sample of) the rows, then every row is
+        assigned to its closest centroid by inner product.
+        """
+        n = len(vectors)
+        nlist = nlist or _default_nlist(n)
+        rng = np.random.default_rng(seed)
+
+        sample_idx = rng.choice(n, size=min(n, sample_size), replace=False)
+        sample = np.asarray(vectors[np.sort(sample_idx)], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters from random sample rows
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, batch_size):
+            block = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assign[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+
+        list_ids = np.argsort(assign, kind="stable").astype(np.int32)
+        list_indptr = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=list_indptr[1:])
+
+        return cls(centroids.astype(np.float32), list_indptr, list_ids, vectors, nprobe=nprobe)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, q: np.ndarray, k: int, nprobe: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (row ids, inner-product scores) of the approximate top-k,
+        best first. Larger nprobe = higher recall, more rows scanned.
+        """
+        q = np.asarray(q, dtype=np.float32).reshape(-1)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        centroid_scores = self.centroids @ q
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        ids = np.concatenate([
+            self.list_ids[self.list_indptr[c]:self.list_indptr[c + 1]] for c in probe
+        ])
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ids = np.sort(ids)  # sequential reads from the (memory-mapped) matrix
+        scores = np.asarray(self.vectors[ids], dtype=np.float32) @ q
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return ids[top].astype(np.int64), scores[top]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: Path) -> Dict[str, Any]:
+        out.mkdir(parents=True, exist_ok=True)
+        np.save(out / "centroids.npy", np.asarray(self.centroids))
+        np.save(out / "list_indptr.npy", np.asarray(self.list_indptr))
+        np.save(out / "list_ids.npy", np.asarray(self.list_ids))
+        params = {"type": "ivf", "nlist": self.nlist, "nprobe": self.nprobe}
+        with open(out / "ann.json", "w", encoding="utf-8") as f:
+            json.dump(params, f, indent=2)
+        return params
+
+    @classmethod
+    def load(cls, src: Path, vectors: np.ndarray, mmap_mode: str | None = "r") -> "IVFIndex":
+        with open(src / "ann.json", "r", encoding="utf-8") as f:
+            params = json.load(f)
+        return cls(
+            centroids=np.load(src / "centroids.npy"),
+            list_indptr=np.load(src / "list_indptr.npy"),
+            list_ids=np.load(src / "list_ids.npy", mmap_mode=mmap_mode),
+            vectors=vectors,
+            nprobe=params.get("nprobe", DEFAULT_NPROBE),
+        )
@@ -0,0 +1,275 @@
+"""
+bm25_index.py
+=============
+
+Inverted-index BM25 (Okapi variant, identical scores to rank_bm25.BM25Okapi).
+
+Layout (term-major CSR):
+    indptr[t] : indptr[t + 1]   -> slice of the postings of term t
+    post_docs                   -> chunk row ids, ascending within a term
+    post_tf                     -> term frequency of t in that chunk
+
+Per-document length norms  k1 * (1 - b + b * |d| / avgdl)  are precomputed
+at build time, so a query only touches the postings of its own terms.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class BM25Index:
+    def __init__(self, vocab: Dict[str, int], idf, doc_len, norm,
+                 indptr, post_docs, post_tf,
+                 avgdl: float, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.vocab = vocab
+        self.idf = idf
+        self.doc_len = doc_len
+        self.norm = norm
+        self.indptr = indptr
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.avgdl = avgdl
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self._weights = None
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_len)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def from_tokens(cls, corpus: Sequence[List[str]], k1: float = 1.5, b: float = 0.75,
+                    epsilon: float = 0.25) -> "BM25Index":
+        """
+        Builds from tokenized documents. Term ids are assigned in order of
+        first appearance, which is also the order BM25Okapi sums idf values
+        in, so the epsilon floor comes out bit-identical.
+        """
+        vocab: Dict[str, int] = {}
+        ids: List[int] = []
+        lengths = np.zeros(len(corpus), dtype=np.int64)
+        for d, doc in enumerate(corpus):
+            for tok in doc:
+                t = vocab.get(tok)
+                if t is None:
+                    t = vocab[tok] = len(vocab)
+                ids.append(t)
+            lengths[d] = len(doc)
+        doc_of_token = np.repeat(np.arange(len(corpus), dtype=np.int64), lengths)
+        return cls._from_postings(vocab, np.asarray(ids, dtype=np.int64), doc_of_token, lengths, k1, b, epsilon)
+
+    @classmethod
+    def from_streams(cls, streams, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> "BM25Index":
+        """
+        Builds from interned TokenStreams. Their ids are also assigned in
+        order of first appearance, so the result equals from_tokens().
+        """
+        lengths = streams.lengths.astype(np.int64)
+        doc_of_token = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        return cls._from_postings(dict(streams.term_ids), np.asarray(streams.ids, dtype=np.int64),
+                                  doc_of_token, lengths, k1, b, epsilon)
+
+    @classmethod
+    def from_okapi(cls, bm25) -> "BM25Index":
+        """
+        Converts a fitted rank_bm25.BM25Okapi (e.g. from a legacy pickle).
+        """
+        vocab = {t: i for i, t in enumerate(bm25.idf.keys())}
+        pairs = [(vocab[term], d, tf) for d, freqs in enumerate(bm25.doc_freqs) for term, tf in freqs.items()]
+        arr = np.array(pairs, dtype=np.int64).reshape(-1, 3)
+        order = np.lexsort((arr[:, 1], arr[:, 0]))
+        arr = arr[order]
+        return cls._finalize(
+            vocab, arr[:, 0], arr[:, 1], arr[:, 2],
+            np.asarray(bm25.doc_len, dtype=np.int64), bm25.k1, bm25.b, bm25.epsilon,
+        )
+
+    @classmethod
+    def _from_postings(cls, vocab, term_ids, doc_ids, lengths, k1, b, epsilon) -> "BM25Index":
+        n_docs = len(lengths)
+        keys = term_ids * max(n_docs, 1) + doc_ids
+        uniq, tf = np.unique(keys, return_counts=True)
+        return cls._finalize(vocab, uniq // max(n_docs, 1), uniq % max(n_docs, 1), tf, lengths, k1, b, epsilon)
+
+    @classmethod
+    def _finalize(cls, vocab, post_terms, post_docs, post_tf, doc_len, k1, b, epsilon) -> "BM25Index":
+        n_terms = len(vocab)
+        n_docs = len(doc_len)
+
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_terms, minlength=n_terms), out=indptr[1:])
+        df = np.diff(indptr)
+
+        # Same arithmetic (and summation order) as BM25Okapi._calc_idf
+        idf = np.empty(n_terms, dtype=np.float64)
+        idf_sum = 0
+        for t in range(n_terms):
+            freq = int(df[t])
+            idf[t] = math.log(n_docs - freq + 0.5) - math.log(freq + 0.5)
+            idf_sum += idf[t]
+        average_idf = idf_sum / n_terms if n_terms else 0.0
+        idf[idf < 0] = epsilon * average_idf
+
+        avgdl = int(doc_len.sum()) / n_docs if n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_len / avgdl) if n_docs else np.zeros(0)
+
+        return cls(
+            vocab=vocab,
+            idf=idf,
+            doc_len=doc_len.astype(np.int64),
+            norm=norm,
+            indptr=indptr,
+            post_docs=post_docs.astype(np.int32),
+            post_tf=post_tf.astype(np.int32),
+            avgdl=float(avgdl),
+            k1=k1,
+            b=b,
+            epsilon=epsilon,
+        )
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def _postings(self, t: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[t], self.indptr[t + 1]
+        return self.post_docs[start:end], self.post_tf[start:end]
+
+    def _contrib(self, t: int, docs: np.ndarray, tf: np.ndarray) -> np.ndarray:
+        tf = np.asarray(tf, dtype=np.int64)
+        return self.idf[t] * (tf * (self.k1 + 1) / (tf + self.norm[docs]))
+
+    def get_scores(self, query: List[str], rows: slice | None = None) -> np.ndarray:
+        """
+        Score vector over all documents (same values as BM25Okapi.get_scores),
+        or over the contiguous row range `rows` only (see get_scores_ranges).
+        """
+        if rows is not None:
+            return self.get_scores_ranges(query, [rows])[0]
+        score = np.zeros(self.num_docs)
+        for q in query:
+            t = self.vocab.get(q)
+            if t is None:
+                continue
+            docs, tf = self._postings(t)
+            score[docs] += self._contrib(t, docs, tf)
+        return score
+
+    def get_scores_ranges(self, query: List[str], ranges: List[slice]) -> List[np.ndarray]:
+        """
+        One score vector per contiguous row range. Each posting list is cut
+        to all the ranges with one binary search, and the contributions are
+        read from weight_matrix() (its data runs parallel to the postings)
+        instead of being recomputed.
+        """
+        weights = self.weight_matrix().data
+        post_docs = np.asarray(self.post_docs).view(np.ndarray)
+        indptr = np.asarray(self.indptr).view(np.ndarray)
+        bounds = np.array([b for rows in ranges for b in (rows.start, rows.stop)], dtype=np.int64)
+        scores = [np.zeros(rows.stop - rows.start) for rows in ranges]
+        for q in query:
+            t = self.vocab.get(q)
+            if t is None:
+                continue
+            start, end = indptr[t], indptr[t + 1]
+            docs = post_docs[start:end]
+            cut = np.searchsorted(docs, bounds) + start
+            for j, rows in enumerate(ranges):
+                a, b = cut[2 * j], cut[2 * j + 1]
+                scores[j][post_docs[a:b] - rows.start] += weights[a:b]
+        return scores
+
+    def score_docs(self, query: List[str], docs: np.ndarray) -> np.ndarray:
+        """
+        Exact scores for a sorted array of document ids only (contributions
+        read from weight_matrix(), like get_scores_ranges).
+        """
+        docs = np.asarray(docs, dtype=np.int64)
+        weights = self.weight_matrix().data
+        post_docs_all = np.asarray(self.post_docs).view(np.ndarray)
+        indptr = np.asarray(self.indptr).view(np.ndarray)
+        score = np.zeros(len(docs))
+        for q in query:
+            t = self.vocab.get(q)
+            if t is None:
+                continue
+            start, end = indptr[t], indptr[t + 1]
+            if end == start:
+                continue
+            post_docs = post_docs_all[start:end]
+            pos = np.minimum(np.searchsorted(post_docs, docs), len(post_docs) - 1)
+            score += np.where(post_docs[pos] == docs, weights[start + pos], 0.0)
+        return score
+
+    def weight_matrix(self) -> csr_matrix:
+        """
+        (n_terms x n_docs) sparse matrix of per-posting BM25 contributions,
+        built on first use. Query-count rows times this matrix = BM25 scores.
+        """
+        if self._weights is None:
+            terms = np.repeat(np.arange(len(self.vocab)), np.diff(self.indptr))
+            docs = np.asarray(self.post_docs)
+            tf = np.asarray(self.post_tf, dtype=np.int64)
+            data = self.idf[terms] * (tf * (self.k1 + 1) / (tf + self.norm[docs]))
+            self._weights = csr_matrix(
+                (data, docs, np.asarray(self.indptr)),
+                shape=(len(self.vocab), self.num_docs),
+            )
+        return self._weights
+
+    def batch_scores(self, queries: List[List[str]]) -> np.ndarray:
+        """
+        (n_queries x n_docs) scores for many tokenized queries in one sparse
+        product. Repeated query tokens count once per occurrence, as in get_scores.
+        """
+        rows, cols = [], []
+        for i, query in enumerate(queries):
+            for q in query:
+                t = self.vocab.get(q)
+                if t is not None:
+                    rows.append(i)
+                    cols.append(t)
+        counts = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(queries), len(self.vocab)),
+        )
+        return (counts @ self.weight_matrix()).toarray()
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: Path) -> Dict[str, Any]:
+        with open(out / "bm25_vocab.json", "w", encoding="utf-8") as f:
+            json.dump(list(self.vocab.keys()), f, ensure_ascii=False)
+        np.save(out / "bm25_idf.npy", np.asarray(self.idf))
+        np.save(out / "bm25_doc_len.npy", np.asarray(self.doc_len))
+        np.save(out / "bm25_norm.npy", np.asarray(self.norm))
+        np.save(out / "bm25_indptr.npy", np.asarray(self.indptr))
+        np.save(out / "bm25_post_docs.npy", np.asarray(self.post_docs))
+        np.save(out / "bm25_post_tf.npy", np.asarray(self.post_tf))
+        return {"avgdl": self.avgdl, "k1": self.k1, "b": self.b, "epsilon": self.epsilon}
+
+    @classmethod
+    def load(cls, src: Path, params: Dict[str, Any], mmap_mode: str | None = "r") -> "BM25Index":
+        with open(src / "bm25_vocab.json", "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        return cls(
+            vocab={t: i for i, t in enumerate(terms)},
+            idf=np.load(src / "bm25_idf.npy", mmap_mode=mmap_mode),
+            doc_len=np.load(src / "bm25_doc_len.npy", mmap_mode=mmap_mode),
+            norm=np.load(src / "bm25_norm.npy", mmap_mode=mmap_mode),
+            indptr=np.load(src / "bm25_indptr.npy", mmap_mode=mmap_mode),
+            post_docs=np.load(src / "bm25_post_docs.npy", mmap_mode=mmap_mode),
+            post_tf=np.load(src / "bm25_post_tf.npy", mmap_mode=mmap_mode),
+            **params,
+        )
@@ -11,7 +11,7 @@ if __name__ == "__main__":
     # -------- CONFIG --------
     CHUNKS_DIR = "chunks_660_output"      # או chunks_660_output
     CHUNKING_NAME = "fixed_660"           # או fixed_660
-    OUTPUT_INDEX = "vector_index_fixed_660.pkl"
+    OUTPUT_INDEX = "vector_index_fixed_660"
     # ------------------------
 
     print("[LOAD] Loading chunks...")
@@ -20,6 +20,8 @@ if __name__ == "__main__":
 
     print("[BUILD] Building vector index...")
     index = VectorIndex(chunks)
+    stats = index.embedding_stats
+    print(f"[BUILD] Embeddings: {stats['reused']} reused, {stats['computed']} computed")
 
     print("[SAVE] Saving index...")
     index.save(OUTPUT_INDEX)
@@ -0,0 +1,353 @@
+"""
+embedding_cache.py
+==================
+
+Persistent embedding caches.
+
+DiskVectorStore   - append-only float32 vector file (memory-mapped for reads)
+                    plus a key index, one key per row
+QueryEmbeddingCache - in-memory LRU in front of a DiskVectorStore, keyed by
+                      (model name, normalized query text)
+PassageEmbeddingCache - content-addressed DiskVectorStore for index builds,
+                        keyed by hash(model name, "passage: " + text)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked
+    fcntl = None
+
+
+# Default location of the on-disk query tier (None disables it)
+QUERY_CACHE_DIR: Optional[str] = "vector_indexes/query_cache"
+QUERY_CACHE_MEMORY_ENTRIES = 4096
+
+# Default location of the passage embedding store used by index builds
+PASSAGE_CACHE_DIR: Optional[str] = "vector_indexes/passage_cache"
+
+
+def _model_dirname(model_name: str) -> str:
+    return model_name.replace("/", "__")
+
+
+# -----------------------------
+# On-disk vector store
+# -----------------------------
+class DiskVectorStore:
+    """
+    Layout of a store directory:
+        meta.json    - {"dim": ..., "dtype": "float32"}
+        vectors.f32  - rows of `dim` float32 values, appended in order
+        keys.txt     - one key per line; line number == row in vectors.f32
+        lock         - flock'ed around every append (several processes may
+                       share a store)
+
+    A vector is written before its key, so a crash mid-append leaves at
+    worst an orphan vector that no key points to; the next writer drops it.
+    """
+
+    def __init__(self, path: str | Path, dim: Optional[int] = None):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists() and dim is None:
+            raise FileNotFoundError(f"No vector store at {self.path}")
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._vectors_path = self.path / "vectors.f32"
+        self._keys_path = self.path / "keys.txt"
+        self.rows: Dict[str, int] = {}
+        self._n_rows = 0
+        self._keys_bytes = 0
+        self._mmap: Optional[np.ndarray] = None
+
+        with self._locked():
+            if meta_path.exists():
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    stored_dim = json.load(f)["dim"]
+                if dim is not None and stored_dim != dim:
+                    raise ValueError(f"{self.path}: stored dim {stored_dim} != {dim}")
+                dim = stored_dim
+            else:
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": dim, "dtype": "float32"}, f)
+            self.dim = dim
+            self._vectors_path.touch(exist_ok=True)
+            self._keys_path.touch(exist_ok=True)
+            self._sync()
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    @contextmanager
+    def _locked(self):
+        """
+        Exclusive lock on the store directory (a no-op without fcntl).
+        """
+        with open(self.path / "lock", "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self):
+        """
+        Catches up with the files; call with the lock held. Keys appended
+        since the last sync (by this or another process) get their rows,
+        the row count comes from the vector file size, and a torn tail is
+        dropped so key line i and vector row i line up again.
+        """
+        row_bytes = self.dim * 4
+        size = self._vectors_path.stat().st_size
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_bytes)
+            tail = f.read()
+        lines = tail.split(b"\n")[:-1]   # the last piece is unterminated (or empty)
+
+        consumed = 0
+        for line in lines[:max(0, size // row_bytes - self._n_rows)]:
+            self.rows[line.decode("utf-8")] = self._n_rows
+            self._n_rows += 1
+            consumed += len(line) + 1
+        self._keys_bytes += consumed
+
+        if consumed != len(tail) or self._n_rows * row_bytes != size:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(self._n_rows * row_bytes)
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(self._keys_bytes)
+
+    def _matrix(self) -> np.ndarray:
+        # Re-map after appends; an empty file cannot be memory-mapped
+        if self._mmap is None or len(self._mmap) < self._n_rows:
+            if self._n_rows == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                   shape=(self._n_rows, self.dim))
+        return self._mmap
+
+    @classmethod
+    def open_existing(cls, path: str | Path) -> Optional["DiskVectorStore"]:
+        return cls(path) if (Path(path) / "meta.json").exists() else None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        return None if row is None else np.array(self._matrix()[row])
+
+    def get_many(self, keys: Sequence[str]) -> np.ndarray:
+        """
+        Rows for keys that are all present (caller checks membership).
+        """
+        rows = np.fromiter((self.rows[k] for k in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self._matrix()[rows], dtype=np.float32)
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        """
+        Appends the keys not stored yet. Under the lock, rows written by
+        other processes are picked up first, so the new rows are numbered
+        after them and keys another writer already stored are skipped.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            self._sync()
+            new = [(k, v) for k, v in zip(keys, vectors) if k not in self.rows]
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(np.stack([v for _, v in new])).tobytes())
+            data = "".join(k + "\n" for k, _ in new).encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                f.write(data)
+            for k, _ in new:
+                self.rows[k] = self._n_rows
+                self._n_rows += 1
+            self._keys_bytes += len(data)
+
+
+# -----------------------------
+# Query embedding cache
+# -----------------------------
+def normalize_query_text(query: str) -> str:
+    return " ".join(query.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Two tiers:
+      1. in-memory LRU (max_memory_entries vectors)
+      2. DiskVectorStore under cache_dir/<model>/ (survives restarts)
+    """
+
+    def __init__(self, model_name: str, cache_dir: str | Path | None = QUERY_CACHE_DIR,
+                 max_memory_entries: int = QUERY_CACHE_MEMORY_ENTRIES):
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) / _model_dirname(model_name) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk: Optional[DiskVectorStore] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, query: str) -> str:
+        raw = f"{self.model_name}\x00{normalize_query_text(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _disk_store(self, dim: Optional[int] = None) -> Optional[DiskVectorStore]:
+        """
+        The disk tier; created on first write (when dim is known).
+        """
+        if self.cache_dir is None:
+            return None
+        if self._disk is None:
+            self._disk = DiskVectorStore.open_existing(self.cache_dir)
+            if self._disk is None and dim is not None:
+                self._disk = DiskVectorStore(self.cache_dir, dim)
+        return self._disk
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_or_encode(self, queries: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        (n_queries x dim) embeddings; only queries missing from both tiers
+        are passed to encode_fn, in a single call.
+        """
+        keys = [self.key(q) for q in queries]
+        found: Dict[str, np.ndarray] = {}
+
+        for k in keys:
+            if k in found:
+                continue
+            vec = self._memory.get(k)
+            if vec is not None:
+                self._memory.move_to_end(k)
+                found[k] = vec
+                self.memory_hits += 1
+
+        pending = [k for k in dict.fromkeys(keys) if k not in found]
+        store = self._disk_store() if pending else None
+        if store is not None:
+            on_disk = [k for k in pending if k in store]
+            if on_disk:
+                for k, vec in zip(on_disk, store.get_many(on_disk)):
+                    found[k] = vec
+                    self._remember(k, vec)
+                self.disk_hits += len(on_disk)
+            pending = [k for k in pending if k not in found]
+
+        if pending:
+            first_query = {}
+            for q, k in zip(queries, keys):
+                first_query.setdefault(k, q)
+            encoded = np.asarray(encode_fn([first_query[k] for k in pending]), dtype=np.float32)
+            self.misses += len(pending)
+            store = self._disk_store(encoded.shape[1])
+            if store is not None:
+                store.put_many(pending, encoded)
+            for k, vec in zip(pending, encoded):
+                found[k] = vec
+                self._remember(k, vec)
+
+        return np.stack([found[k] for k in keys]).astype(np.float32)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk) if self._disk is not None else 0,
+        }
+
+
+# -----------------------------
+# Passage embedding cache
+# -----------------------------
+class PassageEmbeddingCache:
+    """
+    Content-addressed passage embeddings: a build only encodes passages
+    whose (model, text) was never seen before, and reads the rest back.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str | Path | None = PASSAGE_CACHE_DIR):
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) / _model_dirname(model_name) if cache_dir else None
+        self._store: Optional[DiskVectorStore] = None
+        self.reused = 0
+        self.computed = 0
+
+    def key(self, passage: str) -> str:
+        # passage already carries the "passage: " prefix
+        raw = f"{self.model_name}\x00{passage}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def encode(self, passages: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        (n_passages x dim) matrix in input order. Unseen passages go to
+        encode_fn in one call and are stored before returning.
+        """
+        keys = [self.key(p) for p in passages]
+        if self._store is None and self.cache_dir is not None:
+            self._store = DiskVectorStore.open_existing(self.cache_dir)
+
+        unique = list(dict.fromkeys(keys))
+        known = {k for k in unique if self._store is not None and k in self._store}
+        missing = [k for k in unique if k not in known]
+
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            first_passage = {}
+            for p, k in zip(passages, keys):
+                first_passage.setdefault(k, p)
+            encoded = np.asarray(encode_fn([first_passage[k] for k in missing]), dtype=np.float32)
+            if self.cache_dir is not None:
+                if self._store is None:
+                    self._store = DiskVectorStore(self.cache_dir, encoded.shape[1])
+                self._store.put_many(missing, encoded)
+            computed = dict(zip(missing, encoded))
+
+        self.reused += len(known)
+        self.computed += len(missing)
+
+        if self._store is not None:
+            return self._store.get_many(keys)
+        return np.stack([computed[k] for k in keys]).astype(np.float32)
+
+    def stats(self) -> Dict[str, int]:
+        return {"reused": self.reused, "computed": self.computed}
+
+
+_QUERY_CACHES: Dict[str, QueryEmbeddingCache] = {}
+
+
+def get_query_cache(model_name: str) -> QueryEmbeddingCache:
+    """
+    Process-wide cache for one model (created on first use).
+    """
+    cache = _QUERY_CACHES.get(model_name)
+    if cache is None:
+        cache = _QUERY_CACHES[model_name] = QueryEmbeddingCache(model_name)
+    return cache
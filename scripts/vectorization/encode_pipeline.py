@@ -0,0 +1,176 @@
+"""
+encode_pipeline.py
+==================
+
+Passage encoding for index builds:
+
+1. passages are sorted by length (whitespace tokens) and cut into shards,
+   so every shard holds passages of similar length and batches pad little
+2. shards are encoded by a pool of CPU worker processes, each holding
+   its own copy of the model (~0.5 GB resident per worker)
+3. every finished shard is written to shard_dir as soon as it is done
+4. a rerun with the same passages skips shards already on disk
+
+Layout of shard_dir:
+    plan.json          - model name, shard size, fingerprint of the passages
+    shard_00000.npy    - float32 embeddings of one shard, in shard order
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from scripts.vectorization.model_pool import get_sentence_model
+
+
+DEFAULT_SHARD_SIZE = 1024
+DEFAULT_BATCH_SIZE = 32
+
+
+# -----------------------------
+# Planning
+# -----------------------------
+def length_order(passages: List[str]) -> np.ndarray:
+    """
+    Passage indices sorted by approximate token length (stable).
+    """
+    lengths = np.fromiter((len(p.split()) for p in passages), dtype=np.int64, count=len(passages))
+    return np.argsort(lengths, kind="stable")
+
+
+def _fingerprint(model_name: str, passages: List[str]) -> str:
+    h = hashlib.sha1(model_name.encode("utf-8"))
+    for p in passages:
+        h.update(b"\x00")
+        h.update(p.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _prepare_shard_dir(shard_dir: Path, plan: dict) -> None:
+    """
+    Keeps finished shards only if they were produced for the same plan.
+    """
+    plan_path = shard_dir / "plan.json"
+    if plan_path.exists():
+        with open(plan_path, "r", encoding="utf-8") as f:
+            if json.load(f) == plan:
+                return
+        shutil.rmtree(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    with open(plan_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+
+
+def _shard_path(shard_dir: Path, shard_id: int) -> Path:
+    return shard_dir / f"shard_{shard_id:05d}.npy"
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+_WORKER_MODEL = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _WORKER_MODEL
+    import torch
+
+    torch.set_num_threads(threads)
+    _WORKER_MODEL = get_sentence_model(model_name, "cpu")
+
+
+def _encode_shard(model, texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+
+def _save_shard(path: Path, vectors: np.ndarray) -> None:
+    # Written under a temporary name, so a shard on disk is always complete
+    tmp = path.with_name(path.stem + ".tmp.npy")
+    np.save(tmp, vectors)
+    os.replace(tmp, path)
+
+
+def _run_shard(args):
+    shard_id, texts, path, batch_size = args
+    _save_shard(Path(path), _encode_shard(_WORKER_MODEL, texts, batch_size))
+    return shard_id
+
+
+# -----------------------------
+# Entry point
+# -----------------------------
+def encode_passages(
+    passages: List[str],
+    model_name: str,
+    shard_dir: str | Path,
+    workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    model=None,
+    keep_shards: bool = False,
+) -> np.ndarray:
+    """
+    (n_passages x dim) normalized float32 embeddings, in input order.
+
+    workers=None starts one process per CPU, each with its own model copy
+    (~0.5 GB), so pass a small count on machines short of RAM;
+    workers<=1 encodes in this process
+    (with `model` if given). Shards are deleted after a successful run
+    unless keep_shards is set.
+    """
+    shard_dir = Path(shard_dir)
+    if not passages:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    order = length_order(passages)
+    shards = [order[i:i + shard_size] for i in range(0, len(order), shard_size)]
+    plan = {
+        "model_name": model_name,
+        "num_passages": len(passages),
+        "shard_size": shard_size,
+        "fingerprint": _fingerprint(model_name, passages),
+    }
+    _prepare_shard_dir(shard_dir, plan)
+
+    todo = [i for i in range(len(shards)) if not _shard_path(shard_dir, i).exists()]
+    print(f"[ENCODE] {len(passages)} passages, {len(shards)} shards "
+          f"({len(shards) - len(todo)} already done)")
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(todo)) if todo else 1
+    tasks = [(i, [passages[j] for j in shards[i]], str(_shard_path(shard_dir, i)), batch_size) for i in todo]
+
+    if workers <= 1:
+        if todo and model is None:
+            model = get_sentence_model(model_name, "cpu")
+        for n_done, (i, texts, path, bs) in enumerate(tasks, 1):
+            _save_shard(Path(path), _encode_shard(model, texts, bs))
+            print(f"[ENCODE] shard {i} done ({n_done}/{len(tasks)})")
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(model_name, threads)) as pool:
+            for n_done, i in enumerate(pool.imap_unordered(_run_shard, tasks), 1):
+                print(f"[ENCODE] shard {i} done ({n_done}/{len(tasks)})")
+
+    out = None
+    for i, rows in enumerate(shards):
+        vecs = np.load(_shard_path(shard_dir, i))
+        if out is None:
+            out = np.empty((len(passages), vecs.shape[1]), dtype=np.float32)
+        out[rows] = vecs
+
+    if not keep_shards:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return out
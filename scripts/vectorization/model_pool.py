@@ -0,0 +1,61 @@
+"""
+model_pool.py
+=============
+
+Process-wide pool of encoder models keyed by (model class, model name, device).
+
+Indexes never own a model: they ask the pool on first use, so every index
+built with the same model shares one copy, and nothing model-related is
+persisted. sentence_transformers (and with it torch) is imported only when
+a model is actually requested.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+_MODELS: Dict[Tuple[str, str, Optional[str]], Any] = {}
+_LOCK = threading.Lock()
+
+
+def _pooled(kind: str, model_name: str, device: Optional[str]):
+    key = (kind, model_name, device)
+    model = _MODELS.get(key)
+    if model is None:
+        with _LOCK:
+            model = _MODELS.get(key)
+            if model is None:
+                import sentence_transformers
+                model = _MODELS[key] = getattr(sentence_transformers, kind)(model_name, device=device)
+    return model
+
+
+def get_sentence_model(model_name: str, device: Optional[str] = None):
+    """
+    Shared SentenceTransformer for (model_name, device), loaded on first request.
+    """
+    return _pooled("SentenceTransformer", model_name, device)
+
+
+def get_cross_encoder(model_name: str, device: Optional[str] = None):
+    """
+    Shared CrossEncoder for (model_name, device), loaded on first request.
+    """
+    return _pooled("CrossEncoder", model_name, device)
+
+
+def loaded_models() -> list:
+    """
+    (model class, model name, device) keys currently held by the pool.
+    """
+    return list(_MODELS)
+
+
+def release_models() -> None:
+    """
+    Drops every pooled model (they are freed once no caller holds them).
+    """
+    with _LOCK:
+        _MODELS.clear()
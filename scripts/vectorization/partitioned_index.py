@@ -0,0 +1,204 @@
+"""
+partitioned_index.py
+====================
+
+A VectorIndex split into one standalone index per calendar month.
+
+Layout of a partitioned index directory:
+    manifest.json   - format/version, overall min/max timestamp, "data":
+                      the generation directory below, and one entry per
+                      partition: name, chunk count, min/max timestamp,
+                      row range in the source index
+    data-<id>/      - one generation of partitions:
+      2023-07/      - a regular VectorIndex directory (own BM25
+      2023-08/        statistics, own dense slice)
+      ...
+      undated/      - chunks without a date, if any
+
+Partitions are opened lazily: a window query only loads the months it
+overlaps, and at most max_open stay open (least recently used closed
+first). They are read into memory rather than memory-mapped by
+default: each one is small, and slicing many small memmaps per query
+costs more than the pages they save.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from scripts.common.dates import MISSING_TS
+from scripts.vectorization.vector_index import MANIFEST_NAME, VectorIndex
+
+PARTITION_FORMAT = "partitioned_index"
+PARTITION_FORMAT_VERSION = 1
+UNDATED = "undated"
+
+# Opened partitions kept per PartitionedIndex (about two years of months)
+MAX_OPEN_PARTITIONS = 24
+
+
+def month_runs(timestamps: np.ndarray) -> List[tuple]:
+    """
+    (name, start row, end row) of every run of same-month rows in a
+    time-ordered timestamp column; undated rows (at the end) form UNDATED.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    n_dated = int(np.searchsorted(ts, MISSING_TS, side="left"))
+    months = ts[:n_dated].astype("datetime64[s]").astype("datetime64[M]")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if n_dated else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], n_dated]
+    runs = [(str(months[s]), int(s), int(e)) for s, e in zip(starts, ends)]
+    if n_dated < len(ts):
+        runs.append((UNDATED, n_dated, len(ts)))
+    return runs
+
+
+class PartitionedIndex:
+    def __init__(self, root: Path, manifest: Dict[str, Any], mmap_mode: Optional[str] = None,
+                 max_open: int = MAX_OPEN_PARTITIONS):
+        self.root = Path(root)
+        self.manifest = manifest
+        # Directories written before generations kept partitions at the top level
+        self.data = self.root / manifest.get("data", "")
+        self.partitions: List[Dict[str, Any]] = manifest["partitions"]
+        self.mmap_mode = mmap_mode
+        self.max_open = max_open
+        self._open: "OrderedDict[str, VectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(p["num_chunks"] for p in self.partitions)
+
+    @property
+    def min_ts(self) -> Optional[int]:
+        return self.manifest.get("min_ts")
+
+    @property
+    def max_ts(self) -> Optional[int]:
+        return self.manifest.get("max_ts")
+
+    @property
+    def dense_model_name(self) -> str:
+        return self.manifest["dense_model_name"]
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, index: VectorIndex, out: str | Path) -> "PartitionedIndex":
+        """
+        Splits a (time-ordered) index into month partitions under `out`.
+        As in VectorIndex.save, partitions go into a new data-<id>/
+        generation and the manifest naming it is replaced last: a
+        half-written build never loads, and partitions readers have open
+        are never rewritten. Older generations (and partitions of the
+        pre-generation layout) are removed, the previous one is kept.
+        """
+        if not getattr(index, "time_ordered", True):
+            raise ValueError("Index rows are not time-ordered; rebuild it before partitioning")
+        out = Path(out)
+        out.mkdir(parents=True, exist_ok=True)
+        previous = {}
+        if (out / MANIFEST_NAME).exists():
+            with open(out / MANIFEST_NAME, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        data_name = f"data-{os.urandom(6).hex()}"
+        (out / data_name).mkdir()
+
+        ts = np.asarray(index.timestamps, dtype=np.int64)
+        partitions = []
+        for name, start, end in month_runs(ts):
+            index.subset(slice(start, end)).save(str(out / data_name / name))
+            dated = name != UNDATED
+            partitions.append({
+                "name": name,
+                "num_chunks": end - start,
+                "rows": [start, end],
+                "min_ts": int(ts[start]) if dated else None,
+                "max_ts": int(ts[end - 1]) if dated else None,
+            })
+
+        dated = [p for p in partitions if p["min_ts"] is not None]
+        manifest = {
+            "format": PARTITION_FORMAT,
+            "version": PARTITION_FORMAT_VERSION,
+            "dense_model_name": index.dense_model_name,
+            "num_chunks": len(ts),
+            "min_ts": dated[0]["min_ts"] if dated else None,
+            "max_ts": dated[-1]["max_ts"] if dated else None,
+            "partitions": partitions,
+            "data": data_name,
+        }
+        tmp = out / (MANIFEST_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, out / MANIFEST_NAME)
+
+        for old in out.glob("data-*"):
+            if old.name not in (data_name, previous.get("data")):
+                shutil.rmtree(old, ignore_errors=True)
+        if previous and "data" not in previous:
+            for p in previous.get("partitions", []):
+                shutil.rmtree(out / p["name"], ignore_errors=True)
+        return cls(out, manifest)
+
+    @classmethod
+    def load(cls, path: str | Path, mmap_mode: Optional[str] = None,
+             max_open: int = MAX_OPEN_PARTITIONS) -> "PartitionedIndex":
+        """
+        Reads the manifest only; partitions are opened on first use.
+        """
+        root = Path(path)
+        with open(root / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != PARTITION_FORMAT:
+            raise ValueError(f"Not a partitioned index directory: {path}")
+        if manifest.get("version") != PARTITION_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported partitioned index version {manifest.get('version')} "
+                f"(expected {PARTITION_FORMAT_VERSION}): {path}"
+            )
+        return cls(root, manifest, mmap_mode, max_open)
+
+    # -----------------------------
+    # Routing
+    # -----------------------------
+    def route(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Partitions overlapping [start_ts, end_ts) (Unix seconds), oldest
+        first. Without bounds every partition, including undated chunks.
+        """
+        if start_ts is None and end_ts is None:
+            return list(self.partitions)
+        lo = start_ts if start_ts is not None else np.iinfo(np.int64).min
+        hi = end_ts if end_ts is not None else np.iinfo(np.int64).max
+        return [
+            p for p in self.partitions
+            if p["min_ts"] is not None and p["min_ts"] < hi and p["max_ts"] >= lo
+        ]
+
+    def partition(self, name: str) -> VectorIndex:
+        """
+        The named partition, loaded on first use; beyond max_open, the
+        least recently used one is closed.
+        """
+        with self._lock:
+            part = self._open.get(name)
+            if part is None:
+                part = self._open[name] = VectorIndex.load(str(self.data / name), mmap_mode=self.mmap_mode)
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+            self._open.move_to_end(name)
+            return part
+
+    @property
+    def opened(self) -> List[str]:
+        return list(self._open)
@@ -0,0 +1,162 @@
+"""
+quantized_dense.py
+==================
+
+Compact copy of the dense matrix for first-stage scoring.
+
+- int8:    per-dimension scale, codes = round(x / scale), |codes| <= 127
+- float16: plain half-precision copy
+
+A query is scored against the compact matrix, then the top `rescore`
+rows are scored again against the float32 matrix (memory-mapped when the
+VectorIndex was loaded, so only those rows are read). Only rescored rows
+are returned as candidates; approximate scores never leave this module.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+QUANT_MODES = ("int8", "float16")
+DEFAULT_RESCORE = 100
+
+
+class QuantizedDense:
+    def __init__(self, codes: np.ndarray, scale: np.ndarray | None, vectors: np.ndarray,
+                 mode: str, rescore: int = DEFAULT_RESCORE, batch_size: int = 1024):
+        self.codes = codes
+        self.scale = scale
+        self.vectors = vectors
+        self.mode = mode
+        self.rescore = rescore
+        self.batch_size = batch_size
+
+    @property
+    def nbytes(self) -> int:
+        scale = 0 if self.scale is None else self.scale.nbytes
+        return int(self.codes.nbytes + scale)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, vectors: np.ndarray, mode: str = "int8", rescore: int = DEFAULT_RESCORE,
+              batch_size: int = 1024) -> "QuantizedDense":
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        n, dim = vectors.shape
+
+        if mode == "float16":
+            codes = np.empty((n, dim), dtype=np.float16)
+            for start in range(0, n, batch_size):
+                codes[start:start + batch_size] = vectors[start:start + batch_size]
+            return cls(codes, None, vectors, mode, rescore=rescore, batch_size=batch_size)
+
+        absmax = np.zeros(dim, dtype=np.float32)
+        for start in range(0, n, batch_size):
+            block = np.abs(np.asarray(vectors[start:start + batch_size], dtype=np.float32))
+            np.maximum(absmax, block.max(axis=0), out=absmax)
+        scale = np.where(absmax > 0, absmax / 127.0, 1.0).astype(np.float32)
+
+        codes = np.empty((n, dim), dtype=np.int8)
+        for start in range(0, n, batch_size):
+            block = np.asarray(vectors[start:start + batch_size], dtype=np.float32) / scale
+            codes[start:start + batch_size] = np.clip(np.rint(block), -127, 127)
+        return cls(codes, scale, vectors, mode, rescore=rescore, batch_size=batch_size)
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def approx_scores(self, q_vecs: np.ndarray, rows: slice | None = None) -> np.ndarray:
+        """
+        (n_queries x n_rows) inner products against the compact matrix.
+        """
+        q_vecs = np.atleast_2d(np.asarray(q_vecs, dtype=np.float32))
+        if self.scale is not None:
+            # x . q == codes . (scale * q)
+            q_vecs = q_vecs * self.scale
+        codes = self.codes if rows is None else self.codes[rows]
+
+        out = np.empty((len(q_vecs), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), self.batch_size):
+            block = np.asarray(codes[start:start + self.batch_size], dtype=np.float32)
+            out[:, start:start + self.batch_size] = q_vecs @ block.T
+        return out
+
+    def scores(self, q_vecs: np.ndarray, rows: slice | None = None, rescore: int | None = None) -> np.ndarray:
+        """
+        (n_queries x n_rows): each query's top `rescore` rows by approximate
+        score carry exact float32 scores, every other row -inf (it was
+        never scored exactly, so it cannot compete with those that were).
+        """
+        q_vecs = np.atleast_2d(np.asarray(q_vecs, dtype=np.float32))
+        offset = 0 if rows is None else rows.start
+        n_rows = len(self.codes) if rows is None else len(range(*rows.indices(len(self.codes))))
+        scores = np.full((len(q_vecs), n_rows), -np.inf, dtype=np.float32)
+        for i, (cand, exact) in enumerate(self.candidates(q_vecs, 0, rows, rescore)):
+            scores[i, cand - offset] = exact
+        return scores
+
+    def candidates(self, q_vecs: np.ndarray, k: int, rows: slice | None = None,
+                   rescore: int | None = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Per query: (row ids, exact scores) of the max(k, rescore) best rows
+        by approximate score within `rows`, unordered. Row ids are absolute.
+        """
+        q_vecs = np.atleast_2d(np.asarray(q_vecs, dtype=np.float32))
+        approx = self.approx_scores(q_vecs, rows)
+        offset = 0 if rows is None else rows.start
+        n = min(max(k, rescore or self.rescore), approx.shape[1])
+        out = []
+        for i, q in enumerate(q_vecs):
+            if n == 0:
+                out.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+                continue
+            cand = np.sort(np.argpartition(-approx[i], n - 1)[:n]) + offset
+            exact = np.asarray(self.vectors[cand], dtype=np.float32) @ q
+            out.append((cand.astype(np.int64), exact))
+        return out
+
+    def search(self, q: np.ndarray, k: int, rescore: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (row ids, exact scores) of the top-k, best first; only the top
+        max(k, rescore) compact-matrix candidates are rescored.
+        """
+        cand, exact = self.candidates(q, k, rescore=rescore)[0]
+        k = min(k, len(cand))
+        if k == 0:
+            return cand, exact
+        top = np.argpartition(-exact, k - 1)[:k]
+        top = top[np.argsort(-exact[top], kind="stable")]
+        return cand[top], exact[top]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: Path) -> Dict[str, Any]:
+        out.mkdir(parents=True, exist_ok=True)
+        np.save(out / "codes.npy", np.asarray(self.codes))
+        if self.scale is not None:
+            np.save(out / "scale.npy", np.asarray(self.scale))
+        params = {"mode": self.mode, "rescore": self.rescore}
+        with open(out / "quant.json", "w", encoding="utf-8") as f:
+            json.dump(params, f, indent=2)
+        return params
+
+    @classmethod
+    def load(cls, src: Path, vectors: np.ndarray, mmap_mode: str | None = "r") -> "QuantizedDense":
+        with open(src / "quant.json", "r", encoding="utf-8") as f:
+            params = json.load(f)
+        scale_path = src / "scale.npy"
+        return cls(
+            codes=np.load(src / "codes.npy", mmap_mode=mmap_mode),
+            scale=np.load(scale_path) if scale_path.exists() else None,
+            vectors=vectors,
+            mode=params["mode"],
+            rescore=params.get("rescore", DEFAULT_RESCORE),
+        )
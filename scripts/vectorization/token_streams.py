@@ -0,0 +1,151 @@
+"""
+token_streams.py
+================
+
+Interned BM25 tokenization.
+
+Every term gets an int32 id (in order of first appearance, the same order
+BM25Index assigns), and the tokens of all chunks are kept as one flat id
+array plus offsets:
+
+    ids[offsets[d] : offsets[d + 1]]   -> token ids of chunk d, in text order
+
+This replaces one list of Python strings per chunk. The streams are
+saved next to the index, so BM25 can be rebuilt (and positional features
+computed) without re-tokenizing the texts.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9']+")
+
+
+def bm25_tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+@lru_cache(maxsize=4096)
+def bm25_tokenize_cached(text: str) -> Tuple[str, ...]:
+    """
+    bm25_tokenize for query strings, which repeat across runs and methods.
+    """
+    return tuple(bm25_tokenize(text))
+
+
+class TokenStreams:
+    def __init__(self, vocab: List[str], ids: np.ndarray, offsets: np.ndarray):
+        self.vocab = vocab
+        self.ids = ids
+        self.offsets = offsets
+        self._term_ids: Dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def term_ids(self) -> Dict[str, int]:
+        if self._term_ids is None:
+            self._term_ids = {t: i for i, t in enumerate(self.vocab)}
+        return self._term_ids
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(np.asarray(self.offsets))
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "TokenStreams":
+        """
+        Tokenizes like bm25_tokenize, but each distinct raw token is
+        lowercased and looked up once; after that it maps straight to its id.
+        """
+        term_ids: Dict[str, int] = {}
+        raw_ids: Dict[str, int] = {}
+        ids = array("i")
+        lengths: List[int] = []
+
+        for text in texts:
+            raw = _TOKEN_RE.findall(text)
+            doc = list(map(raw_ids.get, raw))
+            if None in doc:
+                # First sighting of some raw tokens (in text order, so term
+                # ids still follow first appearance)
+                for j, tok in enumerate(raw):
+                    if doc[j] is None:
+                        t = raw_ids.get(tok)
+                        if t is None:
+                            term = tok.lower()
+                            t = term_ids.get(term)
+                            if t is None:
+                                t = term_ids[term] = len(term_ids)
+                            raw_ids[tok] = t
+                        doc[j] = t
+            ids.extend(doc)
+            lengths.append(len(raw))
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        streams = cls(list(term_ids), np.frombuffer(ids, dtype=np.int32).copy(), offsets)
+        streams._term_ids = term_ids
+        return streams
+
+    # -----------------------------
+    # Access
+    # -----------------------------
+    def doc(self, d: int) -> np.ndarray:
+        return self.ids[int(self.offsets[d]):int(self.offsets[d + 1])]
+
+    def tokens(self, d: int) -> List[str]:
+        return [self.vocab[t] for t in self.doc(d)]
+
+    def take(self, start: int, end: int) -> "TokenStreams":
+        """
+        Streams of chunks start..end-1 with their own vocabulary, ids
+        re-assigned in order of first appearance (as build() would).
+        """
+        ids = np.asarray(self.ids[int(self.offsets[start]):int(self.offsets[end])])
+        uniq, first = np.unique(ids, return_index=True)
+        by_first = uniq[np.argsort(first)]
+        remap = np.empty(len(self.vocab), dtype=np.int32)
+        remap[by_first] = np.arange(len(by_first), dtype=np.int32)
+        offsets = np.asarray(self.offsets[start:end + 1], dtype=np.int64) - int(self.offsets[start])
+        return TokenStreams([self.vocab[t] for t in by_first], remap[ids] if len(ids) else ids.astype(np.int32), offsets)
+
+    def encode(self, text: str) -> np.ndarray:
+        """
+        Term ids of a (query) text; terms outside the vocabulary are dropped.
+        """
+        term_ids = self.term_ids
+        return np.array([term_ids[t] for t in bm25_tokenize_cached(text) if t in term_ids], dtype=np.int32)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, out: Path) -> Dict[str, int]:
+        with open(out / "tokens_vocab.json", "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        np.save(out / "tokens_ids.npy", np.asarray(self.ids, dtype=np.int32))
+        np.save(out / "tokens_offsets.npy", np.asarray(self.offsets, dtype=np.int64))
+        return {"num_tokens": int(len(self.ids)), "vocab_size": len(self.vocab)}
+
+    @classmethod
+    def load(cls, src: Path, mmap_mode: str | None = "r") -> "TokenStreams":
+        with open(src / "tokens_vocab.json", "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        return cls(
+            vocab,
+            np.load(src / "tokens_ids.npy", mmap_mode=mmap_mode),
+            np.load(src / "tokens_offsets.npy", mmap_mode=mmap_mode),
+        )
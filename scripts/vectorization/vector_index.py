@@ -3,22 +3,59 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Dict, Any
 from pathlib import Path
-import re
+import json
+import os
 import pickle
+import shutil
+from datetime import datetime
 
 import numpy as np
-from rank_bm25 import BM25Okapi
-from sentence_transformers import SentenceTransformer
-from scripts.common.models import Chunk
+from scripts.common.models import Chunk, ChunkStore
+from scripts.common.dates import date_from_name
+from scripts.vectorization.bm25_index import BM25Index
+from scripts.vectorization.token_streams import TokenStreams, bm25_tokenize, bm25_tokenize_cached
+from scripts.vectorization.ann_index import IVFIndex
+from scripts.vectorization.quantized_dense import QuantizedDense
+from scripts.vectorization.encode_pipeline import encode_passages
+from scripts.vectorization.model_pool import get_sentence_model
+from scripts.vectorization.embedding_cache import PASSAGE_CACHE_DIR, PassageEmbeddingCache, get_query_cache
 
 
 # =============================
-# BM25 tokenization
+# On-disk format
 # =============================
-_TOKEN_RE = re.compile(r"[A-Za-z0-9']+")
+# A saved index is a directory:
+#   manifest.json        - format/version, model name, BM25 params, sizes,
+#                          and "data": the generation directory below
+#   data-<id>/           - one generation of arrays, holding everything else:
+#     dense.npy          - float32 (n_chunks x dim), opened with mmap_mode
+#     timestamps.npy     - int64 Unix seconds per chunk, ascending (rows are time-ordered)
+#     epoch_days.npy     - int32 days since 1970-01-01 per chunk (time decay)
+#     texts.bin          - all chunk texts, UTF-8, concatenated
+#     text_offsets.npy   - int64 (n_chunks + 1) byte offsets into texts.bin
+#     chunk_*.npy        - dictionary-encoded doc / country / chunking / source columns
+#     chunks.json        - chunk ids and the column vocabularies (see ChunkStore)
+#     bm25_*.npy         - BM25 inverted index as flat arrays (see BM25Index)
+#     bm25_vocab.json    - term list, position == term id
+#     tokens_*           - interned token ids per chunk, flat + offsets (see TokenStreams)
+#     ann/               - optional IVF index over dense.npy (see IVFIndex)
+#     quant/             - optional int8 / float16 copy of dense.npy (see QuantizedDense)
+INDEX_FORMAT = "vector_index"
+INDEX_FORMAT_VERSION = 4
+MANIFEST_NAME = "manifest.json"
 
-def bm25_tokenize(text: str) -> List[str]:
-    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+def read_manifest(path: str | Path) -> Dict[str, Any]:
+    with open(Path(path) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != INDEX_FORMAT:
+        raise ValueError(f"Not a vector index directory: {path}")
+    if manifest.get("version") != INDEX_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index version {manifest.get('version')} "
+            f"(expected {INDEX_FORMAT_VERSION}): {path}"
+        )
+    return manifest
 
 
 # =============================
@@ -36,47 +73,303 @@ class VectorIndex:
         chunks: List[Chunk],
         dense_model_name: str = "intfloat/e5-base",
         device: str | None = None,
+        passage_cache_dir: str | Path | None = PASSAGE_CACHE_DIR,
+        encode_shard_dir: str | Path | None = None,
+        encode_workers: int | None = None,
     ):
-        self.chunks = chunks
+        """
+        encode_shard_dir enables the sharded, resumable encoding pipeline
+        (see encode_pipeline.py) with encode_workers CPU processes.
+        """
+        self.dense_model_name = dense_model_name
+        self.device = device
+        self.encode_shard_dir = encode_shard_dir
+        self.encode_workers = encode_workers
+
+        # ---------- Columns + time order ----------
+        # Rows are stored oldest -> newest, so a date range is a row slice
+        store = ChunkStore.from_chunks(chunks)
+        order = np.argsort(store.timestamps, kind="stable")
+        self.chunks = store.take(order)
+        self.timestamps = self.chunks.timestamps
+        texts = [self.chunks.text(i) for i in range(len(self.chunks))]
 
         # ---------- BM25 ----------
-        self.bm25_tokens = [bm25_tokenize(c.text) for c in chunks]
-        self.bm25 = BM25Okapi(self.bm25_tokens)
+        self.token_streams = TokenStreams.build(texts)
+        self.bm25 = BM25Index.from_streams(self.token_streams)
 
         # ---------- Dense ----------
-        self.dense_model = SentenceTransformer(dense_model_name, device=device)
-        passages = [f"passage: {c.text}" for c in chunks]
+        # Unchanged passages are read back from the content-addressed cache;
+        # the model is only loaded if something actually needs encoding.
+        passages = [f"passage: {t}" for t in texts]
 
-        self.dense_matrix = self.dense_model.encode(
-            passages,
-            normalize_embeddings=True,
-            show_progress_bar=True,
-        ).astype(np.float32)
+        cache = PassageEmbeddingCache(dense_model_name, passage_cache_dir)
+        self.dense_matrix = cache.encode(passages, self._encode_passages_uncached)
+        self.embedding_stats = cache.stats()
+
+        # ---------- ANN / quantized copy (optional, see build_ann / quantize) ----------
+        self.ann = None
+        self.quant = None
+
+    @property
+    def dense_model(self):
+        # Never stored on the index: shared through the process-wide pool
+        return get_sentence_model(self.dense_model_name, getattr(self, "device", None))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("dense_model", None)
+        return state
 
     # -----------------------------
     # Query encoders
     # -----------------------------
     def encode_query_dense(self, query: str) -> np.ndarray:
+        return self.encode_queries_dense([query])
+
+    def encode_queries_dense(self, queries: List[str]) -> np.ndarray:
+        """
+        (n_queries x dim) embeddings. Cached queries (memory or disk tier)
+        skip the model; the rest are encoded in a single forward pass.
+        """
+        return get_query_cache(self.dense_model_name).get_or_encode(
+            list(queries), self._encode_queries_uncached
+        )
+
+    def _encode_passages_uncached(self, passages: List[str]) -> np.ndarray:
+        if getattr(self, "encode_shard_dir", None) is not None:
+            single = self.encode_workers is not None and self.encode_workers <= 1
+            return encode_passages(
+                passages,
+                self.dense_model_name,
+                self.encode_shard_dir,
+                workers=self.encode_workers,
+                model=self.dense_model if single else None,
+            )
         return self.dense_model.encode(
-            [f"query: {query}"],
+            passages,
+            normalize_embeddings=True,
+            show_progress_bar=True,
+        ).astype(np.float32)
+
+    def _encode_queries_uncached(self, queries: List[str]) -> np.ndarray:
+        return self.dense_model.encode(
+            [f"query: {q}" for q in queries],
             normalize_embeddings=True
         ).astype(np.float32)
 
     def bm25_scores(self, query: str) -> np.ndarray:
-        tokens = bm25_tokenize(query)
+        tokens = list(bm25_tokenize_cached(query))
         return np.array(self.bm25.get_scores(tokens), dtype=np.float32)
 
+    def bm25_scores_batch(self, queries: List[str], rows: slice | None = None) -> np.ndarray:
+        """
+        (n_queries x n_rows) BM25 scores; restricted to a row range if given.
+        """
+        tokens = [list(bm25_tokenize_cached(q)) for q in queries]
+        bm25 = self._bm25_index()
+        if rows is None:
+            return bm25.batch_scores(tokens).astype(np.float32)
+        return np.vstack([bm25.get_scores(t, rows=rows) for t in tokens]).astype(np.float32)
+
+    def bm25_scores_ranges(self, queries: List[str], ranges: List[slice]) -> List[np.ndarray]:
+        """
+        bm25_scores_batch for several row ranges at once: one
+        (n_queries x range length) matrix per range.
+        """
+        bm25 = self._bm25_index()
+        per_query = [bm25.get_scores_ranges(list(bm25_tokenize_cached(q)), ranges) for q in queries]
+        return [np.vstack([scores[j] for scores in per_query]).astype(np.float32) for j in range(len(ranges))]
+
+    # -----------------------------
+    # Time ranges
+    # -----------------------------
+    def time_slice(self, start_ts: int, end_ts: int) -> slice:
+        """
+        Rows with start_ts <= timestamp < end_ts (Unix seconds), as a slice.
+        """
+        if not getattr(self, "time_ordered", True):
+            raise ValueError("Index rows are not time-ordered; rebuild it to use time ranges")
+        lo, hi = np.searchsorted(self.timestamps, [start_ts, end_ts], side="left")
+        return slice(int(lo), int(hi))
+
+    def subset(self, rows: slice) -> "VectorIndex":
+        """
+        Standalone index over a contiguous row range: its own BM25
+        statistics and a copy of the dense rows (nothing is re-encoded).
+        """
+        part = VectorIndex.__new__(VectorIndex)
+        part.dense_model_name = self.dense_model_name
+        part.device = getattr(self, "device", None)
+        part.chunks = self.chunks.take(np.arange(rows.start, rows.stop))
+        part.timestamps = part.chunks.timestamps
+        part.dense_matrix = np.array(self.dense_matrix[rows], dtype=np.float32)
+
+        streams = getattr(self, "token_streams", None)
+        if streams is not None:
+            part.token_streams = streams.take(rows.start, rows.stop)
+        else:
+            part.token_streams = TokenStreams.build(part.chunks.text(i) for i in range(len(part.chunks)))
+        part.bm25 = BM25Index.from_streams(part.token_streams)
+        part.ann = None
+        part.quant = None
+        return part
+
+    def build_ann(self, nlist: int | None = None, **kwargs) -> IVFIndex:
+        """
+        Builds an IVF index over dense_matrix; it is saved with the index.
+        """
+        self.ann = IVFIndex.build(self.dense_matrix, nlist=nlist, **kwargs)
+        return self.ann
+
+    def quantize(self, mode: str = "int8", **kwargs) -> QuantizedDense:
+        """
+        Builds a compact (int8 or float16) copy of dense_matrix used for
+        first-stage dense scoring; it is saved with the index.
+        """
+        self.quant = QuantizedDense.build(self.dense_matrix, mode=mode, **kwargs)
+        return self.quant
+
+    def dense_scores(self, q_vecs: np.ndarray, rows: slice | None = None, exact: bool = False) -> np.ndarray:
+        """
+        (n_queries x n_rows) dense scores. With a quantized copy (unless
+        exact=True), only each query's rescored top rows carry a score
+        (float32), the rest -inf.
+        """
+        if getattr(self, "quant", None) is not None and not exact:
+            return self.quant.scores(q_vecs, rows)
+        dense = self.dense_matrix if rows is None else self.dense_matrix[rows]
+        return np.atleast_2d(np.asarray(q_vecs, dtype=np.float32)) @ np.asarray(dense).T
+
+    def dense_candidates(self, q_vecs: np.ndarray, n: int, rows: slice | None = None):
+        """
+        Per query: (row ids, float32 scores) of its top-n dense rows within
+        `rows`, unordered. With a quantized copy, the rows the compact
+        matrix ranks highest (at least n), all rescored exactly.
+        """
+        if getattr(self, "quant", None) is not None:
+            return self.quant.candidates(q_vecs, n, rows)
+        scores = self.dense_scores(q_vecs, rows, exact=True)
+        offset = 0 if rows is None else rows.start
+        n = min(n, scores.shape[1])
+        if n == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in scores]
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        return [(top[g] + offset, scores[g, top[g]]) for g in range(len(scores))]
+
+    def dense_search(self, q_vec: np.ndarray, k: int, nprobe: int | None = None, exact: bool = False):
+        """
+        (row ids, scores) of the k nearest chunks to an encoded query.
+        Uses the ANN index when one was built, then the quantized copy,
+        otherwise an exact scan.
+        """
+        q = np.asarray(q_vec, dtype=np.float32).reshape(-1)
+        if getattr(self, "ann", None) is not None and not exact:
+            return self.ann.search(q, k, nprobe=nprobe)
+        if getattr(self, "quant", None) is not None and not exact:
+            return self.quant.search(q, k)
+
+        scores = np.asarray(self.dense_matrix) @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top.astype(np.int64), scores[top]
+
+    def _bm25_index(self) -> BM25Index:
+        # Legacy pickles hold a rank_bm25 object; convert it once
+        if not isinstance(self.bm25, BM25Index):
+            self.bm25 = BM25Index.from_okapi(self.bm25)
+        return self.bm25
+
     # -----------------------------
     # Persistence
     # -----------------------------
     def save(self, path: str):
-        with open(path, "wb") as f:
-            pickle.dump(self, f)
+        """
+        Writes the index as a versioned directory (see "On-disk format").
+        Arrays go into a new data-<id>/ generation and the manifest naming
+        it is replaced last, atomically: a half-written save never loads,
+        and files that readers of the previous generation have memory-mapped
+        are never rewritten. Older generations are removed, the previous one
+        is kept for readers still opening it.
+        """
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+        previous = None
+        if (root / MANIFEST_NAME).exists():
+            with open(root / MANIFEST_NAME, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("data")
+        data_name = f"data-{os.urandom(6).hex()}"
+        out = root / data_name
+        out.mkdir()
+
+        dense = np.ascontiguousarray(self.dense_matrix, dtype=np.float32)
+        np.save(out / "dense.npy", dense)
+        self.chunks.save(out)
+
+        bm25_params = self._bm25_index().save(out)
+
+        manifest = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_FORMAT_VERSION,
+            "num_chunks": len(self.chunks),
+            "dense_model_name": self.dense_model_name,
+            "dense_dim": int(dense.shape[1]) if dense.ndim == 2 else 0,
+            "bm25": bm25_params,
+            "data": data_name,
+        }
+        if getattr(self, "token_streams", None) is not None:
+            manifest["tokens"] = self.token_streams.save(out)
+        if getattr(self, "ann", None) is not None:
+            manifest["ann"] = self.ann.save(out / "ann")
+        if getattr(self, "quant", None) is not None:
+            manifest["quant"] = self.quant.save(out / "quant")
+        tmp = root / (MANIFEST_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, root / MANIFEST_NAME)
+
+        for old in root.glob("data-*"):
+            if old.name not in (data_name, previous):
+                # Mapped files stay readable after unlinking; on Windows they may be locked
+                shutil.rmtree(old, ignore_errors=True)
 
     @staticmethod
-    def load(path: str) -> "VectorIndex":
-        with open(path, "rb") as f:
-            return pickle.load(f)
+    def load(path: str, mmap_mode: str | None = "r") -> "VectorIndex":
+        """
+        Opens a saved index directory. Arrays are memory-mapped, so pages
+        are read on demand. A path to a file is treated as a legacy pickle.
+        """
+        src = Path(path)
+        if src.is_file():
+            with open(src, "rb") as f:
+                index = pickle.load(f)
+            # Legacy pickles embed the encoder; the pool provides it instead
+            index.__dict__.pop("dense_model", None)
+            if not isinstance(index.chunks, ChunkStore):
+                index.chunks = ChunkStore.from_chunks(index.chunks)
+            if not hasattr(index, "timestamps"):
+                # Legacy pickles predate time-ordered rows
+                index.time_ordered = bool(np.all(np.diff(index.chunks.timestamps) >= 0))
+            index.timestamps = index.chunks.timestamps
+            return index
+
+        manifest = read_manifest(src)
+        # Directories written before generations kept their arrays at the top level
+        src = src / manifest.get("data", "")
+
+        index = VectorIndex.__new__(VectorIndex)
+        index.dense_model_name = manifest["dense_model_name"]
+        index.device = None
+        index.manifest = manifest
+        index.chunks = ChunkStore.load(src, mmap_mode=mmap_mode)
+        index.dense_matrix = np.load(src / "dense.npy", mmap_mode=mmap_mode)
+        index.timestamps = index.chunks.timestamps
+        index.bm25 = BM25Index.load(src, manifest["bm25"], mmap_mode=mmap_mode)
+        index.token_streams = TokenStreams.load(src, mmap_mode=mmap_mode) if "tokens" in manifest else None
+        index.ann = IVFIndex.load(src / "ann", index.dense_matrix, mmap_mode=mmap_mode) if "ann" in manifest else None
+        index.quant = QuantizedDense.load(src / "quant", index.dense_matrix, mmap_mode=mmap_mode) if "quant" in manifest else None
+        return index
 
 
 # =============================
@@ -91,6 +384,8 @@ def load_chunks_from_dir(root_dir: str, chunking_name: str) -> List[Chunk]:
             continue
 
         doc_id = doc_folder.name.replace("_chunks", "")
+        doc_date = date_from_name(doc_id)
+        timestamp = datetime(doc_date.year, doc_date.month, doc_date.day) if doc_date else None
 
         for chunk_file in sorted(doc_folder.glob("*.txt")):
             text = chunk_file.read_text(encoding="utf-8").strip()
@@ -105,6 +400,7 @@ def load_chunks_from_dir(root_dir: str, chunking_name: str) -> List[Chunk]:
                     meta={
                         "source_path": str(chunk_file),
                         "chunking": chunking_name,
+                        "timestamp": timestamp,
                     },
                 )
             )
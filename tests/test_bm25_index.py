@@ -0,0 +1,75 @@
+"""
+BM25Index against rank_bm25.BM25Okapi on a toy corpus (no built artifacts needed).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.vectorization.bm25_index import BM25Index
+
+rank_bm25 = pytest.importorskip("rank_bm25")
+
+CORPUS = [
+    "the minister announced the defence budget for 2024",
+    "the budget debate on immigration policy",
+    "immigration policy was stricter than before",
+    "climate policy and the energy budget",
+    "gaza ceasefire talks resumed",
+    "the the the budget",
+    "",
+    "ceasefire ceasefire gaza hamas israel",
+]
+QUERIES = [
+    "defence budget",
+    "immigration policy",
+    "the",
+    "gaza ceasefire ceasefire",
+    "unknown words only",
+    "budget budget climate energy the",
+]
+
+
+def _tokens(text):
+    return text.split()
+
+
+@pytest.fixture(scope="module")
+def corpus_tokens():
+    return [_tokens(doc) for doc in CORPUS]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_okapi(corpus_tokens, query):
+    okapi = rank_bm25.BM25Okapi(corpus_tokens)
+    index = BM25Index.from_tokens(corpus_tokens)
+    q = _tokens(query)
+    np.testing.assert_array_equal(index.get_scores(q), okapi.get_scores(q))
+    np.testing.assert_allclose(index.batch_scores([q])[0], okapi.get_scores(q), rtol=1e-12, atol=1e-12)
+
+
+def test_from_okapi_and_save_roundtrip(corpus_tokens, tmp_path):
+    okapi = rank_bm25.BM25Okapi(corpus_tokens)
+    converted = BM25Index.from_okapi(okapi)
+    params = converted.save(tmp_path)
+    loaded = BM25Index.load(tmp_path, params)
+    for query in QUERIES:
+        q = _tokens(query)
+        np.testing.assert_array_equal(loaded.get_scores(q), okapi.get_scores(q))
+
+
+def test_row_ranges_and_subsets(corpus_tokens):
+    index = BM25Index.from_tokens(corpus_tokens)
+    for query in QUERIES:
+        q = _tokens(query)
+        full = index.get_scores(q)
+        ranges = [slice(0, 3), slice(3, 8)]
+        for rows, scores in zip(ranges, index.get_scores_ranges(q, ranges)):
+            np.testing.assert_allclose(scores, full[rows], rtol=1e-12, atol=1e-12)
+        docs = np.array([1, 4, 7])
+        np.testing.assert_allclose(index.score_docs(q, docs), full[docs], rtol=1e-12, atol=1e-12)
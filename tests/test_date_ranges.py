@@ -0,0 +1,68 @@
+"""
+Date phrases in queries -> date intervals (scripts/retrieval/date_ranges.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.retrieval.date_ranges import parse_date_ranges
+
+
+def _days(query, *bounds):
+    return [(iv.kind, str(iv.first_day), str(iv.last_day)) for iv in parse_date_ranges(query, *bounds)]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What happened in 2023?", [("year", "2023-01-01", "2023-12-31")]),
+    ("Inflation in March 2024", [("month", "2024-03-01", "2024-03-31")]),
+    ("the last quarter of 2023", [("quarter", "2023-10-01", "2023-12-31")]),
+    ("Q4 2023", [("quarter", "2023-10-01", "2023-12-31")]),
+    ("2023Q2", [("quarter", "2023-04-01", "2023-06-30")]),
+    ("the first half of 2024", [("half", "2024-01-01", "2024-06-30")]),
+    ("between 2019 and 2024", [("range", "2019-01-01", "2024-12-31")]),
+])
+def test_single_intervals(query, expected):
+    assert _days(query) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("the first and last quarter of 2023",
+     [("quarter", "2023-01-01", "2023-03-31"), ("quarter", "2023-10-01", "2023-12-31")]),
+    ("the first and the third quarters of 2024",
+     [("quarter", "2024-01-01", "2024-03-31"), ("quarter", "2024-07-01", "2024-09-30")]),
+    ("Q1, Q2 and Q4 2022",
+     [("quarter", "2022-01-01", "2022-03-31"), ("quarter", "2022-04-01", "2022-06-30"),
+      ("quarter", "2022-10-01", "2022-12-31")]),
+    ("first and second half of 2024",
+     [("half", "2024-01-01", "2024-06-30"), ("half", "2024-07-01", "2024-12-31")]),
+    ("H1 and H2 2023",
+     [("half", "2023-01-01", "2023-06-30"), ("half", "2023-07-01", "2023-12-31")]),
+])
+def test_coordinated_ordinals(query, expected):
+    assert _days(query) == expected
+
+
+MIN_TS = 1688083200   # 2023-06-30
+MAX_TS = 1761868800   # 2025-10-31
+
+
+@pytest.mark.parametrize("query", [
+    "What did the latest report say about inflation?",
+    "the first debate on immigration",
+    "his first and last speech",
+])
+def test_relative_phrases_need_corpus_bounds(query):
+    assert parse_date_ranges(query) == []
+    assert parse_date_ranges(query, MIN_TS, MAX_TS)
+
+
+def test_first_and_last_documents():
+    assert _days("the earliest and latest documents", MIN_TS, MAX_TS, 8) == [
+        ("first", "2023-06-30", "2024-02-29"),
+        ("last", "2025-02-28", "2025-10-31"),
+    ]
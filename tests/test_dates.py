@@ -0,0 +1,29 @@
+"""
+ISO strings -> Unix seconds (scripts/common/dates.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.common.dates import MISSING_TS, iso_to_unix_seconds
+
+JAN_1_2023 = 1672531200
+
+
+def test_dates_and_naive_datetimes():
+    assert iso_to_unix_seconds(["2023-01-01", "2023-01-01T03:00:00"]).tolist() == [JAN_1_2023, JAN_1_2023 + 3 * 3600]
+
+
+@pytest.mark.parametrize("value", ["2023-01-01T05:00:00+02:00", "2023-01-01T03:00:00Z"])
+def test_offsets_are_converted_to_utc(value):
+    assert iso_to_unix_seconds([value, "2023-01-01"]).tolist() == [JAN_1_2023 + 3 * 3600, JAN_1_2023]
+
+
+@pytest.mark.parametrize("value", [None, float("nan"), "", "not a date"])
+def test_missing_values(value):
+    assert iso_to_unix_seconds([value, "2023-01-01"]).tolist() == [MISSING_TS, JAN_1_2023]